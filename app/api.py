@@ -0,0 +1,214 @@
+"""
+Headless HTTP API for the Travel AI Assistant.
+
+Run with `python -m app.api`; serves chat, quick actions and a batch
+endpoint on uvicorn with API_WORKERS worker processes.
+"""
+import asyncio
+import os
+import sys
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+# Add the project root to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+from app.config import (
+    API_BATCH_CONCURRENCY, API_HOST, API_MAX_ATTEMPTS, API_MAX_BATCH_SIZE,
+    API_START_PORT, API_TIMEOUT, API_WORKERS, LLM_MODELS, QUICK_ACTIONS
+)
+from app.utils import (
+    LLMHandler, QueueFull, QueueTimeout, build_quick_action, close_async_clients, find_available_port,
+    get_metrics_registry
+)
+from app.utils.scheduler import current_session
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    yield
+    # Close this worker's async connection pool with its event loop
+    await close_async_clients()
+
+
+app = FastAPI(title="Travel AI Assistant API", lifespan=lifespan)
+
+_handlers: Dict[str, LLMHandler] = {}
+_handlers_lock = threading.Lock()
+
+
+class ChatRequest(BaseModel):
+    message: str
+    category: Optional[str] = None
+    destination: Optional[str] = None
+    dates: Optional[str] = None
+    budget: Optional[str] = None
+    interests: List[str] = Field(default_factory=list)
+    model_type: str = "ollama"
+
+
+class QuickActionRequest(BaseModel):
+    destination: str
+    budget: str = ""
+    dates: str = ""
+    interests: List[str] = Field(default_factory=list)
+    model_type: str = "ollama"
+
+
+class BatchJob(BaseModel):
+    destination: str
+    action: str
+    budget: str = ""
+    dates: str = ""
+    interests: List[str] = Field(default_factory=list)
+
+
+class BatchRequest(BaseModel):
+    jobs: List[BatchJob]
+    model_type: str = "ollama"
+
+
+class ChatResponse(BaseModel):
+    response: str
+    model_type: str
+
+
+class BatchResult(BaseModel):
+    destination: str
+    action: str
+    response: Optional[str] = None
+    error: Optional[str] = None
+
+
+def _get_handler(model_type: str) -> LLMHandler:
+    """Return this worker's handler for model_type, initializing it on first use."""
+    if model_type not in LLM_MODELS:
+        raise HTTPException(status_code=400, detail=f"Unsupported model type: {model_type}")
+    with _handlers_lock:
+        handler = _handlers.get(model_type)
+        if handler is None:
+            # One handler serves every API client, so it must not keep conversation memory
+            handler = LLMHandler(use_memory=False)
+            try:
+                handler.initialize_model(model_type, os.getenv("OPENAI_API_KEY"))
+            except Exception as e:
+                raise HTTPException(status_code=503, detail=str(e))
+            _handlers[model_type] = handler
+        return handler
+
+
+def _client_session(request: Request) -> str:
+    """Identify the API client for fair queueing (X-Session-ID header, else client address)."""
+    return request.headers.get("x-session-id") or (request.client.host if request.client else "api")
+
+
+async def _run_chat(
+    handler: LLMHandler,
+    prompt: str,
+    context: Dict,
+    action: Optional[str] = None,
+    remember: bool = True
+) -> str:
+    """Run a chat call with the per-request API_TIMEOUT deadline."""
+    try:
+        return await asyncio.wait_for(
+            handler.achat(prompt, context, action=action, remember=remember), timeout=API_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Model did not respond within {API_TIMEOUT} seconds")
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except QueueTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "models": list(_handlers)}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Each uvicorn worker keeps its own registry; scrape them through the worker address
+    return get_metrics_registry().render_prometheus()
+
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest, http_request: Request):
+    current_session.set(_client_session(http_request))
+    handler = await asyncio.to_thread(_get_handler, request.model_type)
+    if request.category:
+        prompt = f"Focus on {request.category} for this query: {request.message}"
+    else:
+        prompt = request.message
+    context = {
+        "destination": request.destination,
+        "dates": request.dates,
+        "budget": request.budget,
+        "interests": request.interests
+    }
+    response = await _run_chat(handler, prompt, context)
+    return ChatResponse(response=response, model_type=request.model_type)
+
+
+@app.post("/quick-actions/{action}", response_model=ChatResponse)
+async def quick_action(action: str, request: QuickActionRequest, http_request: Request):
+    current_session.set(_client_session(http_request))
+    if action not in QUICK_ACTIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown quick action: {action}")
+    handler = await asyncio.to_thread(_get_handler, request.model_type)
+    prompt, context = build_quick_action(
+        action, request.destination, request.budget, request.interests, request.dates
+    )
+    response = await _run_chat(handler, prompt, context, action)
+    return ChatResponse(response=response, model_type=request.model_type)
+
+
+@app.post("/batch", response_model=List[BatchResult])
+async def batch(request: BatchRequest, http_request: Request):
+    current_session.set(_client_session(http_request))
+    if len(request.jobs) > API_MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {API_MAX_BATCH_SIZE} jobs")
+    for job in request.jobs:
+        if job.action not in QUICK_ACTIONS:
+            raise HTTPException(status_code=400, detail=f"Unknown quick action: {job.action}")
+    handler = await asyncio.to_thread(_get_handler, request.model_type)
+    semaphore = asyncio.Semaphore(API_BATCH_CONCURRENCY)
+
+    async def run_job(job: BatchJob) -> BatchResult:
+        prompt, context = build_quick_action(job.action, job.destination, job.budget, job.interests, job.dates)
+        async with semaphore:
+            try:
+                # Batch jobs are independent of each other, never one conversation
+                response = await _run_chat(handler, prompt, context, job.action, remember=False)
+                return BatchResult(destination=job.destination, action=job.action, response=response)
+            except HTTPException as e:
+                return BatchResult(destination=job.destination, action=job.action, error=e.detail)
+
+    return await asyncio.gather(*(run_job(job) for job in request.jobs))
+
+
+def main():
+    import uvicorn
+
+    port = find_available_port(API_START_PORT, API_MAX_ATTEMPTS)
+    uvicorn.run(
+        "app.api:app",
+        host=API_HOST,
+        port=port,
+        workers=API_WORKERS,
+        timeout_keep_alive=API_TIMEOUT
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -24,12 +24,16 @@ MODEL_INSTRUCTIONS = [
 API_HOST = "0.0.0.0"
 API_START_PORT = 8000
 API_MAX_ATTEMPTS = 100
+API_WORKERS = int(os.getenv("API_WORKERS", "2"))
+API_MAX_BATCH_SIZE = 100  # jobs per /batch request
+API_BATCH_CONCURRENCY = 4  # concurrent model calls per /batch request
 
 # UI Configuration
 UI_TITLE = "Travel AI Assistant"
 UI_SUBTITLE = "Your personal AI travel planner"
 UI_LAYOUT = "wide"
 UI_ICON = "✈️"
+ADMIN_PANEL_ENABLED = os.getenv("ADMIN_PANEL", "").lower() in ("1", "true", "yes")
 
 # Categories
 INTERESTS = [
@@ -53,28 +57,86 @@ BUDGET_OPTIONS = [
 ]
 
 # LLM Models Configuration
+# Generation profiles: max_tokens (answer tokens), reasoning ("on", "off" or "cap"), reasoning_tokens
+# (the cap, or the allowance on top of max_tokens when "on"), temperature and stop sequences. A quick
+# action's profile is applied over the model's; reasoning settings only affect reasoning models.
 LLM_MODELS = {
     "ollama": {
         "name": "Ollama",
         "model": "deepseek-r1",
         "provider": "local",
-        "description": "Local AI model using Ollama"
+        "description": "Local AI model using Ollama",
+        "reasoning": True,  # emits <think> traces and accepts Ollama's think option
+        "generation": {"max_tokens": 2048, "reasoning": "cap", "reasoning_tokens": 1024, "temperature": 0.6}
     },
     "openai": {
         "name": "ChatGPT",
         "model": "gpt-3.5-turbo",
         "provider": "OpenAI",
-        "description": "OpenAI's ChatGPT model"
+        "description": "OpenAI's ChatGPT model",
+        "generation": {"max_tokens": 1500}
     }
 }
 
 # OpenAI Configuration
 OPENAI_MODEL = "gpt-3.5-turbo"
 OPENAI_TEMPERATURE = 0.7
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# Ollama Configuration
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+# Comma-separated pool of Ollama servers to spread requests over; defaults to OLLAMA_HOST
+OLLAMA_HOSTS = [
+    host.strip().rstrip("/") for host in os.getenv("OLLAMA_HOSTS", OLLAMA_HOST).split(",") if host.strip()
+]
+OLLAMA_ROUTING_STRATEGY = os.getenv("OLLAMA_ROUTING_STRATEGY", "least_outstanding")  # or "latency"
+OLLAMA_PREFER_LOADED = True  # favour hosts that already have the model in memory
+OLLAMA_LATENCY_SMOOTHING = 0.3  # weight of the newest request in a host's latency average
+# How long a host keeps the model loaded after a request (Ollama's own default is 5m); "-1" keeps it forever
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "1").lower() not in ("0", "false", "no")  # preload at startup
+OLLAMA_REUSE_CONTEXT = True  # continue a session's conversation from the context Ollama returned
+OLLAMA_CONTEXT_TOKEN_BUDGET = 3072  # drop the returned context beyond this; keep it below the model's num_ctx
+
+# Shared HTTP Connection Pools
+HTTP_POOL_CONNECTIONS = 10  # distinct hosts kept in the pool
+HTTP_POOL_MAXSIZE = 50  # keep-alive connections per host
+HTTP_PROBE_TIMEOUT = 3  # seconds, for service health probes
+LLM_REQUEST_TIMEOUT = 300  # seconds, generation can be slow on local models
+
+# Backend Health and Failover
+HEALTH_PROBE_INTERVAL = 15  # seconds between background health probes
+HEALTH_SLOW_THRESHOLD = 2.0  # probe latency (seconds) above which a backend counts as slow
+CIRCUIT_FAILURE_THRESHOLD = 3  # consecutive failures that open a backend's circuit
+CIRCUIT_RESET_TIMEOUT = 30  # seconds before an open circuit allows a trial call
+# Off by default: failing over sends prompts to another provider, billed to the server's OPENAI_API_KEY
+FAILOVER_ENABLED = os.getenv("FAILOVER", "").lower() in ("1", "true", "yes")
+FAILOVER_POLICY = {  # backends to fall back to, in order, when FAILOVER_ENABLED
+    "ollama": ["openai"],
+    "openai": ["ollama"]
+}
+HEDGE_ENABLED = False  # send a backup request when the primary is slow to answer
+HEDGE_DELAY = 10.0  # seconds to wait for the primary before hedging
+
+# Booking Link Providers
+# Mentions such as "Booking.com:" in quick-action answers become booking links. In the URL,
+# {query} is the URL-encoded destination and {slug} its lowercase, hyphenated form.
+BOOKING_PROVIDERS = {
+    "Booking.com": {"url": "https://www.booking.com/search.html?ss={query}"},
+    "Agoda": {"url": "https://www.agoda.com/search?city={query}"},
+    "MakeMyTrip": {"url": "https://www.makemytrip.com/hotels/hotels-{slug}"},
+    "Expedia": {"url": "https://www.expedia.com/Hotel-Search?destination={query}"},
+    "GetYourGuide": {"url": "https://www.getyourguide.com/s/?q={query}"},
+    "Viator": {"url": "https://www.viator.com/searchResults/all?text={query}"},
+    "OpenTable": {"label": "Reserve on OpenTable", "url": "https://www.opentable.com/s?term={query}"},
+    "TripAdvisor": {"label": "See on TripAdvisor", "url": "https://www.tripadvisor.com/Search?q={query}"}
+}
 
 # Quick Actions
 QUICK_ACTIONS = {
     "hotels": {
+        "icon": "🏨",
+        "label": "Hotels",
         "prompt": """Find hotels in {destination} within {budget} budget range. For each recommended hotel, provide:
 1. Hotel name and brief description
 2. Price range per night
@@ -84,20 +146,109 @@ QUICK_ACTIONS = {
    - Agoda
    - MakeMyTrip
    - Expedia
-Please format each hotel recommendation with clear sections and include direct booking links."""
+Please format each hotel recommendation with clear sections and include direct booking links.""",
+        "providers": ["Booking.com", "Agoda", "MakeMyTrip", "Expedia"],
+        "generation": {"max_tokens": 1200, "reasoning": "cap", "reasoning_tokens": 384}
     },
     "activities": {
         "icon": "🎯",
         "label": "Activities",
-        "prompt": "Suggest activities in {destination} matching these interests: {interests}"
+        "prompt": "Suggest activities in {destination} matching these interests: {interests}",
+        "providers": ["GetYourGuide", "Viator"],
+        "generation": {"max_tokens": 1000, "reasoning": "cap", "reasoning_tokens": 256}
     },
     "restaurants": {
         "icon": "🍽️",
         "label": "Restaurants",
-        "prompt": "Recommend restaurants in {destination} for {budget} budget"
+        "prompt": "Recommend restaurants in {destination} for {budget} budget",
+        "providers": ["OpenTable", "TripAdvisor"],
+        "generation": {"max_tokens": 800, "reasoning": "off"}
     }
 }
 
 # API Configuration
 API_TIMEOUT = 30  # seconds
-CACHE_DURATION = 3600  # 1 hour 
\ No newline at end of file
+CACHE_DURATION = 3600  # 1 hour
+
+# Admission Control (per process; each API worker has its own limits)
+BACKEND_CONCURRENCY = {  # upstream calls allowed in flight per backend
+    "ollama": int(os.getenv("OLLAMA_CONCURRENCY", str(2 * len(OLLAMA_HOSTS)))),
+    "openai": int(os.getenv("OPENAI_CONCURRENCY", "16"))
+}
+PRIORITY_CLASSES = ("interactive", "bulk", "prefetch")  # highest first
+PRIORITY_RESERVED_SLOTS = {"prefetch": 1}  # slots per backend a class leaves free for the classes above it
+SCHEDULER_MAX_QUEUE = 64  # waiting calls per backend before new ones are rejected
+SCHEDULER_QUEUE_DEADLINE = API_TIMEOUT  # seconds a call may wait for a slot
+
+# Response Cache Configuration
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"))
+CACHE_DB_PATH = os.path.join(CACHE_DIR, "responses.sqlite3")
+CACHE_MAX_MEMORY_ENTRIES = 256
+CACHE_MAX_DISK_ENTRIES = 5000
+
+# Chat History (per session; older messages spill to a compressed archive shared by all sessions)
+HISTORY_DB_PATH = os.path.join(CACHE_DIR, "history.sqlite3")
+HISTORY_MEMORY_MESSAGES = 40  # most recent messages a session keeps in memory
+HISTORY_MEMORY_CHARS = 200000  # characters a session keeps in memory (about 50k tokens)
+HISTORY_PAGE_SIZE = 20  # messages shown at first and added by each "Load earlier messages"
+HISTORY_RETENTION = 7 * 24 * 3600  # seconds archived messages are kept
+
+# Session Persistence (a token in the URL restores the chat, model and preferences after a restart)
+SESSION_PERSISTENCE = os.getenv("SESSION_PERSISTENCE", "1").lower() not in ("0", "false", "no")
+SESSION_DB_PATH = os.path.join(CACHE_DIR, "sessions.sqlite3")
+SESSION_COMPACT_EVERY = 50  # logged changes after which a session's log is folded into its snapshot
+SESSION_RETENTION = HISTORY_RETENTION  # seconds an idle session can still be restored
+
+# Offline Cache Pre-warming (prewarm.py)
+PREWARM_CACHE_DURATION = 26 * 3600  # seconds; a nightly run stays cached until the next one finishes
+PREWARM_CONCURRENCY = 2  # calls in flight; leave room for live users of the same backends
+PREWARM_RATE = 0.0  # calls started per second at most (0 = no limit)
+
+# Semantic Cache Configuration (near-duplicate free-text questions)
+SEMANTIC_CACHE_ENABLED = True
+SEMANTIC_CACHE_THRESHOLD = 0.8  # minimum cosine similarity for a hit; reversed or negated questions score below 0.7
+SEMANTIC_CACHE_DIM = 256  # hashing vector size; 100k entries use ~100 MB
+SEMANTIC_CACHE_MAX_ENTRIES = 100000
+SEMANTIC_CACHE_MAX_PARTITION_ENTRIES = 20000
+
+# Retrieval-first Answering (free-text questions answered from earlier answers for the destination)
+RETRIEVAL_ENABLED = True
+RETRIEVAL_CHUNK_WORDS = 60  # words per indexed excerpt of an answer
+RETRIEVAL_TOP_K = 3  # excerpts shown or given to the grounded generation
+RETRIEVAL_MIN_QUERY_TERMS = 2  # shorter questions are too vague to answer from excerpts
+RETRIEVAL_ANSWER_MIN_TERMS = 3  # informative words a question needs to be answered from excerpts alone
+RETRIEVAL_ANSWER_THRESHOLD = 0.8  # confidence to answer with the excerpts alone, without a model call
+RETRIEVAL_GROUNDED_THRESHOLD = 0.5  # confidence to answer from the excerpts with a short generation
+RETRIEVAL_GENERATION = {"max_tokens": 300, "reasoning": "off", "temperature": 0.2}  # grounded answers
+RETRIEVAL_MAX_CHUNKS = 500000  # across all destinations; least recently used destinations go first
+RETRIEVAL_MAX_DESTINATION_CHUNKS = 50000
+
+# Structured Quick Action Results (JSON records filtered locally by budget and interests)
+STRUCTURED_RESULTS_DEFAULT = False  # initial state of the sidebar toggle
+STRUCTURED_SUPERSET_SIZE = 12  # records generated per destination, across all budgets
+STRUCTURED_RESULTS_SHOWN = 5  # records shown after filtering
+STRUCTURED_CACHE_DURATION = 7 * 24 * 3600  # seconds; venue lists change slowly
+STRUCTURED_GENERATION = {"max_tokens": 2500, "reasoning": "off", "temperature": 0.2}  # JSON needs no trace
+BUDGET_TIERS = {  # BUDGET_OPTIONS entry -> price tier used in structured records
+    "Budget (Under $100/day)": "budget",
+    "Moderate ($100-$300/day)": "moderate",
+    "Luxury ($300+/day)": "luxury"
+}
+
+# Day-by-Day Itineraries (outline first, then every day generated in parallel)
+ITINERARY_MAX_DAYS = 21
+ITINERARY_MAX_PARALLEL_DAYS = 8  # further capped by the backend's concurrency limit
+ITINERARY_OUTLINE_GENERATION = {"max_tokens": 600, "reasoning": "off", "temperature": 0.4}  # on the critical path
+ITINERARY_DAY_GENERATION = {"max_tokens": 700, "reasoning": "cap", "reasoning_tokens": 256}
+
+# Speculative Prefetch of Quick Actions (fills the response cache while the user reads)
+PREFETCH_DEFAULT = False  # initial state of the sidebar toggle
+PREFETCH_DELAY = 1.5  # seconds the sidebar inputs must stay unchanged before prefetching
+PREFETCH_MAX_IN_FLIGHT = 2  # speculative calls one session may run at once
+PREFETCH_BUDGET = 12  # speculative calls one session may start per budget window
+PREFETCH_BUDGET_WINDOW = 600  # seconds
+PREFETCH_WORKERS = 8  # threads running prefetches, shared by all sessions
+
+# Conversation Memory Configuration
+MEMORY_TOKEN_BUDGET = 1000  # tokens of recent turns sent with each question
+MEMORY_SUMMARY_TOKEN_BUDGET = 250  # tokens for the rolling summary of older turns 
\ No newline at end of file
@@ -1,6 +1,8 @@
 import streamlit as st
+import asyncio
 import os
 import sys
+from datetime import date
 
 # Add the project root to the Python path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -8,10 +10,16 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from app.config import (
-    UI_TITLE, UI_SUBTITLE, UI_LAYOUT, UI_ICON,
-    BUDGET_OPTIONS, INTERESTS, QUICK_ACTIONS
+    UI_TITLE, UI_SUBTITLE, UI_LAYOUT, UI_ICON, ADMIN_PANEL_ENABLED,
+    BUDGET_OPTIONS, HISTORY_PAGE_SIZE, INTERESTS, PREFETCH_DEFAULT, QUICK_ACTIONS, SESSION_PERSISTENCE,
+    STRUCTURED_RESULTS_DEFAULT
+)
+from app.utils import (
+    ChatHistory, ItineraryPlanner, LLMHandler, LinkRewriter, add_booking_links, build_quick_action, call_summary,
+    close_async_clients, get_metrics_registry,
+    get_ollama_router, get_scheduler, get_session_store, is_session_token, new_session_token, Prefetcher,
+    providers_for, SessionJournal
 )
-from app.utils import LLMHandler
 
 def streamlit_ui():
     # Must be the first Streamlit command
@@ -33,11 +41,17 @@ def streamlit_ui():
     
     # Initialize session state
     if 'llm_handler' not in st.session_state:
-        st.session_state.llm_handler = LLMHandler()
+        open_session()
+    if 'prefetcher' not in st.session_state:
+        st.session_state.prefetcher = Prefetcher(st.session_state.llm_handler)
     if 'current_model' not in st.session_state:
         st.session_state.current_model = None
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
+    if "history_shown" not in st.session_state:
+        st.session_state.history_shown = HISTORY_PAGE_SIZE
+    if "structured" not in st.session_state:
+        st.session_state.structured = STRUCTURED_RESULTS_DEFAULT
+    if "prefetch" not in st.session_state:
+        st.session_state.prefetch = PREFETCH_DEFAULT
     if "api_key" not in st.session_state:
         st.session_state.api_key = None
     if "api_key_submitted" not in st.session_state:
@@ -50,7 +64,8 @@ def streamlit_ui():
             "Select AI Model",
             ["ollama", "openai"],
             help="Choose between local Ollama model or OpenAI's ChatGPT",
-            horizontal=True
+            horizontal=True,
+            key="model_type"
         )
         
         # OpenAI API Key input if ChatGPT is selected
@@ -91,27 +106,56 @@ def streamlit_ui():
             try:
                 st.session_state.llm_handler.initialize_model(model_type, st.session_state.api_key)
                 st.session_state.current_model = model_type
+                record_change("model", model_type)
                 st.success(f"Successfully initialized {model_type} model")
             except Exception as e:
                 st.error(f"Error initializing model: {str(e)}")
                 return
         
         st.header("Travel Preferences")
-        destination = st.text_input("Destination:")
+        destination = st.text_input("Destination:", key="destination")
         
         # Date range selection with calendars
         st.subheader("Travel Dates")
         col1, col2 = st.columns(2)
         with col1:
-            start_date = st.date_input("Start Date", min_value=None, help="Select your travel start date")
+            start_date = st.date_input("Start Date", min_value=None, help="Select your travel start date",
+                                       key="start_date")
         with col2:
-            end_date = st.date_input("End Date", min_value=start_date, help="Select your travel end date")
+            end_date = st.date_input("End Date", min_value=start_date, help="Select your travel end date",
+                                     key="end_date")
         
         # Format dates for use in the application
         dates = f"{start_date} to {end_date}" if start_date and end_date else ""
         
-        budget = st.selectbox("Budget Range:", BUDGET_OPTIONS)
-        interests = st.multiselect("Interests:", INTERESTS)
+        budget = st.selectbox("Budget Range:", BUDGET_OPTIONS, key="budget")
+        interests = st.multiselect("Interests:", INTERESTS, key="interests")
+        structured = st.toggle(
+            "Structured results",
+            help="Generate each destination's list once and filter it locally when the budget or interests change",
+            key="structured"
+        )
+        prefetch = st.toggle(
+            "Prefetch quick actions",
+            help="Prepare the quick actions in the background once your preferences settle, so buttons answer instantly",
+            key="prefetch"
+        )
+        record_change("preferences", {
+            "destination": destination,
+            "start_date": start_date.isoformat() if start_date else None,
+            "end_date": end_date.isoformat() if end_date else None,
+            "budget": budget,
+            "interests": interests,
+            "structured": structured,
+            "prefetch": prefetch
+        })
+        if prefetch:
+            st.session_state.prefetcher.schedule(destination, budget, interests, dates, structured)
+        else:
+            st.session_state.prefetcher.cancel()
+        
+        if ADMIN_PANEL_ENABLED:
+            render_admin_panel()
     
     # Main content area
     st.title(UI_TITLE)
@@ -121,8 +165,11 @@ def streamlit_ui():
     if st.session_state.current_model:
         st.info(f"Currently using: {st.session_state.current_model.upper()}")
     
-    # Display chat history
-    for message in st.session_state.messages:
+    # Display chat history: only the latest messages, so a rerun costs the same however long the chat is
+    hidden = len(st.session_state.messages) - st.session_state.history_shown
+    if hidden > 0:
+        st.button(f"Load earlier messages ({hidden} more)", key="load_earlier", on_click=load_earlier_messages)
+    for message in st.session_state.messages.window(st.session_state.history_shown):
         with st.container():
             if message["role"] == "user":
                 st.markdown(f"**You:** {message['content']}")
@@ -130,32 +177,26 @@ def streamlit_ui():
                 st.markdown(f"**Travel Buddy:** {message['content']}")
     
     # Quick action buttons
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4, col5 = st.columns(5)
     with col1:
         if st.button("🏨 Find Hotels"):
             if destination:
-                prompt = QUICK_ACTIONS["hotels"]["prompt"].format(
-                    destination=destination,
-                    budget=budget
-                )
+                if prefetch:
+                    st.session_state.prefetcher.record_click("hotels", destination, budget, interests, dates, structured)
+                prompt, context = build_quick_action("hotels", destination, budget, interests, dates)
                 with st.spinner("Finding hotels..."):
                     try:
-                        response = st.session_state.llm_handler.chat(prompt, {
-                            "destination": destination,
-                            "budget": budget,
-                            "dates": dates,
-                            "interests": interests
-                        })
+                        if structured:
+                            response = structured_quick_action(
+                                st.session_state.llm_handler, "hotels", destination, budget, interests
+                            )
+                        else:
+                            chunks = st.session_state.llm_handler.stream_chat(prompt, context, action="hotels")
+                            response = render_stream(LinkRewriter(destination, providers_for("hotels")).stream(chunks))
                         
                         # Store the original prompt and create a formatted response
                         formatted_prompt = f"**You:** Looking for hotels in {destination} ({budget})"
-                        
-                        # Format the response with clickable links
-                        formatted_response = "**Travel Buddy:** Here are some hotel recommendations:\n\n"
-                        formatted_response += response.replace("Booking.com:", "[Book on Booking.com](https://www.booking.com/search.html?ss=" + destination.replace(" ", "+") + ")")
-                        formatted_response = formatted_response.replace("Agoda:", "[Book on Agoda](https://www.agoda.com/search?city=" + destination.replace(" ", "+") + ")")
-                        formatted_response = formatted_response.replace("MakeMyTrip:", "[Book on MakeMyTrip](https://www.makemytrip.com/hotels/hotels-" + destination.replace(" ", "-").lower() + ")")
-                        formatted_response = formatted_response.replace("Expedia:", "[Book on Expedia](https://www.expedia.com/Hotel-Search?destination=" + destination.replace(" ", "+") + ")")
+                        formatted_response = format_hotel_response(response)
                         
                         st.session_state.messages.append({"role": "user", "content": formatted_prompt})
                         st.session_state.messages.append({"role": "assistant", "content": formatted_response})
@@ -168,18 +209,18 @@ def streamlit_ui():
     with col2:
         if st.button("🎯 Activities"):
             if destination and interests:
-                prompt = QUICK_ACTIONS["activities"]["prompt"].format(
-                    destination=destination,
-                    interests=", ".join(interests)
-                )
+                if prefetch:
+                    st.session_state.prefetcher.record_click("activities", destination, budget, interests, dates, structured)
+                prompt, context = build_quick_action("activities", destination, budget, interests, dates)
                 with st.spinner("Finding activities..."):
                     try:
-                        response = st.session_state.llm_handler.chat(prompt, {
-                            "destination": destination,
-                            "interests": interests,
-                            "budget": budget,
-                            "dates": dates
-                        })
+                        if structured:
+                            response = structured_quick_action(
+                                st.session_state.llm_handler, "activities", destination, budget, interests
+                            )
+                        else:
+                            chunks = st.session_state.llm_handler.stream_chat(prompt, context, action="activities")
+                            response = render_stream(LinkRewriter(destination, providers_for("activities")).stream(chunks))
                         st.session_state.messages.append({"role": "user", "content": prompt})
                         st.session_state.messages.append({"role": "assistant", "content": response})
                         st.rerun()
@@ -191,17 +232,18 @@ def streamlit_ui():
     with col3:
         if st.button("🍽️ Restaurants"):
             if destination:
-                prompt = QUICK_ACTIONS["restaurants"]["prompt"].format(
-                    destination=destination,
-                    budget=budget
-                )
+                if prefetch:
+                    st.session_state.prefetcher.record_click("restaurants", destination, budget, interests, dates, structured)
+                prompt, context = build_quick_action("restaurants", destination, budget, interests, dates)
                 with st.spinner("Finding restaurants..."):
                     try:
-                        response = st.session_state.llm_handler.chat(prompt, {
-                            "destination": destination,
-                            "budget": budget,
-                            "interests": interests
-                        })
+                        if structured:
+                            response = structured_quick_action(
+                                st.session_state.llm_handler, "restaurants", destination, budget, interests
+                            )
+                        else:
+                            chunks = st.session_state.llm_handler.stream_chat(prompt, context, action="restaurants")
+                            response = render_stream(LinkRewriter(destination, providers_for("restaurants")).stream(chunks))
                         st.session_state.messages.append({"role": "user", "content": prompt})
                         st.session_state.messages.append({"role": "assistant", "content": response})
                         st.rerun()
@@ -210,6 +252,50 @@ def streamlit_ui():
             else:
                 st.warning("Please specify a destination first")
     
+    with col4:
+        itinerary_clicked = st.button("🗓️ Itinerary")
+    
+    with col5:
+        plan_everything_clicked = st.button("🧳 Plan Everything")
+    
+    if itinerary_clicked:
+        if destination and dates:
+            with st.spinner("Outlining your trip..."):
+                try:
+                    planner = ItineraryPlanner(st.session_state.llm_handler)
+                    response = render_stream(planner.stream(destination, dates, budget, interests))
+                    st.session_state.messages.append({
+                        "role": "user",
+                        "content": f"Day-by-day itinerary for {destination} ({dates})"
+                    })
+                    st.session_state.messages.append({"role": "assistant", "content": response})
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error: {str(e)}")
+        else:
+            st.warning("Please specify a destination and travel dates first")
+    
+    if plan_everything_clicked:
+        if destination:
+            # Activities need interests, so only include them when some are selected
+            actions = [action for action in QUICK_ACTIONS if action != "activities" or interests]
+            with st.spinner("Planning your whole trip..."):
+                try:
+                    responses = asyncio.run(plan_everything(
+                        st.session_state.llm_handler, actions, destination, budget, interests, dates
+                    ))
+                    st.session_state.messages.append({
+                        "role": "user",
+                        "content": f"Plan everything for {destination} ({budget})"
+                    })
+                    for action in actions:
+                        st.session_state.messages.append({"role": "assistant", "content": responses[action]})
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error: {str(e)}")
+        else:
+            st.warning("Please specify a destination first")
+    
     # Chat input
     user_input = st.text_input("Ask anything about your travel plans:")
     
@@ -222,13 +308,129 @@ def streamlit_ui():
                     "budget": budget,
                     "interests": interests
                 }
-                response = st.session_state.llm_handler.chat(user_input, context)
+                response = render_stream(st.session_state.llm_handler.stream_chat(user_input, context))
                 st.session_state.messages.append({"role": "user", "content": user_input})
                 st.session_state.messages.append({"role": "assistant", "content": response})
                 st.rerun()
             except Exception as e:
                 st.error(f"Error: {str(e)}")
 
+def open_session():
+    """Restore the session named by the URL's token, or start one and put its token in the URL"""
+    token = st.query_params.get("session")
+    state = None
+    if SESSION_PERSISTENCE and is_session_token(token):
+        state = get_session_store().load(token)
+    if state is None:
+        # An unknown or expired token is not reused, so tokens are only ever issued here
+        token = new_session_token()
+    if SESSION_PERSISTENCE:
+        st.session_state.journal = SessionJournal(token, state)
+        st.query_params["session"] = token
+        handler = LLMHandler(session_id=token, on_remember=st.session_state.journal.record_exchange)
+        # Only the latest messages are read back; older ones load from the archive on demand
+        messages = ChatHistory.restore(token) if state is not None else ChatHistory(token, durable=True)
+    else:
+        handler = LLMHandler(session_id=token)
+        messages = ChatHistory(token)
+    st.session_state.llm_handler = handler
+    st.session_state.messages = messages
+
+    state = state or {}
+    if handler.memory is not None and state.get("memory"):
+        handler.memory.restore(state["memory"])
+    if state.get("model") in ("ollama", "openai"):
+        st.session_state.model_type = state["model"]
+    # Widgets read their initial values from these keys
+    preferences = state.get("preferences", {})
+    if preferences.get("destination"):
+        st.session_state.destination = preferences["destination"]
+    for key in ("start_date", "end_date"):
+        if preferences.get(key):
+            st.session_state[key] = date.fromisoformat(preferences[key])
+    if preferences.get("budget") in BUDGET_OPTIONS:
+        st.session_state.budget = preferences["budget"]
+    if preferences.get("interests"):
+        st.session_state.interests = [interest for interest in preferences["interests"] if interest in INTERESTS]
+    for key in ("structured", "prefetch"):
+        if key in preferences:
+            st.session_state[key] = bool(preferences[key])
+
+def record_change(kind, data):
+    """Log a change to the persisted session; unchanged values are not written again"""
+    if "journal" in st.session_state:
+        st.session_state.journal.record(kind, data)
+
+def render_stream(chunks, prefix: str = "**Travel Buddy:** ") -> str:
+    """Render streamed response chunks progressively and return the full text"""
+    placeholder = st.empty()
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        placeholder.markdown(prefix + "".join(parts) + "▌")
+    response = "".join(parts)
+    placeholder.markdown(prefix + response)
+    return response
+
+def load_earlier_messages():
+    """Show another page of older chat messages"""
+    st.session_state.history_shown += HISTORY_PAGE_SIZE
+
+def structured_quick_action(llm_handler, action, destination, budget, interests) -> str:
+    """Answer a quick action by filtering the destination's stored structured results"""
+    from app.utils.structured import filter_records, render_records
+
+    records, _ = llm_handler.structured_results(action, destination)
+    return render_records(action, filter_records(records, budget, interests), destination, budget)
+
+def format_hotel_response(response: str) -> str:
+    """Format a hotel response whose booking links were added while streaming"""
+    return "**Travel Buddy:** Here are some hotel recommendations:\n\n" + response
+
+async def plan_everything(llm_handler, actions, destination, budget, interests, dates) -> dict:
+    """Run several quick actions concurrently and render each section as it finishes"""
+    placeholders = {}
+    for action in actions:
+        placeholders[action] = st.empty()
+        placeholders[action].markdown(f"{QUICK_ACTIONS[action]['icon']} *{QUICK_ACTIONS[action]['label']}: waiting...*")
+
+    async def run_action(action):
+        prompt, context = build_quick_action(action, destination, budget, interests, dates)
+        # The sections are shown together, not as separate turns of the conversation
+        return action, await llm_handler.achat(prompt, context, action=action, remember=False)
+
+    responses = {}
+    try:
+        for finished in asyncio.as_completed([run_action(action) for action in actions]):
+            action, response = await finished
+            response = add_booking_links(response, destination, action)
+            responses[action] = f"**{QUICK_ACTIONS[action]['icon']} {QUICK_ACTIONS[action]['label']}**\n\n{response}"
+            placeholders[action].markdown(f"**Travel Buddy:** {responses[action]}")
+    finally:
+        # Each click runs on a fresh event loop; close its connections before asyncio.run() closes it
+        await close_async_clients()
+    return responses
+
+def render_admin_panel():
+    """Show LLM call metrics in the sidebar (enabled with ADMIN_PANEL=1)"""
+    with st.expander("📊 Admin Metrics"):
+        summary = call_summary()
+        if summary:
+            st.dataframe(summary, hide_index=True)
+        else:
+            st.caption("No LLM calls recorded yet")
+        st.caption("Admission queues")
+        st.json(get_scheduler().stats())
+        st.caption("Ollama hosts")
+        st.dataframe(get_ollama_router().stats(), hide_index=True)
+        st.caption("This session")
+        st.json(st.session_state.llm_handler.token_stats)
+        st.json(st.session_state.messages.stats())
+        st.caption("Prefetch")
+        st.json(st.session_state.prefetcher.stats())
+        metrics_text = get_metrics_registry().render_prometheus()
+        st.download_button("Download Prometheus metrics", metrics_text, file_name="metrics.txt")
+
 def submit_api_key(api_key):
     """Handle API key submission"""
     if api_key:
@@ -15,9 +15,53 @@ def find_available_port(start_port: int, max_attempts: int = 100) -> int:
             continue
     raise RuntimeError(f"Could not find an available port after {max_attempts} attempts")
 
+from .cache import ResponseCache, get_response_cache
+from .clients import close_async_clients, get_client
+from .history import ChatHistory
+from .itinerary import ItineraryPlanner
+from .links import LinkRewriter, add_booking_links, providers_for
 from .llm_handler import LLMHandler
+from .memory import ConversationMemory
+from .metrics import call_summary, get_metrics_registry
+from .ollama_router import OllamaRouter, get_ollama_router
+from .prefetch import Prefetcher
+from .quick_actions import build_quick_action
+from .reasoning import ReasoningFilter, strip_reasoning
+from .scheduler import AdmissionError, AdmissionScheduler, QueueFull, QueueTimeout, get_scheduler
+from .sessions import SessionJournal, SessionStore, get_session_store, is_session_token, new_session_token
+from .singleflight import SingleFlight, get_single_flight
 
 __all__ = [
     'LLMHandler',
+    'ConversationMemory',
+    'ChatHistory',
+    'call_summary',
+    'get_metrics_registry',
+    'ResponseCache',
+    'get_response_cache',
+    'get_client',
+    'close_async_clients',
+    'OllamaRouter',
+    'get_ollama_router',
+    'Prefetcher',
+    'build_quick_action',
+    'ItineraryPlanner',
+    'LinkRewriter',
+    'add_booking_links',
+    'providers_for',
+    'ReasoningFilter',
+    'strip_reasoning',
+    'AdmissionError',
+    'AdmissionScheduler',
+    'QueueFull',
+    'QueueTimeout',
+    'get_scheduler',
+    'SessionJournal',
+    'SessionStore',
+    'get_session_store',
+    'is_session_token',
+    'new_session_token',
+    'SingleFlight',
+    'get_single_flight',
     'find_available_port'
 ] 
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""
+Process-wide registry of model clients and shared HTTP connection pools.
+
+Streamlit runs every browser session in the same process, so model clients
+and keep-alive connections are built once here and shared; each session's
+LLMHandler only holds a reference plus its own conversation state.
+"""
+import asyncio
+import hashlib
+import threading
+import weakref
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from ..config import (
+    HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, LLM_MODELS, LLM_REQUEST_TIMEOUT,
+    OLLAMA_HOSTS, OPENAI_BASE_URL, OPENAI_MODEL, OPENAI_TEMPERATURE
+)
+from .ollama_client import OllamaClient
+from .ollama_router import get_ollama_router
+
+# httpx and requests are imported on first use to keep app startup fast
+if TYPE_CHECKING:
+    import httpx
+    import requests
+
+_lock = threading.Lock()
+_clients: Dict[Tuple[str, str, str], Any] = {}
+_http_session: Optional["requests.Session"] = None
+_http_client: Optional["httpx.Client"] = None
+_async_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str, str], Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _httpx_limits() -> "httpx.Limits":
+    import httpx
+
+    return httpx.Limits(
+        max_connections=HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE,
+        max_keepalive_connections=HTTP_POOL_MAXSIZE
+    )
+
+
+def get_http_session() -> "requests.Session":
+    """Return the shared requests session with a keep-alive connection pool."""
+    global _http_session
+    with _lock:
+        if _http_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_CONNECTIONS,
+                pool_maxsize=HTTP_POOL_MAXSIZE
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http_session = session
+        return _http_session
+
+
+def get_http_client() -> "httpx.Client":
+    """Return the shared synchronous httpx client."""
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            import httpx
+
+            _http_client = httpx.Client(limits=_httpx_limits(), timeout=LLM_REQUEST_TIMEOUT)
+        return _http_client
+
+
+def get_async_http_client() -> "httpx.AsyncClient":
+    """Return the httpx async client for the running event loop.
+
+    Async connections are bound to the loop that opened them, so one pool is
+    kept per loop; close it with close_async_clients() before the loop ends.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_http_clients.get(loop)
+        if client is None:
+            import httpx
+
+            client = httpx.AsyncClient(limits=_httpx_limits(), timeout=LLM_REQUEST_TIMEOUT)
+            _async_http_clients[loop] = client
+        return client
+
+
+def key_digest(api_key: Optional[str]) -> str:
+    """Return a digest that identifies api_key without keeping the raw key as a dictionary key."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest() if api_key else ""
+
+
+def get_client(model_type: str, api_key: Optional[str] = None, system: Optional[str] = None) -> Any:
+    """Return the shared model client for a model type and API key, creating it once."""
+    if model_type not in LLM_MODELS:
+        raise ValueError(f"Unsupported model type: {model_type}")
+
+    key = (model_type, key_digest(api_key), system or "")
+    with _lock:
+        client = _clients.get(key)
+    if client is not None:
+        return client
+
+    if model_type == "ollama":
+        client = OllamaClient(
+            model=LLM_MODELS[model_type]["model"],
+            base_url=OLLAMA_HOSTS[0],
+            session=get_http_session(),
+            system=system,
+            router=get_ollama_router(),
+            reasoning=LLM_MODELS[model_type].get("reasoning", False)
+        )
+    elif model_type == "openai":
+        # Import here to avoid dependency issues if not using OpenAI
+        from langchain_openai import ChatOpenAI
+
+        client = ChatOpenAI(
+            model=OPENAI_MODEL,
+            temperature=OPENAI_TEMPERATURE,
+            api_key=api_key,
+            base_url=OPENAI_BASE_URL,
+            http_client=get_http_client()
+        )
+
+    with _lock:
+        return _clients.setdefault(key, client)
+
+
+def get_async_client(model_type: str, api_key: Optional[str] = None, system: Optional[str] = None) -> Any:
+    """Return the model client to use for async calls on the running event loop.
+
+    ChatOpenAI binds its async connection pool when it is constructed, and
+    that pool breaks once its loop closes (each asyncio.run() in Streamlit
+    uses a fresh loop), so OpenAI gets one client per loop. OllamaClient
+    already picks the loop's pool per call and is shared as-is.
+    """
+    if model_type != "openai":
+        return get_client(model_type, api_key, system)
+
+    loop = asyncio.get_running_loop()
+    key = (model_type, key_digest(api_key), system or "")
+    with _lock:
+        client = _async_clients.get(loop, {}).get(key)
+    if client is not None:
+        return client
+
+    # Import here to avoid dependency issues if not using OpenAI
+    from langchain_openai import ChatOpenAI
+
+    client = ChatOpenAI(
+        model=OPENAI_MODEL,
+        temperature=OPENAI_TEMPERATURE,
+        api_key=api_key,
+        base_url=OPENAI_BASE_URL,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client()
+    )
+    with _lock:
+        return _async_clients.setdefault(loop, {}).setdefault(key, client)
+
+
+async def close_async_clients() -> None:
+    """Close the running event loop's connection pool and drop its model clients.
+
+    Await it at the end of each asyncio.run(), so the pool's sockets are not
+    left open on a closed loop until garbage collection.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_http_clients.pop(loop, None)
+        _async_clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
+
+def clear_clients() -> None:
+    """Drop all cached model clients (e.g. after an API key is revoked)."""
+    with _lock:
+        _clients.clear()
+        _async_clients.clear()
@@ -0,0 +1,250 @@
+"""
+Backend health tracking: a background prober and per-backend circuit breakers.
+
+The prober checks the backends in use (the selected ones and their
+configured fallbacks) on a fixed interval and caches the result, so model
+initialization and failover decisions never wait on the network. Circuit breakers stop sending traffic to a backend
+after repeated failures and let a single trial call through once the
+reset timeout has passed. Only failures of the backend itself count
+(unreachable, timed out, 5xx); a request the backend refused, such as a
+401 for a bad API key, leaves the circuit alone. OpenAI gets a breaker
+per API key, so one user's key cannot cut the others off.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from ..config import (
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, HEALTH_PROBE_INTERVAL,
+    HEALTH_SLOW_THRESHOLD, HTTP_PROBE_TIMEOUT, LLM_MODELS, OPENAI_BASE_URL
+)
+from .metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+
+class BackendRejected(RuntimeError):
+    """The backend is up but refused the request (e.g. 401 for a bad API key); failing over would not help."""
+
+
+def is_backend_failure(error: BaseException) -> bool:
+    """Return True if error shows the backend is unreachable, timing out or failing (5xx)."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status >= 500
+    # Connection and timeout errors of the standard library and requests are OSErrors
+    if isinstance(error, (OSError, asyncio.TimeoutError)):
+        return True
+    import httpx
+
+    if isinstance(error, httpx.TransportError):
+        return True
+    try:
+        import openai
+    except ImportError:
+        return False
+    # Includes APITimeoutError
+    return isinstance(error, openai.APIConnectionError)
+
+
+class BackendHealth:
+    def __init__(self, healthy: bool, latency: float, error: Optional[str] = None):
+        self.healthy = healthy
+        self.latency = latency
+        self.error = error
+        self.checked_at = time.time()
+
+    @property
+    def slow(self) -> bool:
+        return self.latency > HEALTH_SLOW_THRESHOLD
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return True if a call may be sent to the backend now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                # Let exactly one trial call through
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def available(self) -> bool:
+        """Like allow(), but without claiming the half-open trial call."""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at >= self.reset_timeout
+            return not (self.state == self.HALF_OPEN and self._trial_in_flight)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def release(self) -> None:
+        """End a call that says nothing about the backend's health, giving back a half-open trial."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+class HealthProber:
+    def __init__(self, interval: float = HEALTH_PROBE_INTERVAL, timeout: float = HTTP_PROBE_TIMEOUT):
+        self.interval = interval
+        self.timeout = timeout
+        self._status: Dict[str, BackendHealth] = {}
+        # Backends probed in the background; ones nobody uses are never contacted
+        self._backends: List[str] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # Set when a backend is added, so it is probed at once rather than after a full interval
+        self._wake = threading.Event()
+
+    def start(self) -> None:
+        """Start the background probe thread if it is not already running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="llm-health-prober", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def watch(self, *backends: str) -> None:
+        """Probe these backends in the background from now on."""
+        with self._lock:
+            for backend in backends:
+                if backend in LLM_MODELS and backend not in self._backends:
+                    self._backends.append(backend)
+                    self._wake.set()
+
+    def status(self, backend: str) -> Optional[BackendHealth]:
+        """Return the last probe result for backend, or None if it has not been probed yet."""
+        with self._lock:
+            return self._status.get(backend)
+
+    def probe(self, backend: str) -> BackendHealth:
+        """Probe one backend now and cache the result."""
+        from .clients import get_http_session
+
+        if backend == "ollama":
+            result = self._probe_ollama()
+        else:
+            url = f"{(OPENAI_BASE_URL or 'https://api.openai.com/v1').rstrip('/')}/models"
+            started = time.perf_counter()
+            try:
+                response = get_http_session().get(url, timeout=self.timeout)
+                # Without credentials OpenAI answers 401, which still proves it is reachable
+                healthy = response.status_code < 500
+                error = None if healthy else f"HTTP {response.status_code}"
+            except Exception as e:
+                healthy, error = False, str(e)
+            result = BackendHealth(healthy, time.perf_counter() - started, error)
+        with self._lock:
+            previous = self._status.get(backend)
+            self._status[backend] = result
+        if previous is None or previous.healthy != result.healthy:
+            logger.info("Backend %s is %s", backend,
+                        "healthy" if result.healthy else f"unhealthy ({result.error})")
+        return result
+
+    def _probe_ollama(self) -> BackendHealth:
+        """Probe every Ollama host; the backend is healthy while any host is."""
+        from .ollama_router import get_ollama_router
+
+        results = get_ollama_router().refresh(self.timeout)
+        healthy = [result for result in results if result.healthy]
+        if healthy:
+            return BackendHealth(True, min(result.latency for result in healthy))
+        errors = "; ".join(sorted({result.error for result in results if result.error}))
+        return BackendHealth(False, min(result.latency for result in results), errors)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            with self._lock:
+                backends = list(self._backends)
+            for backend in backends:
+                self.probe(backend)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+_prober = HealthProber()
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_health_prober() -> HealthProber:
+    """Return the process-wide health prober, starting it on first use."""
+    _prober.start()
+    return _prober
+
+
+def get_circuit_breaker(backend: str, api_key: Optional[str] = None) -> CircuitBreaker:
+    """Return the process-wide circuit breaker for backend and the API key its calls use."""
+    from .clients import key_digest
+
+    key = (backend, key_digest(api_key))
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker()
+        return breaker
+
+
+def _collect_health():
+    states = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    # One series per backend (the worst of its API keys), so keys do not become labels
+    worst: Dict[str, int] = {}
+    for (backend, _), breaker in breakers.items():
+        worst[backend] = max(worst.get(backend, 0), states[breaker.state])
+    for backend, state in worst.items():
+        yield ("travel_backend_circuit_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+               {"backend": backend}, state)
+    for backend in LLM_MODELS:
+        status = _prober.status(backend)
+        if status is not None:
+            yield ("travel_backend_healthy", "Last health probe result (1 healthy)",
+                   {"backend": backend}, 1 if status.healthy else 0)
+            yield ("travel_backend_probe_latency_seconds", "Last health probe latency",
+                   {"backend": backend}, status.latency)
+
+
+get_metrics_registry().register_collector(_collect_health)
@@ -0,0 +1,195 @@
+"""
+Bounded chat history for the Streamlit UI.
+
+Each session keeps only its most recent messages in memory, capped by
+count and by characters. Older messages spill to a SQLite archive shared
+by every session in the process, compressed with zlib, and are read back
+a page at a time when the user asks for earlier messages. The UI renders
+a fixed-size window, so a rerun costs the same however long the chat is.
+A durable history writes every message to the archive as it is added, so
+a restarted session can restore its latest window with one query.
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from ..config import HISTORY_DB_PATH, HISTORY_MEMORY_CHARS, HISTORY_MEMORY_MESSAGES, HISTORY_RETENTION
+from .metrics import get_metrics_registry
+
+Message = Tuple[str, str]  # (role, content)
+
+
+class HistoryArchive:
+    """Compressed messages spilled from every session's history, kept in one SQLite file."""
+
+    def __init__(self, db_path: str = HISTORY_DB_PATH, retention: float = HISTORY_RETENTION):
+        self.retention = retention
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "session TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, "
+            "content BLOB NOT NULL, created_at REAL NOT NULL, PRIMARY KEY (session, seq))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS messages_created ON messages(created_at)")
+        # Sessions do not say goodbye, so their archived messages simply expire
+        self._db.execute("DELETE FROM messages WHERE created_at < ?", (time.time() - retention,))
+        self._db.commit()
+
+    def put(self, session: str, seq: int, role: str, content: str) -> None:
+        """Archive message number seq of session."""
+        blob = zlib.compress(content.encode("utf-8"))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO messages (session, seq, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                (session, seq, role, blob, time.time())
+            )
+            self._db.commit()
+
+    def get_range(self, session: str, start: int, end: int) -> List[Message]:
+        """Return messages start..end-1 of session in order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT role, content FROM messages WHERE session = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (session, start, end)
+            ).fetchall()
+        return [(role, zlib.decompress(content).decode("utf-8")) for role, content in rows]
+
+    def count(self, session: str) -> int:
+        """Return the number of messages archived for session (one past its highest seq)."""
+        with self._lock:
+            (highest,) = self._db.execute("SELECT MAX(seq) FROM messages WHERE session = ?", (session,)).fetchone()
+        return 0 if highest is None else highest + 1
+
+    def delete_session(self, session: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM messages WHERE session = ?", (session,))
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the archived message count and their compressed size."""
+        with self._lock:
+            messages, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(content)), 0) FROM messages"
+            ).fetchone()
+        return {"messages": messages, "compressed_bytes": size}
+
+
+class ChatHistory:
+    """One session's messages: a bounded recent window in memory, older ones in the archive."""
+
+    def __init__(
+        self,
+        session_id: Optional[str] = None,
+        archive: Optional[HistoryArchive] = None,
+        max_messages: int = HISTORY_MEMORY_MESSAGES,
+        max_chars: int = HISTORY_MEMORY_CHARS,
+        durable: bool = False
+    ):
+        self.session_id = session_id or uuid.uuid4().hex
+        self._archive = archive
+        self.max_messages = max(1, max_messages)
+        self.max_chars = max_chars
+        # Durable histories archive each message when it is added rather than when it spills
+        self.durable = durable
+        self._recent: Deque[Message] = deque()
+        self._chars = 0
+        # Messages 0..spilled-1 are in the archive, the rest in _recent
+        self._spilled = 0
+
+    @property
+    def archive(self) -> HistoryArchive:
+        if self._archive is None:
+            self._archive = get_history_archive()
+        return self._archive
+
+    def append(self, message: Dict[str, str]) -> None:
+        """Add a {"role", "content"} message, spilling the oldest ones past the memory cap."""
+        content = message["content"]
+        role = sys.intern(message["role"])
+        if self.durable:
+            self.archive.put(self.session_id, len(self), role, content)
+        self._recent.append((role, content))
+        self._chars += len(content)
+        self._trim()
+
+    def _trim(self) -> None:
+        # The newest message always stays in memory, however long it is
+        while len(self._recent) > 1 and (len(self._recent) > self.max_messages or self._chars > self.max_chars):
+            role, content = self._recent.popleft()
+            self._chars -= len(content)
+            if not self.durable:
+                self.archive.put(self.session_id, self._spilled, role, content)
+            self._spilled += 1
+
+    @classmethod
+    def restore(
+        cls,
+        session_id: str,
+        archive: Optional[HistoryArchive] = None,
+        max_messages: int = HISTORY_MEMORY_MESSAGES,
+        max_chars: int = HISTORY_MEMORY_CHARS
+    ) -> "ChatHistory":
+        """Reopen a durable history, reading back only the messages it keeps in memory."""
+        history = cls(session_id, archive, max_messages, max_chars, durable=True)
+        count = history.archive.count(session_id)
+        start = max(0, count - history.max_messages)
+        history._spilled = start
+        for message in history.archive.get_range(session_id, start, count):
+            history._recent.append((sys.intern(message[0]), message[1]))
+            history._chars += len(message[1])
+        history._trim()
+        return history
+
+    def __len__(self) -> int:
+        return self._spilled + len(self._recent)
+
+    def window(self, count: int) -> List[Dict[str, str]]:
+        """Return the last count messages, oldest first."""
+        return self.page(max(0, len(self) - count), len(self))
+
+    def page(self, start: int, end: int) -> List[Dict[str, str]]:
+        """Return messages start..end-1, reading spilled ones back from the archive."""
+        end = min(end, len(self))
+        messages: List[Message] = []
+        if start < self._spilled:
+            messages.extend(self.archive.get_range(self.session_id, start, min(end, self._spilled)))
+        if end > self._spilled:
+            recent = list(self._recent)
+            messages.extend(recent[max(0, start - self._spilled):end - self._spilled])
+        return [{"role": role, "content": content} for role, content in messages]
+
+    def clear(self) -> None:
+        if self._spilled or self.durable:
+            self.archive.delete_session(self.session_id)
+        self._recent.clear()
+        self._chars = 0
+        self._spilled = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return message counts per tier and the characters held in memory."""
+        return {"messages": len(self), "in_memory": len(self._recent), "spilled": self._spilled,
+                "memory_chars": self._chars}
+
+
+_default_archive: Optional[HistoryArchive] = None
+_default_archive_lock = threading.Lock()
+
+
+def get_history_archive() -> HistoryArchive:
+    """Return the process-wide chat history archive shared by all sessions."""
+    global _default_archive
+    with _default_archive_lock:
+        if _default_archive is None:
+            _default_archive = HistoryArchive()
+            get_metrics_registry().register_stats(
+                "travel_chat_history_archive", "Archived chat history", _default_archive.stats)
+        return _default_archive
@@ -0,0 +1,182 @@
+"""
+Day-by-day itineraries generated in parallel.
+
+A long trip written in one generation takes time proportional to its
+number of days. ItineraryPlanner first asks for a short outline (one line
+per day), then generates every day's schedule concurrently through the
+LLMHandler, bounded by the backend's admission limit (which covers every
+Ollama host in the pool), and streams the days back in order: the first
+day streams live while later days are buffered until their turn.
+"""
+import contextvars
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ..config import (
+    ITINERARY_DAY_GENERATION, ITINERARY_MAX_DAYS, ITINERARY_MAX_PARALLEL_DAYS, ITINERARY_OUTLINE_GENERATION
+)
+from .reasoning import strip_reasoning
+from .scheduler import get_scheduler
+
+if TYPE_CHECKING:
+    from .llm_handler import LLMHandler
+
+_DAY_LINE = re.compile(r"^\W*day\s*(\d+)\W+(.+?)\s*$", re.IGNORECASE | re.MULTILINE)
+
+
+def trip_days(dates: str) -> Tuple[date, int]:
+    """Return the start date and number of days of a "YYYY-MM-DD to YYYY-MM-DD" range."""
+    try:
+        start, end = (date.fromisoformat(part.strip()) for part in dates.split(" to "))
+    except ValueError:
+        raise ValueError("Select the travel dates to plan an itinerary")
+    days = (end - start).days + 1
+    if days < 1:
+        raise ValueError("The end date must not be before the start date")
+    if days > ITINERARY_MAX_DAYS:
+        raise ValueError(f"Itineraries are limited to {ITINERARY_MAX_DAYS} days")
+    return start, days
+
+
+def build_outline_prompt(destination: str, days: int) -> str:
+    """Build the prompt asking for a one-line theme per day."""
+    return (
+        f"Outline a {days}-day trip to {destination}. Reply with exactly {days} lines, one per day, "
+        f"formatted as \"Day N: theme - main areas or sights\". No other text."
+    )
+
+
+def parse_outline(text: str, days: int, destination: str) -> List[str]:
+    """Return one theme per day; days the model skipped get a generic theme."""
+    themes: Dict[int, str] = {}
+    for match in _DAY_LINE.finditer(strip_reasoning(text)):
+        day = int(match.group(1))
+        if 1 <= day <= days and day not in themes:
+            themes[day] = match.group(2).strip("*_ ")
+    return [themes.get(day) or f"Explore more of {destination}" for day in range(1, days + 1)]
+
+
+def build_day_prompt(destination: str, day: int, themes: Sequence[str]) -> str:
+    """Build the prompt for one day's schedule, with the whole outline so days do not repeat."""
+    outline = "\n".join(f"Day {number}: {theme}" for number, theme in enumerate(themes, 1))
+    return (
+        f"Plan day {day} of a {len(themes)}-day trip to {destination}: {themes[day - 1]}.\n"
+        f"The whole trip, so you do not repeat what other days cover:\n{outline}\n"
+        f"Give a timed schedule for the morning, afternoon and evening, with places to eat. "
+        f"Start directly with the schedule, without a heading."
+    )
+
+
+class ItineraryPlanner:
+    """Plans a multi-day trip as an outline call followed by one generation per day, run concurrently."""
+
+    def __init__(
+        self,
+        handler: "LLMHandler",
+        max_parallel_days: int = ITINERARY_MAX_PARALLEL_DAYS,
+        outline_generation: Optional[Dict] = None,
+        day_generation: Optional[Dict] = None
+    ):
+        self.handler = handler
+        self.max_parallel_days = max_parallel_days
+        self.outline_generation = outline_generation or ITINERARY_OUTLINE_GENERATION
+        self.day_generation = day_generation or ITINERARY_DAY_GENERATION
+
+    def _parallelism(self, days: int) -> int:
+        # More concurrent days than the backend admits would only wait in its queue
+        limit = get_scheduler().limits.get(self.handler.current_model, 1)
+        return max(1, min(days, self.max_parallel_days, limit))
+
+    def outline(self, destination: str, days: int, context: Dict) -> List[str]:
+        """Ask the model for the trip outline (one short call) and return a theme per day."""
+        if days == 1:
+            return [f"Highlights of {destination}"]
+        text = self.handler.chat(build_outline_prompt(destination, days), context, action="itinerary_outline",
+                                 remember=False, generation=self.outline_generation)
+        return parse_outline(text, days, destination)
+
+    def stream(
+        self,
+        destination: str,
+        dates: str,
+        budget: str = "",
+        interests: Optional[Sequence[str]] = None
+    ) -> Iterator[str]:
+        """Stream a day-by-day itinerary in order while the days are generated concurrently."""
+        start, days = trip_days(dates)
+        context = {"destination": destination, "dates": dates, "budget": budget, "interests": list(interests or [])}
+        themes = self.outline(destination, days, context)
+
+        events: "queue.Queue[Tuple[int, Optional[str], Optional[BaseException]]]" = queue.Queue()
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=self._parallelism(days), thread_name_prefix="itinerary")
+        for day in range(1, days + 1):
+            day_context = {**context, "dates": (start + timedelta(days=day - 1)).isoformat()}
+            prompt = build_day_prompt(destination, day, themes)
+            # Worker threads keep the caller's session for admission control
+            executor.submit(contextvars.copy_context().run, self._generate_day, day, prompt, day_context,
+                            events, stop)
+
+        parts: List[str] = []
+        buffered: Dict[int, List[str]] = {day: [] for day in range(1, days + 1)}
+        finished = set()
+        current = 1
+        try:
+            heading = f"### Day 1: {themes[0]}\n\n"
+            parts.append(heading)
+            yield heading
+            while current <= days:
+                day, chunk, error = events.get()
+                if error is not None:
+                    raise RuntimeError(f"Could not plan day {day}: {error}")
+                if chunk is None:
+                    finished.add(day)
+                else:
+                    buffered[day].append(chunk)
+                # Emit everything the days up to the first unfinished one have produced
+                while current <= days:
+                    text = "".join(buffered[current])
+                    buffered[current] = []
+                    if text:
+                        parts.append(text)
+                        yield text
+                    if current not in finished:
+                        break
+                    current += 1
+                    if current <= days:
+                        heading = f"\n\n### Day {current}: {themes[current - 1]}\n\n"
+                        parts.append(heading)
+                        yield heading
+        finally:
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+        # Keep the whole plan in the conversation so follow-up questions can refer to it
+        self.handler.remember(f"Plan a {days}-day itinerary for {destination}", "".join(parts))
+
+    def _generate_day(
+        self,
+        day: int,
+        prompt: str,
+        context: Dict,
+        events: "queue.Queue",
+        stop: threading.Event
+    ) -> None:
+        if stop.is_set():
+            return
+        chunks = self.handler.stream_chat(prompt, context, action="itinerary_day",
+                                          generation=self.day_generation, remember=False)
+        try:
+            for chunk in chunks:
+                if stop.is_set():
+                    return
+                events.put((day, chunk, None))
+            events.put((day, None, None))
+        except Exception as e:
+            events.put((day, None, e))
+        finally:
+            # Aborts the upstream request when the reader has gone away
+            chunks.close()
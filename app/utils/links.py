@@ -0,0 +1,108 @@
+"""
+Booking-link rewriting for quick-action answers.
+
+Provider mentions such as "Booking.com:" are replaced with markdown links
+built from config.BOOKING_PROVIDERS in a single pass of one compiled
+pattern. The rewriter also works on a stream of chunks: it holds back
+only the shortest tail that could still grow into a provider mention, so
+a name split across two chunks is still linked.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, Optional, Pattern, Sequence, Tuple
+from urllib.parse import quote, quote_plus
+
+from ..config import BOOKING_PROVIDERS, QUICK_ACTIONS
+
+
+@lru_cache(maxsize=32)
+def _compile(names: Tuple[str, ...]) -> Tuple[Pattern, frozenset]:
+    """Return the mention pattern and the set of proper prefixes of every mention."""
+    mentions = [f"{name}:" for name in names]
+    # Longest first, so a provider whose name starts with another's still wins; the group
+    # makes pattern.split() return the mentions between the surrounding text
+    pattern = re.compile(
+        "(" + "|".join(re.escape(mention) for mention in sorted(mentions, key=len, reverse=True)) + ")"
+    )
+    prefixes = frozenset(mention[:i] for mention in mentions for i in range(1, len(mention)))
+    return pattern, prefixes
+
+
+def providers_for(action: Optional[str]) -> Sequence[str]:
+    """Return the booking providers linked in answers to a quick action (all of them by default)."""
+    if action in QUICK_ACTIONS:
+        return QUICK_ACTIONS[action].get("providers", list(BOOKING_PROVIDERS))
+    return list(BOOKING_PROVIDERS)
+
+
+class LinkRewriter:
+    def __init__(self, destination: str, providers: Optional[Iterable[str]] = None):
+        names = tuple(providers if providers is not None else BOOKING_PROVIDERS)
+        unknown = [name for name in names if name not in BOOKING_PROVIDERS]
+        if unknown:
+            raise ValueError(f"Unknown booking providers: {', '.join(unknown)}")
+        destination = " ".join(destination.split())
+        values = {"query": quote_plus(destination), "slug": quote(destination.lower().replace(" ", "-"))}
+        self._links: Dict[str, str] = {}
+        for name in names:
+            provider = BOOKING_PROVIDERS[name]
+            label = provider.get("label", f"Book on {name}")
+            self._links[f"{name}:"] = f"[{label}]({provider['url'].format(**values)})"
+        self._pattern, self._prefixes = _compile(names) if names else (None, frozenset())
+        self._max_hold = max((len(mention) - 1 for mention in self._links), default=0)
+        self._pending = ""
+
+    def rewrite(self, text: str) -> str:
+        """Rewrite every provider mention in a complete text."""
+        if self._pattern is None:
+            return text
+        # split/join keeps the per-mention work in C, unlike sub() with a callback
+        parts = self._pattern.split(text)
+        parts[1::2] = map(self._links.__getitem__, parts[1::2])
+        return "".join(parts)
+
+    def _holdback(self, text: str) -> int:
+        # Length of the longest tail that is the start of some provider mention
+        for length in range(min(self._max_hold, len(text)), 0, -1):
+            if text[-length:] in self._prefixes:
+                return length
+        return 0
+
+    def feed(self, chunk: str) -> str:
+        """Rewrite the next streamed chunk; returns the text that is safe to show now."""
+        if self._pattern is None:
+            return chunk
+        text = self._pending + chunk
+        split = len(text) - self._holdback(text)
+        parts = []
+        last = 0
+        for match in self._pattern.finditer(text):
+            if match.start() >= split:
+                break
+            parts.append(text[last:match.start()])
+            parts.append(self._links[match.group(0)])
+            last = match.end()
+        split = max(split, last)
+        parts.append(text[last:split])
+        self._pending = text[split:]
+        return "".join(parts)
+
+    def flush(self) -> str:
+        """Return the held-back tail once the stream has ended."""
+        text, self._pending = self._pending, ""
+        return self.rewrite(text)
+
+    def stream(self, chunks: Iterable[str]) -> Iterator[str]:
+        """Rewrite a stream of chunks, yielding only non-empty output."""
+        for chunk in chunks:
+            text = self.feed(chunk)
+            if text:
+                yield text
+        tail = self.flush()
+        if tail:
+            yield tail
+
+
+def add_booking_links(response: str, destination: str, action: Optional[str] = None) -> str:
+    """Replace booking provider mentions in response with clickable booking links."""
+    return LinkRewriter(destination, providers_for(action)).rewrite(response)
@@ -1,15 +1,122 @@
 import os
-from typing import Optional, Dict, Any
-import requests
-import openai
-from ..config import LLM_MODELS, OPENAI_MODEL, OPENAI_TEMPERATURE
+import uuid
+import asyncio
+import hashlib
+import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Callable, Optional, Dict, Any, Iterator, List, Tuple
+from ..config import (
+    FAILOVER_ENABLED, FAILOVER_POLICY, HEDGE_DELAY, HEDGE_ENABLED, LLM_MODELS, MODEL_INSTRUCTIONS,
+    OLLAMA_CONTEXT_TOKEN_BUDGET, OLLAMA_REUSE_CONTEXT, OLLAMA_WARMUP, QUICK_ACTIONS, RETRIEVAL_ENABLED,
+    RETRIEVAL_GENERATION, SEMANTIC_CACHE_ENABLED, STRUCTURED_GENERATION
+)
+from .memory import ConversationMemory, estimate_tokens
+from .metrics import CallTracker, llm_failovers, llm_hedges, retrieval_lookups
+from .cache import ResponseCache, get_response_cache, make_cache_key
+from .clients import get_async_client, get_client
+from .health import BackendRejected, CircuitBreaker, get_circuit_breaker, get_health_prober, is_backend_failure
+from .ollama_client import start_warmup
+from .reasoning import strip_reasoning
+from .scheduler import AdmissionError, current_session, get_scheduler
+from .singleflight import SingleFlight, get_single_flight
+
+if TYPE_CHECKING:
+    from .retrieval import ResponseIndex
+    from .semantic_cache import SemanticCache
+    from .structured import Record
+
+# Runs the primary call of a hedged request so the backup can start while it is pending
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+
+
+class _Upstream:
+    """One upstream generation: what to send to each backend and which Ollama state it continues."""
+
+    def __init__(
+        self,
+        prompt: str,
+        call: Optional[CallTracker] = None,
+        priority: str = "interactive",
+        conversational: bool = False,
+        generation: Optional[Dict[str, Any]] = None
+    ):
+        self.prompt = prompt
+        # The prompt with the history written out, for backends that cannot continue the context
+        self.full_prompt = prompt
+        self.call = call
+        self.priority = priority
+        # Free-text turns carry the conversation; only they move the session's Ollama state on
+        self.conversational = conversational
+        self.history = ""
+        self.context: Optional[List[int]] = None
+        self.affinity: Optional[str] = None
+        self.exchange = 0
+        # The quick action's generation profile; each backend's own defaults go underneath
+        self.generation = generation or {}
+        # Answers grounded in retrieved excerpts are not indexed again
+        self.grounded = False
+
+    def arguments(self, backend: str, metadata: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """Return the prompt and extra client arguments for backend."""
+        generation = generation_profile(backend, self.generation)
+        if backend != "ollama":
+            # LangChain passes these through to the chat completions request
+            kwargs = {key: generation[key] for key in ("max_tokens", "temperature") if generation.get(key) is not None}
+            if generation.get("stop"):
+                kwargs["stop"] = list(generation["stop"])
+            return self.full_prompt, kwargs
+        return self.prompt, {"context": self.context, "affinity": self.affinity, "metadata": metadata,
+                             "generation": generation}
+
+
+def generation_profile(backend: str, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Return backend's generation profile with a quick action's (or caller's) settings applied on top."""
+    return {**LLM_MODELS[backend].get("generation", {}), **(overrides or {})}
+
 
 class LLMHandler:
-    def __init__(self):
+    def __init__(
+        self,
+        cache: Optional[ResponseCache] = None,
+        use_cache: bool = True,
+        single_flight: Optional[SingleFlight] = None,
+        semantic_cache: Optional["SemanticCache"] = None,
+        response_index: Optional["ResponseIndex"] = None,
+        use_memory: bool = True,
+        session_id: Optional[str] = None,
+        cache_ttl: Optional[float] = None,
+        on_remember: Optional[Callable[[str, str], None]] = None
+    ):
+        self.cache = (cache or get_response_cache()) if use_cache else None
+        # Seconds new answers stay cached; None uses the cache's default (CACHE_DURATION)
+        self.cache_ttl = cache_ttl
+        # The semantic cache pulls in NumPy, so it is only loaded for the first free-text question
+        self._semantic_cache = semantic_cache
+        self._use_semantic_cache = use_cache and SEMANTIC_CACHE_ENABLED
+        # So does the index of earlier answers that free-text questions are first looked up in
+        self._response_index = response_index
+        self._use_retrieval = use_cache and RETRIEVAL_ENABLED
+        self.single_flight = single_flight or get_single_flight()
+        # Conversation memory is per-session state; shared handlers (e.g. the API) disable it
+        self.memory = ConversationMemory() if use_memory else None
+        # Identifies this session to the admission scheduler so sessions share backends fairly
+        self.session_id = session_id or uuid.uuid4().hex
+        # Called with each exchange added to the memory, e.g. to persist the session
+        self.on_remember = on_remember
+        self.token_stats = {"calls": 0, "prompt_tokens": 0, "last_prompt_tokens": 0, "max_prompt_tokens": 0}
         self.current_model = None
+        self.api_key = None
         self.assistant = None
         self.model_config = None
-        self.travel_context = "You are a helpful travel assistant. Help users plan their trips, suggest destinations, activities, and provide travel tips."
+        self.travel_context = "\n".join([
+            "You are a helpful travel assistant. Help users plan their trips, suggest destinations, activities, and provide travel tips.",
+            *MODEL_INSTRUCTIONS
+        ])
+        # The context Ollama returned for this session's conversation, the host holding it in cache,
+        # and how many exchanges it covers; only valid while that matches the exchanges remembered
+        self.reuse_context = OLLAMA_REUSE_CONTEXT and self.memory is not None
+        self._ollama_state: Dict[str, Any] = {"context": None, "host": None, "exchange": 0}
+        self._exchanges = 0
 
     def initialize_model(self, model_type: str, api_key: Optional[str] = None) -> Any:
         """Initialize the selected LLM model."""
@@ -27,18 +134,18 @@ class LLMHandler:
     def _initialize_ollama(self) -> Any:
         """Initialize Ollama model."""
         try:
-            # Check if Ollama is running
-            response = requests.get('http://localhost:11434/api/version')
-            if response.status_code != 200:
-                raise ConnectionError("Ollama service is not running")
-
-            # Import here to avoid dependency issues if not using Ollama
-            from langchain_community.llms import Ollama
-            
-            self.assistant = Ollama(
-                model=self.model_config["model"],
-                system=self.travel_context
-            )
+            # Only the cached background probe is consulted, so initializing never waits on the network;
+            # until the first probe finishes the status is unknown and calls go ahead
+            prober = get_health_prober()
+            prober.watch("ollama", *self._fallbacks("ollama"))
+            status = prober.status("ollama")
+            if status is not None and not status.healthy and not self._fallbacks("ollama"):
+                raise ConnectionError(f"Ollama service is not running ({status.error})")
+
+            self.assistant = get_client("ollama", system=self.travel_context)
+            if OLLAMA_WARMUP:
+                # Load the model and evaluate the system prompt before the first question arrives
+                start_warmup(self.assistant)
             return self.assistant
 
         except Exception as e:
@@ -50,39 +157,684 @@ class LLMHandler:
             raise ValueError("OpenAI API key is required")
 
         try:
-            openai.api_key = api_key
-            
-            # Import here to avoid dependency issues if not using OpenAI
-            from langchain_openai import ChatOpenAI
-            
-            self.assistant = ChatOpenAI(
-                model=OPENAI_MODEL,
-                temperature=OPENAI_TEMPERATURE,
-                api_key=api_key
-            )
+            self.assistant = get_client("openai", api_key=api_key)
+            self.api_key = api_key
+            get_health_prober().watch("openai", *self._fallbacks("openai"))
             return self.assistant
 
         except Exception as e:
             raise ConnectionError(f"Failed to initialize OpenAI: {str(e)}")
 
-    def chat(self, prompt: str, context: Optional[Dict[str, str]] = None) -> str:
+    def chat(
+        self,
+        prompt: str,
+        context: Optional[Dict[str, str]] = None,
+        action: Optional[str] = None,
+        priority: Optional[str] = None,
+        remember: bool = True,
+        generation: Optional[Dict[str, Any]] = None
+    ) -> str:
         """Send a chat message to the current model with travel context."""
         if not self.assistant:
             raise RuntimeError("No model initialized. Call initialize_model first.")
 
+        call = self._track(action)
+        priority = priority or self._priority(action)
+        try:
+            # Enhance prompt with travel context and conversation history
+            request, cache_key, semantic_key = self._prepare(prompt, context, action, call, priority, generation)
+            cached = self._cached(cache_key, semantic_key)
+            outcome = "cache_hit"
+            if cached is None:
+                # Earlier answers for the destination may already hold the answer
+                cached, request, cache_key = self._retrieve(prompt, context, action, request, cache_key)
+                outcome = "retrieval"
+            if cached is not None:
+                call.outcome = outcome
+                call.finish(estimate_tokens(cached))
+                if remember:
+                    self.remember(prompt, cached)
+                return cached
+
+            def generate() -> str:
+                # A request that just finished may have filled the cache meanwhile
+                cached = self._cached(cache_key)
+                if cached is not None:
+                    call.outcome = "cache_hit"
+                    return cached
+                call.outcome = "upstream"
+                self._count_prompt_tokens(request.prompt, call)
+                text, backend = self._invoke(request)
+                if backend == self.current_model:
+                    self._store(cache_key, text, semantic_key)
+                    self._index(request, context, text)
+                return text
+
+            # Identical concurrent requests share one upstream call
+            call.outcome = "coalesced"
+            text = self.single_flight.do(cache_key, generate)
+            call.finish(estimate_tokens(text))
+            if remember:
+                self.remember(prompt, text)
+            return text
+        except AdmissionError as e:
+            # Already a RuntimeError with a message meant for the user
+            call.finish(error=e)
+            raise
+        except Exception as e:
+            call.finish(error=e)
+            raise RuntimeError(f"Error during chat: {str(e)}")
+
+    def stream_chat(
+        self,
+        prompt: str,
+        context: Optional[Dict[str, str]] = None,
+        action: Optional[str] = None,
+        priority: Optional[str] = None,
+        generation: Optional[Dict[str, Any]] = None,
+        remember: bool = True
+    ) -> Iterator[str]:
+        """Stream a chat response from the current model chunk by chunk."""
+        if not self.assistant:
+            raise RuntimeError("No model initialized. Call initialize_model first.")
+
+        call = self._track(action)
+        priority = priority or self._priority(action)
+        try:
+            request, cache_key, semantic_key = self._prepare(prompt, context, action, call, priority, generation)
+            cached = self._cached(cache_key, semantic_key)
+            outcome = "cache_hit"
+            if cached is None:
+                # Earlier answers for the destination may already hold the answer
+                cached, request, cache_key = self._retrieve(prompt, context, action, request, cache_key)
+                outcome = "retrieval"
+            if cached is not None:
+                call.outcome = outcome
+                call.first_token()
+                call.finish(estimate_tokens(cached))
+                if remember:
+                    self.remember(prompt, cached)
+                yield cached
+                return
+
+            def generate() -> Iterator[str]:
+                cached = self._cached(cache_key)
+                if cached is not None:
+                    call.outcome = "cache_hit"
+                    yield cached
+                    return
+                call.outcome = "upstream"
+                self._count_prompt_tokens(request.prompt, call)
+                chunks = []
+                served_by = []
+                for text in self._stream(request, served_by):
+                    chunks.append(text)
+                    yield text
+                if served_by == [self.current_model]:
+                    self._store(cache_key, "".join(chunks), semantic_key)
+                    self._index(request, context, "".join(chunks))
+
+            call.outcome = "coalesced"
+            received = []
+            for chunk in self.single_flight.stream(cache_key, generate):
+                call.first_token()
+                received.append(chunk)
+                yield chunk
+            response = "".join(received)
+            call.finish(estimate_tokens(response))
+            if remember:
+                self.remember(prompt, response)
+        except GeneratorExit as e:
+            # The caller stopped reading (e.g. the user left the page)
+            call.finish(error=e)
+            raise
+        except AdmissionError as e:
+            # Already a RuntimeError with a message meant for the user
+            call.finish(error=e)
+            raise
+        except Exception as e:
+            call.finish(error=e)
+            raise RuntimeError(f"Error during chat: {str(e)}")
+
+    async def achat(
+        self,
+        prompt: str,
+        context: Optional[Dict[str, str]] = None,
+        action: Optional[str] = None,
+        priority: Optional[str] = None,
+        generation: Optional[Dict[str, Any]] = None,
+        remember: bool = True
+    ) -> str:
+        """Send a chat message asynchronously using the backend's async client."""
+        if not self.assistant:
+            raise RuntimeError("No model initialized. Call initialize_model first.")
+
+        call = self._track(action)
+        priority = priority or self._priority(action)
         try:
-            # Enhance prompt with travel context if provided
-            enhanced_prompt = self._build_travel_prompt(prompt, context)
-            response = self.assistant.invoke(enhanced_prompt)
-            return response.content if hasattr(response, 'content') else str(response)
+            request, cache_key, semantic_key = self._prepare(prompt, context, action, call, priority, generation)
+            cached = self._cached(cache_key, semantic_key)
+            outcome = "cache_hit"
+            if cached is None:
+                # Earlier answers for the destination may already hold the answer
+                cached, request, cache_key = self._retrieve(prompt, context, action, request, cache_key)
+                outcome = "retrieval"
+            if cached is not None:
+                call.outcome = outcome
+                call.finish(estimate_tokens(cached))
+                if remember:
+                    self.remember(prompt, cached)
+                return cached
+
+            async def generate() -> str:
+                cached = self._cached(cache_key)
+                if cached is not None:
+                    call.outcome = "cache_hit"
+                    return cached
+                call.outcome = "upstream"
+                self._count_prompt_tokens(request.prompt, call)
+                text, backend = await self._ainvoke(request)
+                if backend == self.current_model:
+                    self._store(cache_key, text, semantic_key)
+                    self._index(request, context, text)
+                return text
+
+            call.outcome = "coalesced"
+            text = await self.single_flight.ado(cache_key, generate)
+            call.finish(estimate_tokens(text))
+            if remember:
+                self.remember(prompt, text)
+            return text
+        except AdmissionError as e:
+            # Already a RuntimeError with a message meant for the user
+            call.finish(error=e)
+            raise
         except Exception as e:
+            call.finish(error=e)
             raise RuntimeError(f"Error during chat: {str(e)}")
 
-    def _build_travel_prompt(self, prompt: str, context: Optional[Dict[str, str]] = None) -> str:
-        """Build a travel-specific prompt with context."""
-        if not context:
-            return prompt
+    def structured_results(
+        self,
+        action: str,
+        destination: str,
+        priority: Optional[str] = None
+    ) -> Tuple[List["Record"], bool]:
+        """Return the validated records for a quick action at destination, and whether they were stored.
+
+        The records cover every budget, so callers filter them locally instead of asking again.
+        """
+        from .structured import build_structured_prompt, get_structured_store, parse_records
+
+        store = get_structured_store()
+        model = (self.current_model, self._model_name())
+        records = store.get(model, action, destination)
+        if records is not None:
+            return records, True
+
+        prompt = build_structured_prompt(action, destination)
+        context = {"destination": destination}
+        # Raw JSON is no use as conversation history
+        text = self.chat(prompt, context, action=action, priority=priority, remember=False,
+                         generation=STRUCTURED_GENERATION)
+        try:
+            records = parse_records(action, text)
+        except ValueError:
+            # Do not keep serving an unusable answer from the response cache
+            if self.cache is not None:
+                self.cache.delete(self.cache_key(prompt, context, action, STRUCTURED_GENERATION))
+            raise
+        store.set(model, action, destination, records)
+        return records, False
+
+    def has_structured_results(self, action: str, destination: str) -> bool:
+        """Return True if structured_results(action, destination) would be answered without a model call."""
+        from .structured import get_structured_store
+
+        return get_structured_store().get((self.current_model, self._model_name()), action, destination) is not None
+
+    def cache_key(
+        self,
+        prompt: str,
+        context: Optional[Dict[str, str]] = None,
+        action: Optional[str] = None,
+        generation: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Return the response cache key a chat call with these arguments is stored under."""
+        return self._prepare(prompt, context, action, generation=generation)[1]
+
+    def is_cached(self, cache_key: str) -> bool:
+        """Return True if the response cache holds an answer under cache_key."""
+        return self._cached(cache_key) is not None
+
+    def _api_key_for(self, backend: str) -> Optional[str]:
+        if backend != "openai":
+            return None
+        return self.api_key or os.getenv("OPENAI_API_KEY") or None
+
+    def _fallbacks(self, backend: str) -> List[str]:
+        """Return the configured failover targets for backend that can actually be used."""
+        if not FAILOVER_ENABLED:
+            return []
+        return [
+            fallback for fallback in FAILOVER_POLICY.get(backend, [])
+            if fallback in LLM_MODELS and (fallback != "openai" or self._api_key_for(fallback))
+        ]
+
+    def _backend_order(self) -> List[str]:
+        """Return the backends to try: healthy ones first, slow ones after, down ones skipped."""
+        prober = get_health_prober()
+        healthy, slow = [], []
+        for backend in [self.current_model] + self._fallbacks(self.current_model):
+            status = prober.status(backend)
+            breaker = get_circuit_breaker(backend, self._api_key_for(backend))
+            if not breaker.available() or (status is not None and not status.healthy):
+                continue
+            (slow if status is not None and status.slow else healthy).append(backend)
+        # If everything looks down, still try the selected backend; the probe may be stale
+        return healthy + slow or [self.current_model]
+
+    def _client_for(self, backend: str) -> Any:
+        if backend == self.current_model:
+            return self.assistant
+        system = self.travel_context if backend == "ollama" else None
+        return get_client(backend, api_key=self._api_key_for(backend), system=system)
+
+    def _async_client_for(self, backend: str) -> Any:
+        system = self.travel_context if backend == "ollama" else None
+        return get_async_client(backend, api_key=self._api_key_for(backend), system=system)
+
+    def _unavailable(self, errors: List[str]) -> ConnectionError:
+        name = self.model_config["name"]
+        detail = "; ".join(errors) or "circuit open"
+        if self._fallbacks(self.current_model):
+            return ConnectionError(f"{name} and its fallback backends are unavailable ({detail})")
+        hint = "Start it with `ollama serve`" if self.current_model == "ollama" else "Check your network and API key"
+        return ConnectionError(f"{name} is unavailable ({detail}). {hint}, or configure a fallback backend.")
+
+    def _served_by(self, backend: str) -> None:
+        if backend != self.current_model:
+            llm_failovers.inc(self.current_model, backend)
+
+    def _priority(self, action: Optional[str]) -> str:
+        # Questions typed into the chat are interactive; quick actions are bulk work
+        return "interactive" if action is None else "bulk"
+
+    def _session(self) -> str:
+        return current_session.get() or self.session_id
+
+    def _call_backend(self, backend: str, request: _Upstream) -> str:
+        """Invoke one backend through admission control and its circuit breaker."""
+        with get_scheduler().slot(backend, request.priority, self._session()):
+            request.call.dispatched(request.call.prompt_tokens)
+            breaker = get_circuit_breaker(backend, self._api_key_for(backend))
+            if not breaker.allow():
+                raise ConnectionError(f"{backend}: circuit open")
+            metadata: Dict[str, Any] = {}
+            prompt, kwargs = request.arguments(backend, metadata)
+            try:
+                text = self._response_text(self._client_for(backend).invoke(prompt, **kwargs))
+            except Exception as e:
+                raise self._backend_error(backend, breaker, e) from e
+            breaker.record_success()
+            self._advance_ollama_state(backend, request, metadata)
+            return text
+
+    async def _acall_backend(self, backend: str, request: _Upstream) -> str:
+        async with get_scheduler().aslot(backend, request.priority, self._session()):
+            request.call.dispatched(request.call.prompt_tokens)
+            breaker = get_circuit_breaker(backend, self._api_key_for(backend))
+            if not breaker.allow():
+                raise ConnectionError(f"{backend}: circuit open")
+            metadata: Dict[str, Any] = {}
+            prompt, kwargs = request.arguments(backend, metadata)
+            try:
+                text = self._response_text(await self._async_client_for(backend).ainvoke(prompt, **kwargs))
+            except Exception as e:
+                raise self._backend_error(backend, breaker, e) from e
+            breaker.record_success()
+            self._advance_ollama_state(backend, request, metadata)
+            return text
+
+    @staticmethod
+    def _backend_error(backend: str, breaker: CircuitBreaker, error: Exception) -> Exception:
+        """Record a failed call on the backend's breaker and return the exception to raise for it.
+
+        Only failures of the backend itself count against its circuit and lead to failover; a
+        request the backend refused (e.g. 401 for a bad API key) is reported to the caller as is.
+        """
+        if not is_backend_failure(error):
+            breaker.release()
+            return BackendRejected(f"{backend}: {error}")
+        breaker.record_failure()
+        return ConnectionError(f"{backend}: {error}")
+
+    def _invoke(self, request: _Upstream) -> Tuple[str, str]:
+        """Invoke the model with failover (and hedging, if enabled); returns (text, backend)."""
+        order = self._backend_order()
+        if HEDGE_ENABLED and len(order) > 1:
+            return self._hedged_invoke(request, order)
+        errors = []
+        for backend in order:
+            try:
+                text = self._call_backend(backend, request)
+            except ConnectionError as e:
+                errors.append(str(e))
+                continue
+            self._served_by(backend)
+            return text, backend
+        raise self._unavailable(errors)
+
+    def _hedged_invoke(self, request: _Upstream, order: List[str]) -> Tuple[str, str]:
+        """Start the first backup if the primary has not answered within HEDGE_DELAY."""
+        pending = {_hedge_executor.submit(self._call_backend, order[0], request): order[0]}
+        done, _ = wait(pending, timeout=HEDGE_DELAY)
+        if not done:
+            llm_hedges.inc(order[1])
+            pending[_hedge_executor.submit(self._call_backend, order[1], request)] = order[1]
+        errors = []
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                backend = pending.pop(future)
+                try:
+                    text = future.result()
+                except ConnectionError as e:
+                    errors.append(str(e))
+                    continue
+                self._served_by(backend)
+                return text, backend
+        # Both hedged calls failed; try any remaining fallbacks in order
+        for backend in order[2:]:
+            try:
+                text = self._call_backend(backend, request)
+            except ConnectionError as e:
+                errors.append(str(e))
+                continue
+            self._served_by(backend)
+            return text, backend
+        raise self._unavailable(errors)
+
+    async def _ainvoke(self, request: _Upstream) -> Tuple[str, str]:
+        """Async variant of _invoke."""
+        order = self._backend_order()
+        errors = []
+        if HEDGE_ENABLED and len(order) > 1:
+            tasks = {asyncio.ensure_future(self._acall_backend(order[0], request)): order[0]}
+            done, _ = await asyncio.wait(tasks, timeout=HEDGE_DELAY)
+            if not done:
+                llm_hedges.inc(order[1])
+                tasks[asyncio.ensure_future(self._acall_backend(order[1], request))] = order[1]
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    backend = tasks.pop(task)
+                    try:
+                        text = task.result()
+                    except ConnectionError as e:
+                        errors.append(str(e))
+                        continue
+                    except BackendRejected:
+                        for other in tasks:
+                            other.cancel()
+                        raise
+                    for other in tasks:
+                        other.cancel()
+                    self._served_by(backend)
+                    return text, backend
+            order = order[2:]
+        for backend in order:
+            try:
+                text = await self._acall_backend(backend, request)
+            except ConnectionError as e:
+                errors.append(str(e))
+                continue
+            self._served_by(backend)
+            return text, backend
+        raise self._unavailable(errors)
+
+    def _stream(self, request: _Upstream, served_by: List[str]) -> Iterator[str]:
+        """Stream from the first available backend, failing over only before any output."""
+        errors = []
+        for backend in self._backend_order():
+            with get_scheduler().slot(backend, request.priority, self._session()):
+                request.call.dispatched(request.call.prompt_tokens)
+                breaker = get_circuit_breaker(backend, self._api_key_for(backend))
+                if not breaker.allow():
+                    errors.append(f"{backend}: circuit open")
+                    continue
+                started = False
+                metadata: Dict[str, Any] = {}
+                prompt, kwargs = request.arguments(backend, metadata)
+                try:
+                    for chunk in self._client_for(backend).stream(prompt, **kwargs):
+                        text = self._response_text(chunk)
+                        if text:
+                            started = True
+                            yield text
+                except GeneratorExit:
+                    # The reader stopped early; the backend itself was fine
+                    breaker.record_success()
+                    raise
+                except Exception as e:
+                    error = self._backend_error(backend, breaker, e)
+                    if started:
+                        raise
+                    if isinstance(error, BackendRejected):
+                        raise error from e
+                    errors.append(str(error))
+                    continue
+                breaker.record_success()
+                self._advance_ollama_state(backend, request, metadata)
+            self._served_by(backend)
+            served_by.append(backend)
+            return
+        raise self._unavailable(errors)
+
+    def _prepare(
+        self,
+        prompt: str,
+        context: Optional[Dict[str, str]],
+        action: Optional[str],
+        call: Optional[CallTracker] = None,
+        priority: str = "interactive",
+        generation: Optional[Dict[str, Any]] = None
+    ) -> Tuple[_Upstream, str, Optional[Tuple[str, str]]]:
+        """Return the upstream request, its cache key and the semantic cache key."""
+        # Quick actions are self-contained; only free-text questions carry the conversation
+        conversational = self.memory is not None and action is None
+        history = self.memory.render() if conversational else ""
+        if action in QUICK_ACTIONS:
+            generation = {**QUICK_ACTIONS[action].get("generation", {}), **(generation or {})}
+        request = _Upstream(
+            self._build_travel_prompt(prompt, context, history), call, priority, conversational, generation
+        )
+        request.history = history
+        cache_key = self._cache_key(request.prompt, generation=request.generation)
+        if conversational:
+            request.affinity = self._ollama_state["host"]
+            request.exchange = self._exchanges
+            tokens = self._ollama_context()
+            if tokens:
+                # Ollama already holds the conversation so far; send only the new question
+                request.context = tokens
+                request.prompt = self._build_travel_prompt(prompt, context)
+                cache_key = self._cache_key(request.prompt, tokens, request.generation)
+        return request, cache_key, self._semantic_key(prompt, context, action, history)
+
+    def _ollama_context(self) -> Optional[List[int]]:
+        """Return the context to continue this session's conversation from, if it is still current."""
+        state = self._ollama_state
+        if not self.reuse_context or self.current_model != "ollama" or state["exchange"] != self._exchanges:
+            # A turn answered from the cache or by another backend is missing from the context
+            return None
+        return state["context"]
+
+    def _advance_ollama_state(self, backend: str, request: _Upstream, metadata: Dict[str, Any]) -> None:
+        """Keep the context and host of a free-text turn that has just been generated."""
+        if not request.conversational:
+            return
+        context = metadata.get("context") if backend == "ollama" and self.reuse_context else None
+        if context and len(context) > OLLAMA_CONTEXT_TOKEN_BUDGET:
+            # Fall back to the summarized history rather than let the server truncate the context
+            context = None
+        self._ollama_state = {
+            "context": context,
+            "host": metadata.get("host", self._ollama_state["host"]),
+            "exchange": request.exchange + 1,
+        }
+
+    def _semantic_key(
+        self,
+        prompt: str,
+        context: Optional[Dict[str, str]],
+        action: Optional[str],
+        history: str = ""
+    ) -> Optional[Tuple[str, str]]:
+        """Return (partition, query) for free-text questions; quick actions use exact matching only."""
+        # Follow-up questions depend on the conversation, so they never match other sessions
+        if not self._use_semantic_cache or action is not None or history:
+            return None
+        cache = self.semantic_cache
+        return cache.partition_key((self.current_model, self._model_name()), context), cache.query_text(prompt, context)
+
+    @property
+    def semantic_cache(self) -> Optional["SemanticCache"]:
+        if self._semantic_cache is None and self._use_semantic_cache:
+            from .semantic_cache import get_semantic_cache
+
+            self._semantic_cache = get_semantic_cache()
+        return self._semantic_cache
+
+    @property
+    def response_index(self) -> Optional["ResponseIndex"]:
+        if self._response_index is None and self._use_retrieval:
+            from .retrieval import get_response_index
+
+            self._response_index = get_response_index()
+        return self._response_index
+
+    def _retrieve(
+        self,
+        prompt: str,
+        context: Optional[Dict[str, str]],
+        action: Optional[str],
+        request: _Upstream,
+        cache_key: str
+    ) -> Tuple[Optional[str], _Upstream, str]:
+        """Look a free-text question up in earlier answers for its destination, budget and interests.
+
+        Returns the answer when the excerpts alone answer it, and otherwise the request and cache
+        key to use: a short generation grounded in the excerpts when they partly answer it.
+        """
+        context = context or {}
+        destination = context.get("destination")
+        if not self._use_retrieval or action is not None or not destination:
+            return None, request, cache_key
+        from .retrieval import build_grounded_prompt, classify, format_answer, refers_back
+
+        if refers_back(prompt):
+            # "Is it open on Sundays?" is about something in the conversation the index cannot see
+            return None, request, cache_key
+        confidence, excerpts = self.response_index.lookup(
+            destination, prompt, context.get("budget") or "", context.get("interests") or ()
+        )
+        result = classify(confidence, prompt)
+        if result == "answered" and request.history:
+            # A follow-up may depend on the conversation, so the model answers it from the excerpts
+            result = "grounded"
+        retrieval_lookups.inc(result)
+        if result == "answered":
+            return format_answer(destination, excerpts), request, cache_key
+        if result == "grounded":
+            # Reasoning is not needed to answer from the excerpts
+            grounded = _Upstream(
+                self._build_travel_prompt(build_grounded_prompt(prompt, destination, excerpts), context,
+                                          request.history),
+                request.call, request.priority, generation=dict(RETRIEVAL_GENERATION)
+            )
+            grounded.grounded = True
+            return None, grounded, self._cache_key(grounded.prompt, generation=grounded.generation)
+        return None, request, cache_key
+
+    def _index(self, request: _Upstream, context: Optional[Dict[str, str]], text: str) -> None:
+        """Add a newly generated answer to the retrieval index of its destination, budget and interests."""
+        context = context or {}
+        destination = context.get("destination")
+        if not self._use_retrieval or not destination or request.grounded:
+            return
+        # Structured results are JSON, which makes poor excerpts
+        if text.lstrip().startswith(("{", "[", "```")):
+            return
+        self.response_index.add(destination, text, context.get("budget") or "", context.get("interests") or ())
+
+    def remember(self, prompt: str, response: str) -> None:
+        """Add an exchange to the conversation, e.g. one assembled from several calls made with remember=False."""
+        if self.memory is not None:
+            self.memory.add_turn("user", prompt)
+            self.memory.add_turn("assistant", response)
+            self._exchanges += 1
+            if self.on_remember is not None:
+                self.on_remember(prompt, response)
+
+    def _track(self, action: Optional[str]) -> CallTracker:
+        return CallTracker(self.current_model, self._model_name(), action or "chat")
+
+    def _count_prompt_tokens(self, enhanced_prompt: str, call: CallTracker) -> None:
+        tokens = estimate_tokens(enhanced_prompt)
+        # dispatched() is recorded once admission control lets the call through
+        call.prompt_tokens = tokens
+        self.token_stats["calls"] += 1
+        self.token_stats["prompt_tokens"] += tokens
+        self.token_stats["last_prompt_tokens"] = tokens
+        self.token_stats["max_prompt_tokens"] = max(self.token_stats["max_prompt_tokens"], tokens)
+
+    def _cached(self, cache_key: str, semantic_key: Optional[Tuple[str, str]] = None) -> Optional[str]:
+        cached = self.cache.get(cache_key) if self.cache is not None else None
+        if cached is None and semantic_key is not None:
+            cached = self.semantic_cache.get(*semantic_key)
+        return cached
+
+    def _store(self, cache_key: str, text: str, semantic_key: Optional[Tuple[str, str]] = None) -> None:
+        if not strip_reasoning(text).strip():
+            # An answer the reasoning trace crowded out must be generated again, not served for an hour
+            return
+        if self.cache is not None:
+            self.cache.set(cache_key, text, ttl=self.cache_ttl)
+        if semantic_key is not None:
+            self.semantic_cache.set(*semantic_key, text)
+
+    @staticmethod
+    def _response_text(response: Any) -> str:
+        """Extract text from an LLM response or stream chunk."""
+        return response.content if hasattr(response, 'content') else str(response)
+
+    def _cache_key(
+        self,
+        enhanced_prompt: str,
+        context: Optional[List[int]] = None,
+        generation: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Build the response cache key for the current model, prompt, generation settings and Ollama context."""
+        temperature = getattr(self.assistant, 'temperature', None)
+        profile = generation_profile(self.current_model, generation)
+        if profile:
+            temperature = [temperature, sorted(profile.items())]
+        if context:
+            digest = hashlib.sha256(json.dumps(context).encode("utf-8")).hexdigest()
+            enhanced_prompt = f"{digest}\n{enhanced_prompt}"
+        return make_cache_key(self.current_model, self._model_name(), temperature, enhanced_prompt)
+
+    def _model_name(self) -> str:
+        return getattr(self.assistant, 'model_name', None) or self.model_config["model"]
 
+    def _build_travel_prompt(
+        self,
+        prompt: str,
+        context: Optional[Dict[str, str]] = None,
+        history: str = ""
+    ) -> str:
+        """Build a travel-specific prompt with context and conversation history."""
+        context = context or {}
         context_str = []
         if context.get('destination'):
             context_str.append(f"Destination: {context['destination']}")
@@ -93,8 +845,13 @@ class LLMHandler:
         if context.get('interests'):
             context_str.append(f"Interests: {', '.join(context['interests'])}")
 
+        sections = []
         if context_str:
-            return f"Context: {'. '.join(context_str)}\n\nQuery: {prompt}"
+            sections.append(f"Context: {'. '.join(context_str)}")
+        if history:
+            sections.append(f"Conversation so far:\n{history}")
+        if sections:
+            return "\n\n".join(sections) + f"\n\nQuery: {prompt}"
         return prompt
 
     def get_current_model(self) -> Dict[str, Any]:
@@ -0,0 +1,156 @@
+"""
+Token-budgeted multi-turn conversation memory.
+
+Recent turns are kept verbatim while they fit the token budget; turns that
+fall out of the window are folded into a rolling summary one at a time, so
+the history sent with each prompt stays bounded however long a session runs.
+The newest exchange is always kept, shortened if it alone exceeds the
+budget, so a follow-up such as "the second hotel" still has its referent.
+"""
+import re
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from ..config import MEMORY_SUMMARY_TOKEN_BUDGET, MEMORY_TOKEN_BUDGET
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+_NUMBERED = re.compile(r"^(?:#{1,6}\s+)?\d+[.)]\s+(.+)$")
+_HEADING = re.compile(r"^(?:#{1,6}\s+(.+)|\*\*([^*]+)\*\*:?)$")
+_BULLET = re.compile(r"^[-*•]\s+(.+)$")
+_LABEL_END = re.compile(r"\s[-–—]\s|:\s|(?<=[.!?])\s|\s\(")
+# Turns of the newest exchange (the question and its answer), never moved to the summary
+_NEWEST_TURNS = 2
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count (about four characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+def _shorten(text: str, max_words: int) -> str:
+    words = text.split()
+    return " ".join(words[:max_words]) + "..." if len(words) > max_words else " ".join(words)
+
+
+def list_headings(content: str, limit: int = 10) -> List[str]:
+    """Return the names of an answer's numbered items and headings (or, failing those, its bullets)."""
+    headings, bullets = [], []
+    for line in content.splitlines():
+        # Indented lines are details of an item, such as its booking links
+        if not line or line[0].isspace():
+            continue
+        line = line.strip()
+        numbered, heading, bullet = _NUMBERED.match(line), _HEADING.match(line), _BULLET.match(line)
+        match = numbered or heading
+        text = next((group for group in match.groups() if group), "") if match else ""
+        label = _shorten(_LABEL_END.split(text.replace("*", "").replace("#", "").strip(), maxsplit=1)[0], 8)
+        if label and match:
+            headings.append(label)
+        elif bullet:
+            bullets.append(_shorten(_LABEL_END.split(bullet.group(1).replace("*", ""), maxsplit=1)[0], 8))
+    return (headings or bullets)[:limit]
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text at a line break (or word) so it fits max_tokens, marking the cut."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(0, max_tokens * 4 - 8)
+    cut = text.rfind("\n", 0, limit)
+    if cut < limit // 2:
+        cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > 0 else limit].rstrip() + "\n[...]"
+
+
+def extractive_summary(summary: str, role: str, content: str, max_tokens: int) -> str:
+    """Fold one evicted turn into the summary by keeping its first sentence and the items it listed.
+
+    Only the new turn is processed; when the summary outgrows max_tokens its
+    oldest lines are dropped.
+    """
+    first_sentence = _shorten(_SENTENCE_END.split(" ".join(content.split()), maxsplit=1)[0], 30)
+    headings = list_headings(content)
+    if headings:
+        # Later turns refer to listed hotels, days or dishes by name or position
+        first_sentence += " Listed: " + "; ".join(f"{number}. {heading}" for number, heading in enumerate(headings, 1))
+    lines = summary.splitlines() if summary else []
+    lines.append(f"- {'User' if role == 'user' else 'Assistant'}: {first_sentence}")
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ConversationMemory:
+    def __init__(
+        self,
+        token_budget: int = MEMORY_TOKEN_BUDGET,
+        summary_token_budget: int = MEMORY_SUMMARY_TOKEN_BUDGET,
+        summarizer: Optional[Callable[[str, str, str, int], str]] = None
+    ):
+        self.token_budget = token_budget
+        self.summary_token_budget = summary_token_budget
+        self.summarizer = summarizer or extractive_summary
+        self.turns: Deque[Tuple[str, str, int]] = deque()
+        self.summary = ""
+        self._turn_tokens = 0
+
+    def add_turn(self, role: str, content: str) -> None:
+        """Record a turn and summarize whatever no longer fits the token budget."""
+        tokens = estimate_tokens(content)
+        self.turns.append((role, content, tokens))
+        self._turn_tokens += tokens
+        while len(self.turns) > _NEWEST_TURNS and self._turn_tokens > self.token_budget:
+            old_role, old_content, old_tokens = self.turns.popleft()
+            self._turn_tokens -= old_tokens
+            self.summary = self.summarizer(self.summary, old_role, old_content, self.summary_token_budget)
+        if self._turn_tokens > self.token_budget:
+            self._shorten_newest()
+
+    def _shorten_newest(self) -> None:
+        """Truncate the longest turn of the newest exchange so the exchange fits the token budget."""
+        longest = max(range(len(self.turns)), key=lambda index: self.turns[index][2])
+        role, content, tokens = self.turns[longest]
+        allowance = max(0, self.token_budget - (self._turn_tokens - tokens))
+        content = truncate_to_tokens(content, allowance)
+        self.turns[longest] = (role, content, estimate_tokens(content))
+        self._turn_tokens += self.turns[longest][2] - tokens
+
+    def render(self) -> str:
+        """Render the summary and recent turns for inclusion in a prompt."""
+        sections: List[str] = []
+        if self.summary:
+            sections.append(f"Summary of earlier conversation:\n{self.summary}")
+        if self.turns:
+            recent = "\n".join(
+                f"{'User' if role == 'user' else 'Assistant'}: {content}"
+                for role, content, _ in self.turns
+            )
+            sections.append(f"Recent conversation:\n{recent}")
+        return "\n\n".join(sections)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the summary and recent turns as plain data, e.g. to persist the session."""
+        return {"summary": self.summary, "turns": [[role, content] for role, content, _ in self.turns]}
+
+    def restore(self, snapshot: Dict[str, Any]) -> None:
+        """Replace the memory with a snapshot() taken earlier."""
+        self.clear()
+        self.summary = snapshot.get("summary", "")
+        for role, content in snapshot.get("turns", []):
+            self.add_turn(role, content)
+
+    def clear(self) -> None:
+        self.turns.clear()
+        self.summary = ""
+        self._turn_tokens = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.turns or self.summary)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the size of the history that would be sent with the next prompt."""
+        return {
+            "turns": len(self.turns),
+            "turn_tokens": self._turn_tokens,
+            "summary_tokens": estimate_tokens(self.summary),
+        }
@@ -0,0 +1,266 @@
+"""
+In-process metrics for LLM calls, exposed in the Prometheus text format.
+
+Counters and histograms are labelled by backend, model and action. Other
+components (caches, single-flight) register collectors that are read at
+scrape time, so the hot path only pays for a few dictionary updates.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def values(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[label_values] = series
+            series[0][index] += 1
+            series[1][0] += value
+
+    def snapshot(self) -> Dict[LabelValues, Tuple[List[int], float]]:
+        with self._lock:
+            return {labels: (list(counts), total[0]) for labels, (counts, total) in self._series.items()}
+
+    def quantile(self, q: float, *label_values: str) -> Optional[float]:
+        """Estimate a quantile by linear interpolation within the matching bucket."""
+        series = self.snapshot().get(label_values)
+        if not series or not sum(series[0]):
+            return None
+        counts = series[0]
+        rank = q * sum(counts)
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _format_labels(self.labels, label_values, f'le="{bound:g}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            cumulative += counts[-1]
+            le = _format_labels(self.labels, label_values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, label_values)} {total:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, label_values)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, Dict[str, str], float]]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        with self._lock:
+            return self._metrics.setdefault(name, Histogram(name, help_text, labels, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, str, Dict[str, str], float]]]) -> None:
+        """Register a callable yielding (name, help, labels, value) gauge samples at scrape time."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def register_stats(self, prefix: str, help_text: str, stats: Callable[[], Dict[str, float]]) -> None:
+        """Expose every numeric value of a component's stats() dict as a <prefix>_<key> gauge."""
+        def collect():
+            for key, value in stats().items():
+                if isinstance(value, (int, float)):
+                    yield f"{prefix}_{key}", f"{help_text} ({key.replace('_', ' ')})", {}, value
+        self.register_collector(collect)
+
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        gauges: Dict[str, Tuple[str, List[str]]] = {}
+        for collector in collectors:
+            for name, help_text, labels, value in collector():
+                samples = gauges.setdefault(name, (help_text, []))[1]
+                samples.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {value:g}")
+        for name, (help_text, samples) in gauges.items():
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} gauge", *samples])
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+
+CALL_LABELS = ("backend", "model", "action")
+llm_requests = _registry.counter(
+    "travel_llm_requests_total", "LLM chat calls by how they were served.", CALL_LABELS + ("outcome",))
+llm_errors = _registry.counter(
+    "travel_llm_errors_total", "LLM chat calls that raised an error.", CALL_LABELS + ("error",))
+llm_latency = _registry.histogram(
+    "travel_llm_latency_seconds", "Total latency of LLM chat calls.", CALL_LABELS)
+llm_ttft = _registry.histogram(
+    "travel_llm_time_to_first_token_seconds", "Time until the first response chunk.", CALL_LABELS)
+llm_queue_wait = _registry.histogram(
+    "travel_llm_queue_wait_seconds", "Time between a call starting and its upstream request.", CALL_LABELS)
+llm_prompt_tokens = _registry.histogram(
+    "travel_llm_prompt_tokens", "Estimated prompt tokens sent upstream.", CALL_LABELS, TOKEN_BUCKETS)
+llm_completion_tokens = _registry.histogram(
+    "travel_llm_completion_tokens", "Estimated completion tokens received.", CALL_LABELS, TOKEN_BUCKETS)
+
+llm_reasoning_tokens = _registry.histogram(
+    "travel_llm_reasoning_tokens", "Estimated reasoning-trace tokens generated per call.", ("model",), TOKEN_BUCKETS)
+llm_reasoning_cutoffs = _registry.counter(
+    "travel_llm_reasoning_cutoffs_total", "Reasoning traces stopped at their cap.", ("model",))
+
+llm_failovers = _registry.counter(
+    "travel_llm_failovers_total", "Calls served by a fallback backend.", ("from_backend", "to_backend"))
+llm_hedges = _registry.counter(
+    "travel_llm_hedged_requests_total", "Backup requests sent because the primary was slow.", ("backend",))
+
+llm_admission_wait = _registry.histogram(
+    "travel_scheduler_wait_seconds", "Time calls waited for a backend concurrency slot.", ("backend", "priority"))
+llm_rejections = _registry.counter(
+    "travel_scheduler_rejections_total", "Calls rejected by admission control.", ("backend", "priority", "reason"))
+ollama_host_requests = _registry.counter(
+    "travel_ollama_host_requests_total", "Requests routed to each Ollama host.", ("host",))
+ollama_host_errors = _registry.counter(
+    "travel_ollama_host_errors_total", "Failed requests per Ollama host.", ("host",))
+ollama_prompt_eval = _registry.histogram(
+    "travel_ollama_prompt_eval_seconds", "Time Ollama spent evaluating prompt tokens.", ("host",))
+ollama_prompt_eval_tokens = _registry.histogram(
+    "travel_ollama_prompt_eval_tokens", "Prompt tokens Ollama evaluated (cached prefixes excluded).",
+    ("host",), TOKEN_BUCKETS)
+ollama_load = _registry.histogram(
+    "travel_ollama_load_seconds", "Time Ollama spent loading the model before a request.", ("host",))
+
+retrieval_lookups = _registry.counter(
+    "travel_retrieval_lookups_total", "Free-text questions checked against earlier answers, by result.",
+    ("result",))
+prefetch_jobs = _registry.counter(
+    "travel_prefetch_jobs_total", "Speculative quick-action prefetches by how they ended.", ("outcome",))
+prefetch_clicks = _registry.counter(
+    "travel_prefetch_clicks_total", "Quick-action clicks while prefetching, by whether a prefetch covered them.",
+    ("result",))
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Return the process-wide metrics registry."""
+    return _registry
+
+
+def call_summary():
+    """Summarize recorded calls per backend, model and action for dashboards."""
+    rows = []
+    for labels, (counts, total) in sorted(llm_latency.snapshot().items()):
+        count = sum(counts)
+        rows.append({
+            "backend": labels[0],
+            "model": labels[1],
+            "action": labels[2],
+            "calls": count,
+            "mean_s": round(total / count, 3) if count else None,
+            "p50_s": llm_latency.quantile(0.5, *labels),
+            "p95_s": llm_latency.quantile(0.95, *labels),
+            "ttft_p50_s": llm_ttft.quantile(0.5, *labels),
+        })
+    return rows
+
+
+class CallTracker:
+    """Collects timings for one LLM call and records them when the call ends."""
+
+    def __init__(self, backend: str, model: str, action: str):
+        self.labels = (backend or "none", model or "none", action)
+        self.started = time.perf_counter()
+        self.dispatched_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        self.outcome = "upstream"
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def dispatched(self, prompt_tokens: int) -> None:
+        """Mark the moment the request is sent upstream."""
+        self.dispatched_at = time.perf_counter()
+        self.prompt_tokens = prompt_tokens
+
+    def first_token(self) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def finish(self, completion_tokens: int = 0, error: Optional[BaseException] = None) -> None:
+        ended = time.perf_counter()
+        if error is not None:
+            llm_errors.inc(*self.labels, type(error).__name__)
+            llm_requests.inc(*self.labels, "error")
+            return
+        llm_requests.inc(*self.labels, self.outcome)
+        llm_latency.observe(ended - self.started, *self.labels)
+        llm_ttft.observe((self.first_token_at or ended) - self.started, *self.labels)
+        if self.dispatched_at is not None:
+            llm_queue_wait.observe(self.dispatched_at - self.started, *self.labels)
+            llm_prompt_tokens.observe(self.prompt_tokens, *self.labels)
+            llm_completion_tokens.observe(completion_tokens, *self.labels)
@@ -0,0 +1,493 @@
+"""
+Minimal Ollama client over pooled HTTP connections.
+
+Exposes the same invoke/stream/ainvoke/astream surface LLMHandler uses on
+the LangChain models, but reuses keep-alive connections from the shared
+pools in clients.py instead of opening a new connection per request.
+With a router, every request is sent to the host the router picks and is
+retried on another host if that one fails before producing output.
+
+Every request carries keep_alive so hosts keep the model loaded between
+calls. Callers can pass the context returned by an earlier call to
+continue that conversation without re-sending it, and collect the new
+context and Ollama's timing stats through a metadata dict.
+
+Each call can also take a generation profile (see config.LLM_MODELS).
+Reasoning traces never reach the caller: they are dropped while
+streaming, and a trace that runs past its cap is stopped and the
+question asked again with reasoning turned off. Turning reasoning off
+only caps the answer's length on hosts seen honouring think=false; an
+answer the trace left empty is asked for again without a length cap.
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from ..config import LLM_REQUEST_TIMEOUT, OLLAMA_KEEP_ALIVE
+from .metrics import (
+    llm_reasoning_cutoffs, llm_reasoning_tokens, ollama_load, ollama_prompt_eval, ollama_prompt_eval_tokens
+)
+from .reasoning import ReasoningFilter
+
+if TYPE_CHECKING:
+    import requests
+    from .ollama_router import OllamaHost, OllamaRouter
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaError(ConnectionError):
+    """An Ollama host answered with an error status."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class OllamaClient:
+    def __init__(
+        self,
+        model: str,
+        base_url: str,
+        session: "requests.Session",
+        system: Optional[str] = None,
+        timeout: float = LLM_REQUEST_TIMEOUT,
+        options: Optional[Dict[str, Any]] = None,
+        router: Optional["OllamaRouter"] = None,
+        keep_alive: Optional[str] = OLLAMA_KEEP_ALIVE,
+        reasoning: bool = False
+    ):
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.router = router
+        self.session = session
+        self.system = system
+        self.timeout = timeout
+        self.options = options or {}
+        self.temperature = self.options.get("temperature")
+        self.keep_alive = keep_alive
+        # The model thinks out loud in <think> blocks and understands Ollama's think option
+        self.reasoning = reasoning
+        # Hosts that answered think=false without a trace; older servers ignore the option
+        self._think_hosts = set()
+
+    def _reasoning_allowance(self, generation: Dict[str, Any], url: Optional[str] = None) -> Optional[int]:
+        """Tokens the model may reason for on top of max_tokens; None when unbounded."""
+        if not self.reasoning:
+            return 0
+        mode = generation.get("reasoning", "on")
+        if mode == "off":
+            # A host that may still think would spend the answer's tokens on the trace
+            return 0 if url in self._think_hosts else None
+        if mode == "cap":
+            return generation.get("reasoning_tokens", 0)
+        return generation.get("reasoning_tokens")
+
+    def _reasoning_cap(self, generation: Optional[Dict[str, Any]]) -> Optional[int]:
+        if self.reasoning and generation and generation.get("reasoning") == "cap":
+            return generation.get("reasoning_tokens", 0)
+        return None
+
+    def _note_think(self, url: Optional[str], generation: Optional[Dict[str, Any]],
+                    reasoning: ReasoningFilter) -> None:
+        """Remember whether url honoured think=false, judging by the response to it."""
+        if not self.reasoning or url is None or not generation or generation.get("reasoning") != "off":
+            return
+        if reasoning.reasoning_chars:
+            self._think_hosts.discard(url)
+        else:
+            self._think_hosts.add(url)
+
+    @staticmethod
+    def _uncapped(reasoning: ReasoningFilter, generation: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Return the profile to ask again with when the trace used up the whole answer, else None."""
+        if reasoning.answer_started or not reasoning.reasoning_chars:
+            return None
+        if not generation or not generation.get("max_tokens"):
+            # Nothing capped the answer, so asking again would not help
+            return None
+        return {**generation, "reasoning": "off", "max_tokens": None}
+
+    def _payload(
+        self,
+        prompt: str,
+        stream: bool,
+        context: Optional[List[int]] = None,
+        generation: Optional[Dict[str, Any]] = None,
+        url: Optional[str] = None
+    ) -> Dict[str, Any]:
+        generation = generation or {}
+        payload = {"model": self.model, "prompt": prompt, "stream": stream}
+        if context:
+            # The context already starts with the system prompt; sending it again would repeat it
+            payload["context"] = context
+        elif self.system:
+            payload["system"] = self.system
+        options = dict(self.options)
+        if generation.get("temperature") is not None:
+            options["temperature"] = generation["temperature"]
+        if generation.get("stop"):
+            options["stop"] = list(generation["stop"])
+        allowance = self._reasoning_allowance(generation, url)
+        if generation.get("max_tokens") and allowance is not None:
+            options["num_predict"] = generation["max_tokens"] + allowance
+        if options:
+            payload["options"] = options
+        if self.reasoning and generation.get("reasoning") == "off":
+            # Servers without the think option ignore it; the trace is then still stripped
+            payload["think"] = False
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    @staticmethod
+    def _finish(data: Dict[str, Any], host: Any, metadata: Optional[Dict[str, Any]]) -> None:
+        """Record the stats of a finished generation and hand its context to the caller."""
+        url = _url(host)
+        # Durations are reported in nanoseconds
+        if "prompt_eval_duration" in data:
+            ollama_prompt_eval.observe(data["prompt_eval_duration"] / 1e9, url)
+        if "prompt_eval_count" in data:
+            ollama_prompt_eval_tokens.observe(data["prompt_eval_count"], url)
+        if data.get("load_duration"):
+            ollama_load.observe(data["load_duration"] / 1e9, url)
+        if metadata is not None:
+            metadata["host"] = url
+            metadata["context"] = data.get("context")
+            for field in ("prompt_eval_count", "prompt_eval_duration", "load_duration", "eval_count"):
+                if field in data:
+                    metadata[field] = data[field]
+
+    def _answer(self, data: Dict[str, Any], metadata: Optional[Dict[str, Any]]) -> Tuple[str, ReasoningFilter]:
+        """Return the answer of a complete (non-streamed) response without its reasoning trace."""
+        reasoning = ReasoningFilter()
+        reasoning.add_reasoning(data.get("thinking", ""))
+        text = reasoning.feed(data.get("response", "")) + reasoning.flush()
+        self._observe_reasoning(reasoning, metadata)
+        return text, reasoning
+
+    def _observe_reasoning(self, reasoning: ReasoningFilter, metadata: Optional[Dict[str, Any]],
+                           cut_off: bool = False) -> None:
+        if not self.reasoning:
+            return
+        llm_reasoning_tokens.observe(reasoning.reasoning_tokens, self.model)
+        if cut_off:
+            llm_reasoning_cutoffs.inc(self.model)
+        if metadata is not None:
+            metadata["reasoning_tokens"] = metadata.get("reasoning_tokens", 0) + reasoning.reasoning_tokens
+
+    def _raise_for_status(self, status_code: int, detail: str) -> None:
+        if status_code == 404:
+            raise OllamaError(
+                f"Ollama model '{self.model}' not found. "
+                f"Pull it with `ollama pull {self.model}`.",
+                status_code
+            )
+        if status_code != 200:
+            raise OllamaError(f"Ollama call failed with status code {status_code}: {detail}", status_code)
+
+    def _attempts(self) -> int:
+        return len(self.router.hosts) if self.router is not None else 1
+
+    def _route(self, tried: List["OllamaHost"], affinity: Optional[str] = None):
+        """Return a context manager yielding the base URL for one attempt."""
+        if self.router is None:
+            return nullcontext(self.base_url)
+        return self.router.route(self.model, exclude=tried, prefer=affinity)
+
+    def invoke(
+        self,
+        prompt: str,
+        context: Optional[List[int]] = None,
+        affinity: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        generation: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Generate the answer to prompt, continuing from context if given, without any reasoning trace."""
+        if self._reasoning_cap(generation) is not None:
+            # The trace has to be watched as it is generated to cut it short
+            return "".join(self.stream(prompt, context, affinity, metadata, generation))
+        tried = []
+        for attempt in range(self._attempts()):
+            try:
+                with self._route(tried, affinity) as host:
+                    tried.append(host)
+                    response = self.session.post(
+                        f"{_url(host)}/api/generate",
+                        json=self._payload(prompt, False, context, generation, _url(host)),
+                        timeout=self.timeout
+                    )
+                    self._raise_for_status(response.status_code, response.text)
+                    data = response.json()
+                    self._finish(data, host, metadata)
+                    text, reasoning = self._answer(data, metadata)
+                    self._note_think(_url(host), generation, reasoning)
+                break
+            except Exception:
+                if attempt + 1 >= self._attempts():
+                    raise
+        retry = self._uncapped(reasoning, generation)
+        if retry is not None:
+            return self.invoke(prompt, context, affinity, metadata, retry)
+        return text
+
+    def _chunks(
+        self,
+        prompt: str,
+        context: Optional[List[int]],
+        affinity: Optional[str],
+        metadata: Optional[Dict[str, Any]],
+        generation: Optional[Dict[str, Any]],
+        route: Dict[str, str]
+    ) -> Iterator[Tuple[str, str]]:
+        """Stream (thinking, response) text pairs as Ollama sends them, noting the host in route."""
+        tried = []
+        for attempt in range(self._attempts()):
+            started = False
+            try:
+                with self._route(tried, affinity) as host:
+                    tried.append(host)
+                    route["host"] = _url(host)
+                    with self.session.post(
+                        f"{_url(host)}/api/generate",
+                        json=self._payload(prompt, True, context, generation, _url(host)),
+                        timeout=self.timeout,
+                        stream=True
+                    ) as response:
+                        self._raise_for_status(
+                            response.status_code, response.text if response.status_code != 200 else "")
+                        for line in response.iter_lines(decode_unicode=True):
+                            if not line:
+                                continue
+                            data = json.loads(line)
+                            if data.get("response") or data.get("thinking"):
+                                started = True
+                                yield data.get("thinking", ""), data.get("response", "")
+                            if data.get("done"):
+                                self._finish(data, host, metadata)
+                                break
+                return
+            except Exception:
+                # Output already shown cannot be retried elsewhere
+                if started or attempt + 1 >= self._attempts():
+                    raise
+
+    def stream(
+        self,
+        prompt: str,
+        context: Optional[List[int]] = None,
+        affinity: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        generation: Optional[Dict[str, Any]] = None
+    ) -> Iterator[str]:
+        """Stream the answer to prompt chunk by chunk, dropping the reasoning trace as it arrives."""
+        cap = self._reasoning_cap(generation)
+        reasoning = ReasoningFilter()
+        route: Dict[str, str] = {}
+        chunks = self._chunks(prompt, context, affinity, metadata, generation, route)
+        try:
+            for thinking, response in chunks:
+                reasoning.add_reasoning(thinking)
+                text = reasoning.feed(response)
+                if text:
+                    yield text
+                elif cap is not None and not reasoning.answer_started and reasoning.reasoning_tokens > cap:
+                    break
+            else:
+                tail = reasoning.flush()
+                if tail:
+                    yield tail
+                self._observe_reasoning(reasoning, metadata)
+                self._note_think(route.get("host"), generation, reasoning)
+                retry = self._uncapped(reasoning, generation)
+                if retry is not None:
+                    yield from self.stream(prompt, context, affinity, metadata, retry)
+                return
+        finally:
+            # Closing the response makes Ollama stop generating
+            chunks.close()
+        self._observe_reasoning(reasoning, metadata, cut_off=True)
+        yield from self.stream(prompt, context, affinity, metadata, {**generation, "reasoning": "off"})
+
+    async def ainvoke(
+        self,
+        prompt: str,
+        context: Optional[List[int]] = None,
+        affinity: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        generation: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Generate the answer to prompt asynchronously."""
+        if self._reasoning_cap(generation) is not None:
+            return "".join([text async for text in self.astream(prompt, context, affinity, metadata, generation)])
+        from .clients import get_async_http_client
+
+        client = get_async_http_client()
+        tried = []
+        for attempt in range(self._attempts()):
+            try:
+                with self._route(tried, affinity) as host:
+                    tried.append(host)
+                    response = await client.post(
+                        f"{_url(host)}/api/generate",
+                        json=self._payload(prompt, False, context, generation, _url(host)),
+                        timeout=self.timeout
+                    )
+                    self._raise_for_status(response.status_code, response.text)
+                    data = response.json()
+                    self._finish(data, host, metadata)
+                    text, reasoning = self._answer(data, metadata)
+                    self._note_think(_url(host), generation, reasoning)
+                break
+            except Exception:
+                if attempt + 1 >= self._attempts():
+                    raise
+        retry = self._uncapped(reasoning, generation)
+        if retry is not None:
+            return await self.ainvoke(prompt, context, affinity, metadata, retry)
+        return text
+
+    async def _achunks(
+        self,
+        prompt: str,
+        context: Optional[List[int]],
+        affinity: Optional[str],
+        metadata: Optional[Dict[str, Any]],
+        generation: Optional[Dict[str, Any]],
+        route: Dict[str, str]
+    ) -> AsyncIterator[Tuple[str, str]]:
+        """Async variant of _chunks."""
+        from .clients import get_async_http_client
+
+        client = get_async_http_client()
+        tried = []
+        for attempt in range(self._attempts()):
+            started = False
+            try:
+                with self._route(tried, affinity) as host:
+                    tried.append(host)
+                    route["host"] = _url(host)
+                    async with client.stream(
+                        "POST",
+                        f"{_url(host)}/api/generate",
+                        json=self._payload(prompt, True, context, generation, _url(host)),
+                        timeout=self.timeout
+                    ) as response:
+                        if response.status_code != 200:
+                            await response.aread()
+                            self._raise_for_status(response.status_code, response.text)
+                        async for line in response.aiter_lines():
+                            if not line:
+                                continue
+                            data = json.loads(line)
+                            if data.get("response") or data.get("thinking"):
+                                started = True
+                                yield data.get("thinking", ""), data.get("response", "")
+                            if data.get("done"):
+                                self._finish(data, host, metadata)
+                                break
+                return
+            except Exception:
+                if started or attempt + 1 >= self._attempts():
+                    raise
+
+    async def astream(
+        self,
+        prompt: str,
+        context: Optional[List[int]] = None,
+        affinity: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        generation: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Stream the answer to prompt asynchronously, dropping the reasoning trace."""
+        cap = self._reasoning_cap(generation)
+        reasoning = ReasoningFilter()
+        route: Dict[str, str] = {}
+        chunks = self._achunks(prompt, context, affinity, metadata, generation, route)
+        cut_off = False
+        try:
+            async for thinking, response in chunks:
+                reasoning.add_reasoning(thinking)
+                text = reasoning.feed(response)
+                if text:
+                    yield text
+                elif cap is not None and not reasoning.answer_started and reasoning.reasoning_tokens > cap:
+                    cut_off = True
+                    break
+        finally:
+            await chunks.aclose()
+        if not cut_off:
+            tail = reasoning.flush()
+            if tail:
+                yield tail
+            self._observe_reasoning(reasoning, metadata)
+            self._note_think(route.get("host"), generation, reasoning)
+            retry = self._uncapped(reasoning, generation)
+            if retry is not None:
+                async for text in self.astream(prompt, context, affinity, metadata, retry):
+                    yield text
+            return
+        self._observe_reasoning(reasoning, metadata, cut_off=True)
+        async for text in self.astream(prompt, context, affinity, metadata, {**generation, "reasoning": "off"}):
+            yield text
+
+    def _hosts(self) -> List[str]:
+        if self.router is None:
+            return [self.base_url]
+        return [host.url for host in self.router.hosts]
+
+    def warm_up(self, timeout: Optional[float] = None) -> List[Tuple[str, Optional[float], Optional[str]]]:
+        """Load the model on every host and evaluate the system prompt once.
+
+        Returns (host, seconds, error) per host. A one-token generation is used
+        rather than an empty prompt so the system prompt lands in the host's
+        prompt cache as well.
+        """
+        payload = {"model": self.model, "prompt": "Hello", "stream": False, "options": {"num_predict": 1}}
+        if self.system:
+            payload["system"] = self.system
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        results = []
+        for url in self._hosts():
+            started = time.perf_counter()
+            try:
+                response = self.session.post(f"{url}/api/generate", json=payload, timeout=timeout or self.timeout)
+                self._raise_for_status(response.status_code, response.text)
+                self._finish(response.json(), url, None)
+            except Exception as e:
+                results.append((url, None, str(e)))
+                continue
+            results.append((url, time.perf_counter() - started, None))
+        return results
+
+
+def _url(host: Any) -> str:
+    return host if isinstance(host, str) else host.url
+
+
+_warmed_up = set()
+_warm_up_lock = threading.Lock()
+
+
+def start_warmup(client: OllamaClient) -> Optional[threading.Thread]:
+    """Warm client's model up in a background thread, once per process and model."""
+    key = (client.model, client.system, tuple(client._hosts()))
+    with _warm_up_lock:
+        if key in _warmed_up:
+            return None
+        _warmed_up.add(key)
+
+    def run():
+        for url, elapsed, error in client.warm_up():
+            if error:
+                logger.warning("Warming up %s on %s failed: %s", client.model, url, error)
+            else:
+                logger.info("Warmed up %s on %s in %.1fs", client.model, url, elapsed)
+
+    thread = threading.Thread(target=run, name="ollama-warmup", daemon=True)
+    thread.start()
+    return thread
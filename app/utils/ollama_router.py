@@ -0,0 +1,211 @@
+"""
+Request router for a pool of Ollama servers.
+
+A single Ollama instance largely works through requests one at a time, so
+throughput scales by adding hosts. Each request goes to the host with the
+fewest outstanding requests (or the lowest expected wait under the
+"latency" strategy). Hosts that fail health probes or trip their circuit
+breaker are drained until they recover, hosts that already have the
+model loaded are favoured to avoid cold loads, and a session sticks to the
+host that served it before unless that host is clearly busier, so Ollama can
+reuse the session's cached prompt prefix.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from ..config import (
+    HTTP_PROBE_TIMEOUT, OLLAMA_HOSTS, OLLAMA_LATENCY_SMOOTHING, OLLAMA_PREFER_LOADED,
+    OLLAMA_ROUTING_STRATEGY
+)
+from .health import BackendHealth, CircuitBreaker, is_backend_failure
+from .metrics import get_metrics_registry, ollama_host_errors, ollama_host_requests
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ("least_outstanding", "latency")
+
+
+class OllamaHost:
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.requests = 0
+        self.latency: Optional[float] = None
+        self.healthy: Optional[bool] = None  # None until the first probe
+        self.loaded_models: Optional[Set[str]] = None  # None when /api/ps is unavailable
+        self.breaker = CircuitBreaker()
+
+    def available(self) -> bool:
+        return self.healthy is not False and self.breaker.available()
+
+    def has_loaded(self, model: str) -> bool:
+        # /api/ps reports tags such as "deepseek-r1:latest"
+        return any(name == model or name.split(":")[0] == model for name in self.loaded_models or ())
+
+
+class OllamaRouter:
+    def __init__(
+        self,
+        hosts: Iterable[str] = OLLAMA_HOSTS,
+        strategy: str = OLLAMA_ROUTING_STRATEGY,
+        prefer_loaded: bool = OLLAMA_PREFER_LOADED
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown Ollama routing strategy: {strategy}")
+        self.hosts = [OllamaHost(url) for url in hosts]
+        if not self.hosts:
+            raise ValueError("At least one Ollama host is required")
+        self.strategy = strategy
+        self.prefer_loaded = prefer_loaded
+        self._lock = threading.Lock()
+
+    def _cost(self, host: OllamaHost, model: str, default_latency: float, prefer: Optional[str] = None) -> float:
+        load = host.outstanding
+        if host.url == prefer:
+            # The host holds this session's prompt prefix in its cache; worth one queued request
+            load -= 1
+        if self.prefer_loaded and host.loaded_models is not None and not host.has_loaded(model):
+            # A cold host has to load the model first; count that as one extra request
+            load += 1
+        if self.strategy == "latency":
+            return (load + 1) * (host.latency or default_latency)
+        return load
+
+    def acquire(self, model: str, exclude: Iterable[OllamaHost] = (), prefer: Optional[str] = None) -> OllamaHost:
+        """Pick a host for one request and count it as outstanding until release().
+
+        prefer names the host that served the session before; it wins unless it is more than one request busier.
+        """
+        excluded = set(map(id, exclude))
+        with self._lock:
+            candidates = [host for host in self.hosts if id(host) not in excluded]
+            if not candidates:
+                raise ConnectionError("No Ollama hosts left to try")
+            # Drain unavailable hosts, but keep trying them if nothing else is left
+            candidates = [host for host in candidates if host.available()] or candidates
+            known = [host.latency for host in candidates if host.latency is not None]
+            default_latency = sum(known) / len(known) if known else 1.0
+            host = min(candidates, key=lambda h: (
+                self._cost(h, model, default_latency, prefer), h.url != prefer, h.requests))
+            host.outstanding += 1
+            host.requests += 1
+        ollama_host_requests.inc(host.url)
+        return host
+
+    def release(self, host: OllamaHost, model: str, elapsed: float, error: Optional[BaseException] = None) -> None:
+        """Finish a request started with acquire()."""
+        with self._lock:
+            host.outstanding -= 1
+            if error is None:
+                host.latency = elapsed if host.latency is None else (
+                    OLLAMA_LATENCY_SMOOTHING * elapsed + (1 - OLLAMA_LATENCY_SMOOTHING) * host.latency
+                )
+                # Serving the request left the model loaded on this host
+                if host.loaded_models is not None:
+                    host.loaded_models.add(model)
+        if error is None:
+            host.breaker.record_success()
+        elif is_backend_failure(error):
+            host.breaker.record_failure()
+            ollama_host_errors.inc(host.url)
+        else:
+            # The host answered; the request itself was refused
+            host.breaker.release()
+
+    @contextmanager
+    def route(self, model: str, exclude: Iterable[OllamaHost] = (),
+              prefer: Optional[str] = None) -> Iterator[OllamaHost]:
+        """Context manager around acquire()/release() that records the outcome."""
+        host = self.acquire(model, exclude, prefer)
+        started = time.perf_counter()
+        try:
+            yield host
+        except GeneratorExit:
+            # A stream closed early by its reader says nothing about the host
+            self.release(host, model, time.perf_counter() - started)
+            raise
+        except BaseException as e:
+            self.release(host, model, time.perf_counter() - started, e)
+            raise
+        self.release(host, model, time.perf_counter() - started)
+
+    def refresh(self, timeout: float = HTTP_PROBE_TIMEOUT) -> List[BackendHealth]:
+        """Probe every host's version and loaded models; returns one result per host."""
+        from .clients import get_http_session
+
+        session = get_http_session()
+        results = []
+        for host in self.hosts:
+            started = time.perf_counter()
+            try:
+                response = session.get(f"{host.url}/api/version", timeout=timeout)
+                healthy = response.status_code == 200
+                error = None if healthy else f"HTTP {response.status_code}"
+            except Exception as e:
+                healthy, error = False, str(e)
+            latency = time.perf_counter() - started
+            loaded = None
+            if healthy:
+                try:
+                    response = session.get(f"{host.url}/api/ps", timeout=timeout)
+                    if response.status_code == 200:
+                        loaded = {model.get("name", "") for model in response.json().get("models", [])}
+                except Exception:
+                    pass
+            with self._lock:
+                if host.healthy is not None and host.healthy != healthy:
+                    logger.info("Ollama host %s is %s", host.url, "healthy" if healthy else f"unhealthy ({error})")
+                host.healthy = healthy
+                host.loaded_models = loaded
+            results.append(BackendHealth(healthy, latency, error))
+        return results
+
+    def stats(self) -> List[Dict[str, object]]:
+        """Return the current load and health of every host."""
+        with self._lock:
+            return [
+                {
+                    "host": host.url,
+                    "healthy": host.healthy,
+                    "circuit": host.breaker.state,
+                    "outstanding": host.outstanding,
+                    "requests": host.requests,
+                    "latency_s": host.latency,
+                    "loaded_models": sorted(host.loaded_models) if host.loaded_models is not None else None,
+                }
+                for host in self.hosts
+            ]
+
+
+_router: Optional[OllamaRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_ollama_router() -> OllamaRouter:
+    """Return the process-wide router over OLLAMA_HOSTS."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = OllamaRouter()
+        return _router
+
+
+def _collect_hosts():
+    with _router_lock:
+        router = _router
+    if router is None:
+        return
+    for host in router.stats():
+        labels = {"host": host["host"]}
+        yield "travel_ollama_host_outstanding", "Requests in flight per Ollama host", labels, host["outstanding"]
+        yield ("travel_ollama_host_available", "Whether the router sends traffic to the host (1 yes)",
+               labels, 1 if host["healthy"] is not False and host["circuit"] != CircuitBreaker.OPEN else 0)
+        if host["latency_s"] is not None:
+            yield ("travel_ollama_host_latency_seconds", "Smoothed request latency per Ollama host",
+                   labels, host["latency_s"])
+
+
+get_metrics_registry().register_collector(_collect_hosts)
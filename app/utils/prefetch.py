@@ -0,0 +1,235 @@
+"""
+Speculative prefetch of quick actions.
+
+Once a session's sidebar inputs have stayed unchanged for PREFETCH_DELAY
+seconds, every quick action for them is generated in the background at
+the "prefetch" priority and left in the response cache, so the click that
+follows is answered from the cache. Prefetches are cancelled as soon as
+the inputs change, only start while the backend has a free slot, and are
+capped per session both in flight and per budget window. Clicks are
+counted as hits (the prefetch finished, or found the answer cached),
+in-flight hits (joined a running prefetch through single-flight) or
+misses.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Deque, Dict, Optional, Sequence, Tuple
+
+from ..config import (
+    PREFETCH_BUDGET, PREFETCH_BUDGET_WINDOW, PREFETCH_DELAY, PREFETCH_MAX_IN_FLIGHT, PREFETCH_WORKERS,
+    QUICK_ACTIONS, SCHEDULER_QUEUE_DEADLINE
+)
+from .cache import make_cache_key
+from .metrics import prefetch_clicks, prefetch_jobs
+from .quick_actions import build_quick_action
+from .scheduler import AdmissionScheduler, get_scheduler
+
+if TYPE_CHECKING:
+    from .llm_handler import LLMHandler
+
+# Shared by every session; each session's own share is capped by its Prefetcher
+_prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="llm-prefetch")
+
+# (model, destination, budget, interests, dates, structured)
+Inputs = Tuple[Optional[str], str, str, Tuple[str, ...], str, bool]
+
+_MAX_TRACKED_KEYS = 64
+
+
+class Prefetcher:
+    """Prefetches one session's quick actions into the response cache."""
+
+    def __init__(
+        self,
+        handler: "LLMHandler",
+        delay: float = PREFETCH_DELAY,
+        max_in_flight: int = PREFETCH_MAX_IN_FLIGHT,
+        budget: int = PREFETCH_BUDGET,
+        window: float = PREFETCH_BUDGET_WINDOW,
+        scheduler: Optional[AdmissionScheduler] = None
+    ):
+        self.handler = handler
+        self.delay = delay
+        self.budget = budget
+        self.window = window
+        self.scheduler = scheduler or get_scheduler()
+        self._slots = threading.BoundedSemaphore(max(1, max_in_flight))
+        self._lock = threading.Lock()
+        self._inputs: Optional[Inputs] = None
+        self._cancelled = threading.Event()
+        self._timer: Optional[threading.Timer] = None
+        self._started: Deque[float] = deque()
+        # Click key -> "running" or "done", for the prefetches of recent inputs
+        self._keys: "OrderedDict[str, str]" = OrderedDict()
+        self._stats = {"scheduled": 0, "completed": 0, "cancelled": 0, "cached": 0, "over_budget": 0,
+                       "busy": 0, "errors": 0, "hits": 0, "in_flight_hits": 0, "misses": 0}
+
+    def _inputs_for(self, destination: str, budget: str, interests: Optional[Sequence[str]], dates: str,
+                    structured: bool) -> Inputs:
+        return (self.handler.current_model, " ".join((destination or "").split()), budget or "",
+                tuple(interests or ()), dates or "", structured)
+
+    def schedule(
+        self,
+        destination: str,
+        budget: str = "",
+        interests: Optional[Sequence[str]] = None,
+        dates: str = "",
+        structured: bool = False
+    ) -> None:
+        """Prefetch the quick actions for these inputs once they stop changing; cheap to call on every rerun."""
+        inputs = self._inputs_for(destination, budget, interests, dates, structured)
+        with self._lock:
+            if inputs == self._inputs:
+                return
+            self._cancel_locked()
+            if not inputs[1] or self.handler.assistant is None:
+                return
+            self._inputs = inputs
+            self._cancelled = threading.Event()
+            self._timer = threading.Timer(self.delay, self._dispatch, args=(inputs, self._cancelled))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def cancel(self) -> None:
+        """Cancel pending and running prefetches (a running one others have joined is left to finish)."""
+        with self._lock:
+            self._cancel_locked()
+
+    def _cancel_locked(self) -> None:
+        self._inputs = None
+        self._cancelled.set()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for key in [key for key, state in self._keys.items() if state == "running"]:
+            del self._keys[key]
+
+    def _dispatch(self, inputs: Inputs, cancelled: threading.Event) -> None:
+        # Activities are only offered once interests are selected
+        actions = [action for action in QUICK_ACTIONS if action != "activities" or inputs[3]]
+        for action in actions:
+            if cancelled.is_set():
+                return
+            with self._lock:
+                self._stats["scheduled"] += 1
+            _prefetch_executor.submit(self._run, action, inputs, cancelled)
+
+    def _finish(self, outcome: str) -> None:
+        with self._lock:
+            self._stats[outcome if outcome != "error" else "errors"] += 1
+        prefetch_jobs.inc(outcome)
+
+    def _take_budget(self) -> bool:
+        """Count one speculative call against the session's budget; False when it is used up."""
+        now = time.monotonic()
+        with self._lock:
+            while self._started and now - self._started[0] > self.window:
+                self._started.popleft()
+            if len(self._started) >= self.budget:
+                return False
+            self._started.append(now)
+            return True
+
+    def _track(self, key: str, state: str, cancelled: threading.Event) -> None:
+        with self._lock:
+            if cancelled.is_set():
+                return
+            self._keys[key] = state
+            self._keys.move_to_end(key)
+            while len(self._keys) > _MAX_TRACKED_KEYS:
+                self._keys.popitem(last=False)
+
+    def _run(self, action: str, inputs: Inputs, cancelled: threading.Event) -> None:
+        # Wait for one of this session's prefetch slots, giving up if the inputs change meanwhile
+        while not self._slots.acquire(timeout=0.2):
+            if cancelled.is_set():
+                self._finish("cancelled")
+                return
+        try:
+            self._finish(self._prefetch(action, inputs, cancelled))
+        except Exception:
+            self._finish("error")
+        finally:
+            self._slots.release()
+
+    def _prefetch(self, action: str, inputs: Inputs, cancelled: threading.Event) -> str:
+        handler = self.handler
+        model, destination, budget, interests, dates, structured = inputs
+        if cancelled.is_set() or handler.current_model != model:
+            return "cancelled"
+        key = self._click_key(action, inputs)
+        if self._is_cached(action, inputs, key):
+            self._track(key, "done", cancelled)
+            return "cached"
+        # Speculative work only uses idle capacity rather than queueing ahead of future clicks
+        deadline = time.monotonic() + SCHEDULER_QUEUE_DEADLINE
+        while not self.scheduler.has_capacity(model, "prefetch"):
+            if cancelled.wait(0.2):
+                return "cancelled"
+            if time.monotonic() > deadline:
+                return "busy"
+        if not self._take_budget():
+            return "over_budget"
+        self._track(key, "running", cancelled)
+        if structured:
+            # One JSON call per destination; it cannot be stopped halfway, so it always completes
+            handler.structured_results(action, destination, priority="prefetch")
+        else:
+            prompt, context = build_quick_action(action, destination, budget, list(interests), dates)
+            chunks = handler.stream_chat(prompt, context, action=action, priority="prefetch", remember=False)
+            try:
+                for _ in chunks:
+                    # Someone who clicked meanwhile is following this stream, so let it finish
+                    if cancelled.is_set() and not handler.single_flight.has_followers(key):
+                        return "cancelled"
+            finally:
+                # Closing the stream aborts the upstream request if it is still running
+                chunks.close()
+        self._track(key, "done", cancelled)
+        return "completed"
+
+    def _click_key(self, action: str, inputs: Inputs) -> str:
+        """Return the key a click on action with inputs is served under (the response cache key)."""
+        model, destination, budget, interests, dates, structured = inputs
+        if structured:
+            return make_cache_key(model, "prefetch-structured", action, destination)
+        prompt, context = build_quick_action(action, destination, budget, list(interests), dates)
+        return self.handler.cache_key(prompt, context, action)
+
+    def _is_cached(self, action: str, inputs: Inputs, key: str) -> bool:
+        if inputs[5]:
+            return self.handler.has_structured_results(action, inputs[1])
+        return self.handler.is_cached(key)
+
+    def record_click(
+        self,
+        action: str,
+        destination: str,
+        budget: str = "",
+        interests: Optional[Sequence[str]] = None,
+        dates: str = "",
+        structured: bool = False
+    ) -> str:
+        """Record whether a quick-action click was covered by a prefetch; returns hit, in_flight or miss."""
+        inputs = self._inputs_for(destination, budget, interests, dates, structured)
+        key = self._click_key(action, inputs)
+        with self._lock:
+            result = {"done": "hit", "running": "in_flight"}.get(self._keys.get(key), "miss")
+            self._stats[{"hit": "hits", "in_flight": "in_flight_hits", "miss": "misses"}[result]] += 1
+        prefetch_clicks.inc(result)
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        """Return job outcomes, click results and the hit rate (in-flight hits count as hits)."""
+        now = time.monotonic()
+        with self._lock:
+            stats: Dict[str, float] = dict(self._stats)
+            started = sum(1 for at in self._started if now - at <= self.window)
+        stats["budget_remaining"] = max(0, self.budget - started)
+        clicks = stats["hits"] + stats["in_flight_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["in_flight_hits"]) / clicks, 3) if clicks else 0.0
+        return stats
+
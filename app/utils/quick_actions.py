@@ -0,0 +1,34 @@
+"""
+Prompt and context builders for the quick actions defined in config.QUICK_ACTIONS
+"""
+from typing import Any, Dict, List, Tuple
+
+from ..config import QUICK_ACTIONS
+
+
+def build_quick_action(
+    action: str,
+    destination: str,
+    budget: str = "",
+    interests: List[str] = None,
+    dates: str = ""
+) -> Tuple[str, Dict[str, Any]]:
+    """Build the prompt and travel context for a quick action."""
+    if action not in QUICK_ACTIONS:
+        raise ValueError(f"Unsupported quick action: {action}")
+
+    interests = interests or []
+    prompt = QUICK_ACTIONS[action]["prompt"].format(
+        destination=destination,
+        budget=budget,
+        interests=", ".join(interests)
+    )
+    context = {
+        "destination": destination,
+        "budget": budget,
+        "interests": interests
+    }
+    # Restaurant suggestions do not depend on the travel dates
+    if action != "restaurants":
+        context["dates"] = dates
+    return prompt, context
@@ -0,0 +1,82 @@
+"""
+Reasoning-trace handling for models such as deepseek-r1.
+
+Reasoning models think out loud inside <think>...</think> before they
+answer. ReasoningFilter drops that block from a stream of chunks as it
+arrives, holding back only a tail that could still be the start of a tag,
+so the answer shows as soon as it begins. It also counts the reasoning so
+callers can cut a long trace short.
+"""
+OPEN_TAG = "<think>"
+CLOSE_TAG = "</think>"
+
+
+def _partial_tag(text: str, tag: str) -> int:
+    """Length of the longest tail of text that is a proper prefix of tag."""
+    for length in range(min(len(tag) - 1, len(text)), 0, -1):
+        if tag.startswith(text[-length:]):
+            return length
+    return 0
+
+
+class ReasoningFilter:
+    def __init__(self):
+        self.in_reasoning = False
+        self.reasoning_chars = 0
+        self.answer_started = False
+        self._pending = ""
+
+    @property
+    def reasoning_tokens(self) -> int:
+        # Same four-characters-per-token estimate as memory.estimate_tokens
+        return (self.reasoning_chars + 3) // 4
+
+    def add_reasoning(self, text: str) -> None:
+        """Count reasoning the server sent separately from the answer (Ollama's "thinking" field)."""
+        self.reasoning_chars += len(text)
+
+    def _answer(self, text: str) -> str:
+        if not self.answer_started:
+            # The answer after </think> usually starts with blank lines
+            text = text.lstrip()
+            self.answer_started = bool(text)
+        return text
+
+    def feed(self, chunk: str) -> str:
+        """Filter the next streamed chunk; returns the answer text that is safe to show now."""
+        text = self._pending + chunk
+        self._pending = ""
+        parts = []
+        while text:
+            tag = CLOSE_TAG if self.in_reasoning else OPEN_TAG
+            index = text.find(tag)
+            if index < 0:
+                hold = _partial_tag(text, tag)
+                body, self._pending = text[:len(text) - hold], text[len(text) - hold:]
+                if self.in_reasoning:
+                    self.reasoning_chars += len(body)
+                else:
+                    parts.append(self._answer(body))
+                break
+            if self.in_reasoning:
+                self.reasoning_chars += index
+            else:
+                parts.append(self._answer(text[:index]))
+            self.in_reasoning = not self.in_reasoning
+            text = text[index + len(tag):]
+        return "".join(parts)
+
+    def flush(self) -> str:
+        """Return the held-back tail once the stream has ended."""
+        text, self._pending = self._pending, ""
+        if self.in_reasoning:
+            # The trace was cut off before the answer began
+            self.reasoning_chars += len(text)
+            return ""
+        return self._answer(text)
+
+
+def strip_reasoning(text: str) -> str:
+    """Remove <think> blocks from a complete response."""
+    reasoning = ReasoningFilter()
+    return reasoning.feed(text) + reasoning.flush()
@@ -0,0 +1,311 @@
+"""
+Retrieval-first answers from earlier responses.
+
+Every answer generated for a destination is split into short chunks and
+added, as it arrives, to the BM25 index of that destination, budget and
+set of interests: an inverted index whose postings are growable arrays
+scored with NumPy. A free-text question is matched against the index
+first. When the best excerpt covers the question's informative words, it
+is answered from the excerpts without a model call; when it covers them
+partly, the excerpts ground a short generation. Questions that point back
+at the conversation ("Is it open on Sundays?") are left to the model.
+"""
+import math
+import re
+import threading
+import zlib
+from array import array
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from ..config import (
+    RETRIEVAL_ANSWER_MIN_TERMS, RETRIEVAL_ANSWER_THRESHOLD, RETRIEVAL_CHUNK_WORDS, RETRIEVAL_GROUNDED_THRESHOLD,
+    RETRIEVAL_MAX_CHUNKS, RETRIEVAL_MAX_DESTINATION_CHUNKS, RETRIEVAL_MIN_QUERY_TERMS, RETRIEVAL_TOP_K
+)
+from .metrics import get_metrics_registry
+from .reasoning import strip_reasoning
+from .text import STOPWORDS, stem
+
+_WORD = re.compile(r"[a-z0-9]+")
+# Words that point at something said earlier; the excerpts cannot tell what they stand for
+_REFERENCES = frozenset(
+    "it its it's itself they them their theirs there that those this these he him his she her same above "
+    "earlier previous mentioned former latter"
+    .split()
+)
+_HEADING = re.compile(r"^(#{1,6}\s+.+|\*\*[^*]+\*\*:?)$")
+_LIST_ITEM = re.compile(r"^([-*•]|\d+[.)])\s+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Return the stemmed words of text, without stopwords."""
+    return [stem(word) for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def refers_back(question: str) -> bool:
+    """Return True if question points at something said earlier, e.g. "Is it closed on Saturdays?"."""
+    return any(word in _REFERENCES for word in re.findall(r"[a-z']+", question.lower()))
+
+
+def chunk_text(text: str, max_words: int = RETRIEVAL_CHUNK_WORDS) -> List[str]:
+    """Split an answer into excerpts of about max_words, at headings, list items and sentence ends."""
+    chunks: List[str] = []
+    heading = ""
+    lines: List[str] = []
+    words = 0
+
+    def flush() -> None:
+        nonlocal lines, words
+        if lines:
+            # Each excerpt keeps its section heading, which often names what the list is about
+            chunks.append("\n".join(([f"**{heading}**"] if heading else []) + lines))
+        lines, words = [], 0
+
+    for line in strip_reasoning(text).splitlines():
+        line = line.strip()
+        if not line:
+            if words >= max_words // 2:
+                flush()
+            continue
+        if _HEADING.match(line):
+            flush()
+            heading = line.strip("#*: ")
+            continue
+        if _LIST_ITEM.match(line) and words >= max_words // 2:
+            flush()
+        sentences = _SENTENCE_END.split(line)
+        for number, sentence in enumerate(sentences):
+            count = len(sentence.split())
+            if words and words + count > max_words:
+                flush()
+            if number and lines and words:
+                lines[-1] = f"{lines[-1]} {sentence}"
+            else:
+                lines.append(sentence)
+            words += count
+    flush()
+    return chunks
+
+
+class BM25Index:
+    """Incremental Okapi BM25 over text chunks; chunks are numbered in the order they were added."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.texts: List[str] = []
+        self._lengths = array("I")
+        self._total_length = 0
+        # term -> (chunk numbers, term frequencies), appended to as chunks arrive
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        # Length normalization per chunk, valid until the next chunk changes the average length
+        self._norms: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def add(self, text: str, tokens: Optional[Sequence[str]] = None) -> bool:
+        """Index one chunk. Returns False if it has no searchable words."""
+        tokens = tokenize(text) if tokens is None else tokens
+        if not tokens:
+            return False
+        number = len(self.texts)
+        self._norms = None
+        self.texts.append(text)
+        self._lengths.append(len(tokens))
+        self._total_length += len(tokens)
+        for term, frequency in Counter(tokens).items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("I"), array("H"))
+            postings[0].append(number)
+            postings[1].append(min(frequency, 65535))
+        return True
+
+    def idf(self, term: str) -> float:
+        """Return the term's inverse document frequency (never negative, highest for unseen terms)."""
+        postings = self._postings.get(term)
+        frequency = len(postings[0]) if postings else 0
+        return math.log(1 + (len(self.texts) - frequency + 0.5) / (frequency + 0.5))
+
+    def search(self, terms: Iterable[str], k: int) -> List[Tuple[int, float]]:
+        """Return up to k (chunk number, score) pairs for the query terms, best first."""
+        count = len(self.texts)
+        if not count or k <= 0:
+            return []
+        if self._norms is None:
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32)
+            self._norms = (self.k1 * (1 - self.b + self.b * lengths / (self._total_length / count))).astype(np.float32)
+        postings = []
+        for term in set(terms):
+            if term in self._postings:
+                numbers, frequencies = self._postings[term]
+                postings.append((np.frombuffer(numbers, dtype=np.uint32), np.frombuffer(frequencies, dtype=np.uint16),
+                                 np.float32(self.idf(term) * (self.k1 + 1))))
+        if not postings:
+            return []
+        # Words in most chunks (e.g. the destination's name) weigh little; only chunks that contain a
+        # rarer word can rank unless those frequent words alone outscore them (MaxScore)
+        rare = [numbers for numbers, _, _ in postings if len(numbers) <= count // 8]
+        bound = sum(weight for numbers, _, weight in postings if len(numbers) > count // 8)
+        if rare:
+            candidates = np.sort(np.concatenate(rare))
+            candidates = candidates[np.concatenate(([True], candidates[1:] != candidates[:-1]))]
+            scores = np.zeros(len(candidates), dtype=np.float32)
+            for numbers, frequencies, weight in postings:
+                # Postings are in chunk order, so each candidate's entry can be found by bisection
+                positions = np.minimum(np.searchsorted(numbers, candidates), len(numbers) - 1)
+                present = numbers[positions] == candidates
+                found = frequencies[positions[present]].astype(np.float32)
+                scores[present] += weight * found / (found + self._norms[candidates[present]])
+            best = np.argsort(-scores, kind="stable")[:k]
+            if not bound or (len(best) == k and scores[best[-1]] >= bound):
+                return [(int(candidates[i]), float(scores[i])) for i in best]
+        scores = np.zeros(count, dtype=np.float32)
+        for numbers, frequencies, weight in postings:
+            found = frequencies.astype(np.float32)
+            # A term occurs once per chunk in its postings, so fancy-index addition is safe
+            scores[numbers] += weight * found / (found + self._norms[numbers])
+        top = min(k, count)
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(int(number), float(scores[number])) for number in best if scores[number] > 0]
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        index = cls(k1, b)
+        for text in texts:
+            index.add(text)
+        return index
+
+
+class ResponseIndex:
+    """BM25 indexes of earlier answers, one per destination, bounded in total chunks."""
+
+    def __init__(
+        self,
+        max_chunks: int = RETRIEVAL_MAX_CHUNKS,
+        max_destination_chunks: int = RETRIEVAL_MAX_DESTINATION_CHUNKS,
+        chunk_words: int = RETRIEVAL_CHUNK_WORDS,
+        top_k: int = RETRIEVAL_TOP_K
+    ):
+        self.max_chunks = max_chunks
+        self.max_destination_chunks = max(2, max_destination_chunks)
+        self.chunk_words = chunk_words
+        self.top_k = top_k
+        self._indexes: "OrderedDict[str, BM25Index]" = OrderedDict()
+        # Checksums of the chunks in each index, so an answer seen twice is indexed once
+        self._seen: Dict[str, Set[int]] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {"answers_indexed": 0, "evictions": 0}
+
+    @staticmethod
+    def partition(destination: str, budget: str = "", interests: Iterable[str] = ()) -> str:
+        """Group answers by destination and the budget and interests they were written for."""
+        normalized = sorted(" ".join(interest.split()).casefold() for interest in interests)
+        return "\n".join([" ".join(destination.split()).casefold(), budget.strip().casefold(), ",".join(normalized)])
+
+    def add(self, destination: str, text: str, budget: str = "", interests: Iterable[str] = ()) -> int:
+        """Index an answer about destination and return the number of new chunks."""
+        chunks = chunk_text(text, self.chunk_words)
+        partition = self.partition(destination, budget, interests)
+        added = 0
+        with self._lock:
+            index = self._indexes.get(partition)
+            if index is None:
+                index = self._indexes[partition] = BM25Index()
+                self._seen[partition] = set()
+            self._indexes.move_to_end(partition)
+            seen = self._seen[partition]
+            for chunk in chunks:
+                checksum = zlib.crc32(chunk.encode("utf-8"))
+                if checksum not in seen and index.add(chunk):
+                    seen.add(checksum)
+                    added += 1
+            self._size += added
+            self._stats["answers_indexed"] += 1
+            if len(index) > self.max_destination_chunks:
+                # Postings cannot shrink in place, so keep the newer half in a fresh index
+                kept = index.texts[-(self.max_destination_chunks // 2):]
+                self._indexes[partition] = BM25Index.from_texts(kept)
+                self._seen[partition] = {zlib.crc32(chunk.encode("utf-8")) for chunk in kept}
+                self._size -= len(index) - len(kept)
+                self._stats["evictions"] += len(index) - len(kept)
+            while self._size > self.max_chunks and len(self._indexes) > 1:
+                oldest, evicted = self._indexes.popitem(last=False)
+                del self._seen[oldest]
+                self._size -= len(evicted)
+                self._stats["evictions"] += len(evicted)
+        return added
+
+    def lookup(self, destination: str, question: str, budget: str = "",
+               interests: Iterable[str] = ()) -> Tuple[float, List[str]]:
+        """Return the retrieval confidence for question and the best excerpts, best first.
+
+        Confidence is the share of the question's words, weighted by IDF, that the best
+        excerpt contains; words no answer has ever used weigh the most.
+        """
+        terms = set(tokenize(question))
+        partition = self.partition(destination, budget, interests)
+        with self._lock:
+            index = self._indexes.get(partition)
+            if index is None or len(terms) < RETRIEVAL_MIN_QUERY_TERMS:
+                return 0.0, []
+            self._indexes.move_to_end(partition)
+            hits = index.search(terms, self.top_k)
+            weights = {term: index.idf(term) for term in terms}
+            excerpts = [index.texts[number] for number, _ in hits]
+        if not excerpts:
+            return 0.0, []
+        covered = terms & set(tokenize(excerpts[0]))
+        return sum(weights[term] for term in covered) / sum(weights.values()), excerpts
+
+    def stats(self) -> Dict[str, float]:
+        """Return the indexed chunks and destinations, plus answer and eviction counters."""
+        with self._lock:
+            return {"chunks": self._size, "destinations": len(self._indexes), **self._stats}
+
+
+def classify(confidence: float, question: str) -> str:
+    """Return how question, with this retrieval confidence, is answered: answered, grounded or miss.
+
+    Only questions with RETRIEVAL_ANSWER_MIN_TERMS informative words are answered from the excerpts
+    alone; a shorter one ("open daily?") says too little for a keyword match to settle it.
+    """
+    if confidence >= RETRIEVAL_ANSWER_THRESHOLD and len(set(tokenize(question))) >= RETRIEVAL_ANSWER_MIN_TERMS:
+        return "answered"
+    if confidence >= RETRIEVAL_GROUNDED_THRESHOLD:
+        return "grounded"
+    return "miss"
+
+
+def format_answer(destination: str, excerpts: Sequence[str]) -> str:
+    """Answer from the excerpts alone."""
+    return f"From what I found earlier about {destination}:\n\n" + "\n\n".join(excerpts)
+
+
+def build_grounded_prompt(question: str, destination: str, excerpts: Sequence[str]) -> str:
+    """Build a short prompt answering question from the excerpts."""
+    notes = "\n\n".join(excerpts)
+    return (
+        f"Notes from earlier answers about {destination}:\n{notes}\n\n"
+        f"Using these notes first, answer briefly: {question}"
+    )
+
+
+_default_index: Optional[ResponseIndex] = None
+_default_index_lock = threading.Lock()
+
+
+def get_response_index() -> ResponseIndex:
+    """Return the process-wide index of earlier answers shared by all sessions."""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = ResponseIndex()
+            get_metrics_registry().register_stats("travel_retrieval_index", "Retrieval index", _default_index.stats)
+        return _default_index
@@ -0,0 +1,274 @@
+"""
+Admission control for upstream LLM calls.
+
+Every session in the process shares one scheduler. Each backend gets a
+fixed number of concurrent upstream calls; further calls wait in a
+priority queue (interactive questions before bulk quick actions before
+speculative prefetches) and sessions take turns within a priority class,
+so one user's burst of clicks cannot starve the others. Lower classes
+may not take the last PRIORITY_RESERVED_SLOTS of a backend, so
+speculative work never holds every slot while a user waits. Calls are
+rejected with QueueFull when too many are already waiting, and with
+QueueTimeout when they wait longer than the queue deadline.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Deque, Dict, Iterator, Optional
+
+from ..config import (
+    BACKEND_CONCURRENCY, PRIORITY_CLASSES, PRIORITY_RESERVED_SLOTS, SCHEDULER_MAX_QUEUE, SCHEDULER_QUEUE_DEADLINE
+)
+from .metrics import get_metrics_registry, llm_admission_wait, llm_rejections
+
+# Session the current call belongs to; callers serving many users (the API) set it per request
+current_session: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_session", default=None)
+
+
+class AdmissionError(RuntimeError):
+    """Raised when a call is not admitted to a backend."""
+
+
+class QueueFull(AdmissionError):
+    pass
+
+
+class QueueTimeout(AdmissionError):
+    pass
+
+
+class _Ticket:
+    def __init__(self, session: str, priority: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.session = session
+        self.priority = priority
+        self.granted = False
+        self.event = threading.Event()
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+
+    def grant(self) -> bool:
+        """Wake the waiting caller; returns False if it can no longer be woken."""
+        self.granted = True
+        if self.future is None:
+            self.event.set()
+            return True
+        try:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+        except RuntimeError:
+            # The waiter's event loop has closed
+            return False
+        return True
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class _BackendQueue:
+    def __init__(self, limit: int, reserved: Dict[str, int]):
+        self.limit = limit
+        # Slots each priority class may hold; one is always allowed so every class makes progress
+        self.caps = {priority: max(1, limit - reserved.get(priority, 0)) for priority in PRIORITY_CLASSES}
+        self.active = 0
+        self.active_by_priority = {priority: 0 for priority in PRIORITY_CLASSES}
+        self.depth = 0
+        # Per priority class, each session's waiting tickets in round-robin order
+        self.waiting: Dict[str, "OrderedDict[str, Deque[_Ticket]]"] = {
+            priority: OrderedDict() for priority in PRIORITY_CLASSES
+        }
+
+    def push(self, ticket: _Ticket) -> None:
+        self.waiting[ticket.priority].setdefault(ticket.session, deque()).append(ticket)
+        self.depth += 1
+
+    def admits(self, priority: str) -> bool:
+        """Return True if a call at priority may take a free slot now."""
+        return self.active < self.limit and self.held(priority) < self.caps[priority]
+
+    def held(self, priority: str) -> int:
+        """Return the slots held by calls at priority or below, which share its cap."""
+        index = PRIORITY_CLASSES.index(priority)
+        return sum(self.active_by_priority[lower] for lower in PRIORITY_CLASSES[index:])
+
+    def waiting_ahead(self, priority: str) -> bool:
+        """Return True if calls at priority or above are already waiting."""
+        index = PRIORITY_CLASSES.index(priority)
+        return any(self.waiting[higher] for higher in PRIORITY_CLASSES[:index + 1])
+
+    def take(self, priority: str) -> None:
+        self.active += 1
+        self.active_by_priority[priority] += 1
+
+    def give_back(self, priority: str) -> None:
+        self.active -= 1
+        self.active_by_priority[priority] -= 1
+
+    def pop(self) -> Optional[_Ticket]:
+        for priority, sessions in self.waiting.items():
+            if sessions and self.admits(priority):
+                session, tickets = sessions.popitem(last=False)
+                ticket = tickets.popleft()
+                if tickets:
+                    # The session goes to the back of the line for its next call
+                    sessions[session] = tickets
+                self.depth -= 1
+                return ticket
+        return None
+
+    def remove(self, ticket: _Ticket) -> None:
+        tickets = self.waiting[ticket.priority].get(ticket.session)
+        if tickets and ticket in tickets:
+            tickets.remove(ticket)
+            self.depth -= 1
+            if not tickets:
+                del self.waiting[ticket.priority][ticket.session]
+
+
+class AdmissionScheduler:
+    def __init__(
+        self,
+        limits: Optional[Dict[str, int]] = None,
+        max_queue: int = SCHEDULER_MAX_QUEUE,
+        deadline: float = SCHEDULER_QUEUE_DEADLINE,
+        reserved: Optional[Dict[str, int]] = None
+    ):
+        self.limits = dict(BACKEND_CONCURRENCY if limits is None else limits)
+        self.reserved = dict(PRIORITY_RESERVED_SLOTS if reserved is None else reserved)
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self._queues: Dict[str, _BackendQueue] = {}
+        self._lock = threading.Lock()
+
+    def _queue(self, backend: str) -> _BackendQueue:
+        queue = self._queues.get(backend)
+        if queue is None:
+            queue = self._queues[backend] = _BackendQueue(max(1, self.limits.get(backend, 4)), self.reserved)
+        return queue
+
+    def _enter(self, backend: str, priority: str, session: str,
+               loop: Optional[asyncio.AbstractEventLoop] = None) -> Optional[_Ticket]:
+        """Take a slot now (returns None) or queue a ticket to wait on."""
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class: {priority}")
+        with self._lock:
+            queue = self._queue(backend)
+            if queue.admits(priority) and not queue.waiting_ahead(priority):
+                queue.take(priority)
+                return None
+            if queue.depth >= self.max_queue:
+                llm_rejections.inc(backend, priority, "queue_full")
+                raise QueueFull(
+                    f"The {backend} backend is busy ({queue.depth} requests waiting). Please try again shortly."
+                )
+            ticket = _Ticket(session, priority, loop)
+            queue.push(ticket)
+            return ticket
+
+    def _abandon(self, backend: str, ticket: _Ticket) -> bool:
+        """Withdraw a ticket whose caller stopped waiting; returns True if it was granted meanwhile."""
+        with self._lock:
+            if ticket.granted:
+                return True
+            self._queue(backend).remove(ticket)
+            return False
+
+    def release(self, backend: str, priority: str = "interactive") -> None:
+        """Free a slot held at priority and hand it to the next waiting call."""
+        with self._lock:
+            queue = self._queue(backend)
+            queue.give_back(priority)
+            while True:
+                ticket = queue.pop()
+                if ticket is None:
+                    break
+                queue.take(ticket.priority)
+                if not ticket.grant():
+                    queue.give_back(ticket.priority)
+
+    def _timed_out(self, backend: str, priority: str) -> QueueTimeout:
+        llm_rejections.inc(backend, priority, "deadline")
+        return QueueTimeout(f"Waited more than {self.deadline:g}s for the {backend} backend")
+
+    @contextmanager
+    def slot(self, backend: str, priority: str = "interactive", session: Optional[str] = None) -> Iterator[float]:
+        """Hold one of backend's concurrency slots; yields the seconds spent waiting for it."""
+        started = time.perf_counter()
+        ticket = self._enter(backend, priority, session or current_session.get() or "")
+        if ticket is not None and not ticket.event.wait(self.deadline):
+            if not self._abandon(backend, ticket):
+                raise self._timed_out(backend, priority)
+        waited = time.perf_counter() - started
+        llm_admission_wait.observe(waited, backend, priority)
+        try:
+            yield waited
+        finally:
+            self.release(backend, priority)
+
+    @asynccontextmanager
+    async def aslot(self, backend: str, priority: str = "interactive",
+                    session: Optional[str] = None) -> AsyncIterator[float]:
+        """Async variant of slot(); waiting does not block the event loop."""
+        started = time.perf_counter()
+        ticket = self._enter(backend, priority, session or current_session.get() or "",
+                             asyncio.get_running_loop())
+        if ticket is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(ticket.future), self.deadline)
+            except asyncio.TimeoutError:
+                if not self._abandon(backend, ticket):
+                    raise self._timed_out(backend, priority)
+            except BaseException:
+                # Cancelled while queued: give back a slot granted in the meantime
+                if self._abandon(backend, ticket):
+                    self.release(backend, priority)
+                raise
+        waited = time.perf_counter() - started
+        llm_admission_wait.observe(waited, backend, priority)
+        try:
+            yield waited
+        finally:
+            self.release(backend, priority)
+
+    def has_capacity(self, backend: str, priority: str = "interactive") -> bool:
+        """Return True if a call to backend at priority would be admitted now without queueing."""
+        with self._lock:
+            queue = self._queue(backend)
+            return queue.admits(priority) and not queue.waiting_ahead(priority)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Return active calls, limit and queue depth per priority for every backend."""
+        with self._lock:
+            return {
+                backend: {
+                    "active": queue.active,
+                    "limit": queue.limit,
+                    **{f"waiting_{priority}": sum(len(tickets) for tickets in sessions.values())
+                       for priority, sessions in queue.waiting.items()},
+                }
+                for backend, queue in self._queues.items()
+            }
+
+
+_scheduler = AdmissionScheduler()
+
+
+def get_scheduler() -> AdmissionScheduler:
+    """Return the process-wide admission scheduler."""
+    return _scheduler
+
+
+def _collect_queues():
+    for backend, stats in _scheduler.stats().items():
+        labels = {"backend": backend}
+        yield "travel_scheduler_active_calls", "Upstream calls holding a slot", labels, stats["active"]
+        yield "travel_scheduler_concurrency_limit", "Configured concurrent calls per backend", labels, stats["limit"]
+        for priority in PRIORITY_CLASSES:
+            yield ("travel_scheduler_queue_depth", "Calls waiting for a slot",
+                   {"backend": backend, "priority": priority}, stats[f"waiting_{priority}"])
+
+
+get_metrics_registry().register_collector(_collect_queues)
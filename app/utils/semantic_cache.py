@@ -0,0 +1,262 @@
+"""
+Semantic near-duplicate cache for free-text questions.
+
+Queries are embedded offline with signed feature hashing over words, word
+pairs and character trigrams, then compared by cosine similarity against
+every cached query for the same destination and travel context in one
+NumPy matrix-vector product. Word pairs keep the word order ("from Kyoto
+to Osaka" is not "from Osaka to Kyoto") and negated words are features of
+their own, so questions that differ only in either do not share answers.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import (
+    CACHE_DURATION, SEMANTIC_CACHE_DIM, SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_MAX_PARTITION_ENTRIES, SEMANTIC_CACHE_THRESHOLD
+)
+from .metrics import get_metrics_registry
+from .text import STOPWORDS, stem
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_CONTRACTED_NOT = re.compile(r"\b(?:ca|wo)?n['’]t\b|(?<=\w)n['’]t\b")
+_STOPWORDS = STOPWORDS | frozenset("many please recommend spend suggest top way".split())
+# Kept as terms, so the word pairs show direction ("from kyoto", "to osaka")
+_LINKS = frozenset("from into to via".split())
+# After these, "to" starts a verb ("what to pack", "where to stay") rather than a direction
+_QUESTION_WORDS = frozenset("how what when where which who whether".split())
+# Turn the next word into a negated feature instead of being dropped
+_NEGATIONS = frozenset("cannot never no not without".split())
+# Words asked about interchangeably; each maps to one term
+_SYNONYMS = {
+    "eat": "food", "dine": "food", "dining": "food", "cuisine": "food", "dish": "food",
+    "budget": "cheap", "affordable": "cheap", "inexpensive": "cheap",
+    "neighbourhood": "area", "neighborhood": "area", "district": "area",
+    "accommodation": "hotel", "lodging": "hotel",
+}
+# Whole words, negated words and word pairs carry more meaning than trigrams
+_WEIGHTS = {"w": 2.0, "n": 3.0, "b": 3.0, "c": 1.0}
+
+
+@lru_cache(maxsize=65536)
+def _feature(feature: str, dim: int) -> Tuple[int, float]:
+    # crc32 is stable across processes, unlike hash()
+    digest = zlib.crc32(feature.encode("utf-8"))
+    return digest % dim, (1.0 if digest & 0x80000000 else -1.0)
+
+
+class HashingVectorizer:
+    """Embed text as an L2-normalized signed hashing vector of words, word pairs and trigrams."""
+
+    def __init__(self, dim: int = SEMANTIC_CACHE_DIM):
+        self.dim = dim
+
+    @staticmethod
+    def terms(text: str) -> List[str]:
+        """Return the question's terms in order: stemmed, synonyms merged, negated ones prefixed with "!"."""
+        terms: List[str] = []
+        negated = False
+        previous = ""
+        for word in _TOKEN_PATTERN.findall(_CONTRACTED_NOT.sub(" not", text.lower())):
+            if word in _NEGATIONS:
+                negated = True
+            elif word in _LINKS:
+                if word != "to" or previous not in _QUESTION_WORDS:
+                    terms.append(word)
+            elif word not in _STOPWORDS:
+                term = stem(word)
+                term = _SYNONYMS.get(term, term)
+                terms.append(f"!{term}" if negated else term)
+                negated = False
+            previous = word
+        return terms
+
+    def features(self, text: str) -> List[str]:
+        terms = self.terms(text)
+        features = [f"b:{first} {second}" for first, second in zip(terms, terms[1:])]
+        for previous, term in zip([""] + terms, terms):
+            if term in _LINKS:
+                continue
+            word = term.lstrip("!")
+            # After a link the pair ("to osaka") stands for the word, so reversed routes share less
+            if previous not in _LINKS:
+                features.append(f"n:{word}" if term != word else f"w:{word}")
+            padded = f"#{word}#"
+            features.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+        return features
+
+    def transform(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self.features(text):
+            index, sign = _feature(feature, self.dim)
+            vector[index] += sign * _WEIGHTS[feature[0]]
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+
+class _Partition:
+    """Fixed-capacity ring of query vectors for one destination and context."""
+
+    def __init__(self, dim: int, capacity: int):
+        self.capacity = capacity
+        self.vectors = np.zeros((min(capacity, 64), dim), dtype=np.float32)
+        self.expires_at = np.zeros(len(self.vectors), dtype=np.float64)
+        self.values: List[Optional[str]] = [None] * len(self.vectors)
+        self.size = 0
+        self.used = 0  # high-water mark of slots ever written
+        self.next_slot = 0
+
+    def _grow(self) -> None:
+        new_rows = min(len(self.vectors) * 2, self.capacity)
+        vectors = np.zeros((new_rows, self.vectors.shape[1]), dtype=np.float32)
+        vectors[:len(self.vectors)] = self.vectors
+        expires_at = np.zeros(new_rows, dtype=np.float64)
+        expires_at[:len(self.expires_at)] = self.expires_at
+        self.values.extend([None] * (new_rows - len(self.values)))
+        self.vectors, self.expires_at = vectors, expires_at
+
+    def add(self, vector: np.ndarray, value: str, expires_at: float) -> bool:
+        """Insert an entry, overwriting the oldest one when full. Returns True if one was evicted."""
+        if self.next_slot >= len(self.vectors) and len(self.vectors) < self.capacity:
+            self._grow()
+        slot = self.next_slot % self.capacity
+        evicted = self.size == self.capacity
+        self.vectors[slot] = vector
+        self.expires_at[slot] = expires_at
+        self.values[slot] = value
+        self.size = min(self.size + 1, self.capacity)
+        self.used = max(self.used, slot + 1)
+        self.next_slot = slot + 1
+        return evicted
+
+    def pop_oldest(self) -> None:
+        if not self.size:
+            return
+        slot = (self.next_slot - self.size) % self.capacity
+        self.expires_at[slot] = 0.0
+        self.values[slot] = None
+        self.size -= 1
+
+    def search(self, vector: np.ndarray, now: float) -> Tuple[float, Optional[str]]:
+        rows = self.used
+        if not rows:
+            return 0.0, None
+        scores = self.vectors[:rows] @ vector
+        scores[self.expires_at[:rows] <= now] = -1.0
+        best = int(np.argmax(scores))
+        return float(scores[best]), self.values[best]
+
+
+class SemanticCache:
+    """Bounded cosine-similarity cache partitioned by destination and travel context."""
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl: float = CACHE_DURATION,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        max_partition_entries: int = SEMANTIC_CACHE_MAX_PARTITION_ENTRIES,
+        vectorizer: Optional[HashingVectorizer] = None
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_partition_entries = max_partition_entries
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self._partitions: "OrderedDict[str, _Partition]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def partition_key(model: Iterable[Any], context: Optional[Dict[str, Any]]) -> str:
+        """Group entries by model and the travel context the answer depended on."""
+        context = context or {}
+        payload = json.dumps([
+            list(model),
+            (context.get("destination") or "").strip().casefold(),
+            context.get("dates") or "",
+            context.get("budget") or "",
+            sorted(context.get("interests") or [])
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def query_text(query: str, context: Optional[Dict[str, Any]]) -> str:
+        """Drop the destination's name from query; the partition already matches on it."""
+        destination = ((context or {}).get("destination") or "").strip()
+        if not destination:
+            return query
+        return re.sub(re.escape(destination), " ", query, flags=re.IGNORECASE)
+
+    def get(self, partition: str, query: str) -> Optional[str]:
+        """Return a cached answer for a near-duplicate query, or None."""
+        vector = self.vectorizer.transform(query)
+        with self._lock:
+            entries = self._partitions.get(partition)
+            if entries is not None:
+                self._partitions.move_to_end(partition)
+                score, value = entries.search(vector, time.time())
+                if value is not None and score >= self.threshold:
+                    self._stats["hits"] += 1
+                    return value
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, partition: str, query: str, value: str) -> None:
+        """Cache value as the answer to query within partition."""
+        vector = self.vectorizer.transform(query)
+        with self._lock:
+            entries = self._partitions.get(partition)
+            if entries is None:
+                entries = _Partition(self.vectorizer.dim, self.max_partition_entries)
+                self._partitions[partition] = entries
+            self._partitions.move_to_end(partition)
+            if entries.add(vector, value, time.time() + self.ttl):
+                self._stats["evictions"] += 1
+            else:
+                self._size += 1
+            # Enforce the global bound by trimming the least recently used partitions
+            while self._size > self.max_entries:
+                oldest_key, oldest = next(iter(self._partitions.items()))
+                oldest.pop_oldest()
+                self._size -= 1
+                self._stats["evictions"] += 1
+                if not oldest.size:
+                    del self._partitions[oldest_key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the number of cached queries."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._size
+            stats["partitions"] = len(self._partitions)
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+            return stats
+
+
+_default_semantic_cache: Optional[SemanticCache] = None
+_default_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Return the process-wide semantic cache shared by all sessions."""
+    global _default_semantic_cache
+    with _default_semantic_cache_lock:
+        if _default_semantic_cache is None:
+            _default_semantic_cache = SemanticCache()
+            get_metrics_registry().register_stats(
+                "travel_semantic_cache", "Semantic cache", _default_semantic_cache.stats)
+        return _default_semantic_cache
@@ -0,0 +1,217 @@
+"""
+Durable sessions that survive restarts and move between app processes.
+
+A session is named by a random token carried in the page URL. Every change
+to it (the chosen model, the sidebar preferences, each exchange added to
+the conversation memory) is appended to the session's log in SQLite; once
+SESSION_COMPACT_EVERY changes have piled up they are folded into a single
+snapshot and dropped from the log. Restoring reads the snapshot plus the
+few changes logged since, so it takes milliseconds however long the
+session has run. The chat messages themselves are written through to the
+history archive by a durable ChatHistory. Every process that shares
+CACHE_DIR shares the sessions.
+"""
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import SESSION_COMPACT_EVERY, SESSION_DB_PATH, SESSION_RETENTION
+from .memory import ConversationMemory
+from .metrics import get_metrics_registry
+
+_TOKEN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+Change = Tuple[str, Any]  # (kind, data)
+
+
+def new_session_token() -> str:
+    """Return a new unguessable session token."""
+    return secrets.token_urlsafe(16)
+
+
+def is_session_token(value: Optional[str]) -> bool:
+    return bool(value and _TOKEN.match(value))
+
+
+def _pack(data: Any) -> bytes:
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+
+
+def _unpack(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def fold(state: Dict[str, Any], changes: List[Change]) -> Dict[str, Any]:
+    """Apply logged changes, oldest first, to a session state and return the new state."""
+    state = dict(state)
+    memory = None
+    for kind, data in changes:
+        if kind == "exchange":
+            if memory is None:
+                memory = ConversationMemory()
+                memory.restore(state.get("memory", {}))
+            memory.add_turn("user", data["prompt"])
+            memory.add_turn("assistant", data["response"])
+        else:
+            # Other changes replace the previous value of their kind
+            state[kind] = data
+    if memory is not None:
+        state["memory"] = memory.snapshot()
+    return state
+
+
+class SessionStore:
+    """Change logs and compacted snapshots of every session, kept in one SQLite file."""
+
+    def __init__(
+        self,
+        db_path: str = SESSION_DB_PATH,
+        compact_every: int = SESSION_COMPACT_EVERY,
+        retention: float = SESSION_RETENTION
+    ):
+        self.compact_every = max(1, compact_every)
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._counts = {"appends": 0, "compactions": 0, "restores": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS session_log ("
+            "token TEXT NOT NULL, seq INTEGER NOT NULL, kind TEXT NOT NULL, data BLOB NOT NULL, "
+            "created_at REAL NOT NULL, PRIMARY KEY (token, seq))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS session_snapshots ("
+            "token TEXT PRIMARY KEY, seq INTEGER NOT NULL, state BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+        # Sessions do not say goodbye, so the ones idle for longer than the retention expire
+        stale = [(token,) for (token,) in self._db.execute(
+            "SELECT token FROM (SELECT token, created_at AS at FROM session_log "
+            "UNION ALL SELECT token, updated_at FROM session_snapshots) GROUP BY token HAVING MAX(at) < ?",
+            (time.time() - retention,)
+        )]
+        self._db.executemany("DELETE FROM session_log WHERE token = ?", stale)
+        self._db.executemany("DELETE FROM session_snapshots WHERE token = ?", stale)
+        self._db.commit()
+
+    def append(self, token: str, kind: str, data: Any) -> None:
+        """Log one change to token's session, compacting the log once it has grown long."""
+        with self._lock:
+            # Numbered after both the log and the snapshot, so numbers keep growing across compactions
+            self._db.execute(
+                "INSERT INTO session_log (token, seq, kind, data, created_at) SELECT ?, MAX("
+                "COALESCE((SELECT MAX(seq) FROM session_log WHERE token = ?), 0), "
+                "COALESCE((SELECT seq FROM session_snapshots WHERE token = ?), 0)) + 1, ?, ?, ?",
+                (token, token, token, kind, _pack(data), time.time())
+            )
+            self._db.commit()
+            self._counts["appends"] += 1
+            (logged,) = self._db.execute("SELECT COUNT(*) FROM session_log WHERE token = ?", (token,)).fetchone()
+        if logged >= self.compact_every:
+            self.compact(token)
+
+    def _read(self, token: str) -> Tuple[Optional[Dict[str, Any]], List[Tuple[int, str, Any]]]:
+        # Callers hold a transaction, so a compaction in another process cannot interleave
+        row = self._db.execute("SELECT seq, state FROM session_snapshots WHERE token = ?", (token,)).fetchone()
+        snapshot, seq = (_unpack(row[1]), row[0]) if row else (None, 0)
+        changes = [
+            (number, kind, _unpack(data)) for number, kind, data in self._db.execute(
+                "SELECT seq, kind, data FROM session_log WHERE token = ? AND seq > ? ORDER BY seq", (token, seq)
+            )
+        ]
+        return snapshot, changes
+
+    def load(self, token: str) -> Optional[Dict[str, Any]]:
+        """Return token's session state (its snapshot plus later changes), or None if unknown or expired."""
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                snapshot, changes = self._read(token)
+            finally:
+                self._db.commit()
+            if snapshot is None and not changes:
+                return None
+            self._counts["restores"] += 1
+        return fold(snapshot or {}, [(kind, data) for _, kind, data in changes])
+
+    def compact(self, token: str) -> None:
+        """Fold token's logged changes into its snapshot and drop them from the log."""
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so processes compacting together take turns
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                snapshot, changes = self._read(token)
+                if changes:
+                    state = fold(snapshot or {}, [(kind, data) for _, kind, data in changes])
+                    last = changes[-1][0]
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO session_snapshots (token, seq, state, updated_at) VALUES (?, ?, ?, ?)",
+                        (token, last, _pack(state), time.time())
+                    )
+                    self._db.execute("DELETE FROM session_log WHERE token = ? AND seq <= ?", (token, last))
+                    self._counts["compactions"] += 1
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+
+    def delete(self, token: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM session_log WHERE token = ?", (token,))
+            self._db.execute("DELETE FROM session_snapshots WHERE token = ?", (token,))
+            self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Return the stored sessions, logged changes and snapshot size, plus this process's counters."""
+        with self._lock:
+            snapshots, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(state)), 0) FROM session_snapshots").fetchone()
+            logged, sessions = self._db.execute("SELECT COUNT(*), COUNT(DISTINCT token) FROM session_log").fetchone()
+            return {"snapshots": snapshots, "snapshot_bytes": size, "logged_changes": logged,
+                    "sessions_with_log": sessions, **self._counts}
+
+
+class SessionJournal:
+    """Records one session's changes in the store, skipping values that did not change."""
+
+    def __init__(self, token: str, state: Optional[Dict[str, Any]] = None, store: Optional[SessionStore] = None):
+        self.token = token
+        self._store = store
+        self._last = dict(state or {})
+
+    @property
+    def store(self) -> SessionStore:
+        if self._store is None:
+            self._store = get_session_store()
+        return self._store
+
+    def record(self, kind: str, data: Any) -> None:
+        """Log kind's new value (e.g. "model" or "preferences") if it differs from the last one."""
+        if self._last.get(kind) != data:
+            self.store.append(self.token, kind, data)
+            self._last[kind] = data
+
+    def record_exchange(self, prompt: str, response: str) -> None:
+        """Log an exchange added to the conversation memory; use as LLMHandler's on_remember."""
+        self.store.append(self.token, "exchange", {"prompt": prompt, "response": response})
+
+
+_default_store: Optional[SessionStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Return the process-wide session store."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = SessionStore()
+            get_metrics_registry().register_stats("travel_sessions", "Persisted sessions", _default_store.stats)
+        return _default_store
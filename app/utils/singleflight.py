@@ -0,0 +1,211 @@
+"""
+Single-flight coalescing of identical in-flight LLM requests.
+
+The first caller for a key (the leader) makes the upstream call; callers
+that arrive while it is still running (followers) wait for and share its
+result instead of issuing their own. Works across Streamlit's session
+threads and asyncio callers, including streams: stream followers replay
+the chunks the leader has received so far and then follow along live.
+A leader that goes away while followers are still waiting (a closed
+stream, a cancelled task) leaves the upstream call running for them.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Iterator, List
+
+from .metrics import get_metrics_registry
+
+
+class _Flight:
+    def __init__(self):
+        self.future: Future = Future()
+        self.chunks: List[str] = []
+        self.streamed = False
+        self.followers = 0
+        self.condition = threading.Condition()
+
+    def publish(self, chunk: str) -> None:
+        with self.condition:
+            self.streamed = True
+            self.chunks.append(chunk)
+            self.condition.notify_all()
+
+    def finish(self, result: Any = None, error: BaseException = None) -> None:
+        with self.condition:
+            if error is not None:
+                self.future.set_exception(error)
+            else:
+                self.future.set_result(result)
+            self.condition.notify_all()
+
+    def follow(self) -> Iterator[str]:
+        """Yield the leader's chunks as they arrive, then its final result if it did not stream."""
+        position = 0
+        while True:
+            with self.condition:
+                while position >= len(self.chunks) and not self.future.done():
+                    self.condition.wait()
+                pending = self.chunks[position:]
+                position = len(self.chunks)
+                done = self.future.done()
+            yield from pending
+            if done:
+                break
+        result = self.future.result()
+        if not self.streamed and result:
+            yield result
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    def _join(self, key: str):
+        """Return (flight, is_leader) for key, registering a new flight if none is running."""
+        with self._lock:
+            self._stats["calls"] += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats["coalesced"] += 1
+                flight.followers += 1
+                return flight, False
+            flight = _Flight()
+            self._flights[key] = flight
+            self._stats["executions"] += 1
+            return flight, True
+
+    def _leave(self, key: str, flight: _Flight) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def _unfollow(self, flight: _Flight) -> None:
+        with self._lock:
+            flight.followers -= 1
+
+    def _abandon(self, key: str, flight: _Flight) -> bool:
+        """Drop the flight if nobody follows it any more; return False if followers still wait on it."""
+        with self._lock:
+            if flight.followers > 0:
+                return False
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            return True
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run fn once for all concurrent callers with the same key."""
+        flight, leader = self._join(key)
+        if not leader:
+            try:
+                return flight.future.result()
+            finally:
+                self._unfollow(flight)
+        try:
+            result = fn()
+        except BaseException as e:
+            self._leave(key, flight)
+            flight.finish(error=e)
+            raise
+        self._leave(key, flight)
+        flight.finish(result)
+        return result
+
+    async def ado(self, key: str, coro_fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant of do; coalesces with both async and threaded callers."""
+        flight, leader = self._join(key)
+        if not leader:
+            try:
+                return await asyncio.shield(asyncio.wrap_future(flight.future))
+            finally:
+                self._unfollow(flight)
+        # The call runs as its own task, so cancelling the leader does not cancel it for the followers
+        task = asyncio.ensure_future(coro_fn())
+        task.add_done_callback(lambda done: self._settle(key, flight, done))
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._abandon(key, flight):
+                task.cancel()
+            raise
+
+    def _settle(self, key: str, flight: _Flight, task: "asyncio.Future") -> None:
+        self._leave(key, flight)
+        if task.cancelled():
+            flight.finish(error=asyncio.CancelledError())
+        elif task.exception() is not None:
+            flight.finish(error=task.exception())
+        else:
+            flight.finish(task.result())
+
+    def stream(self, key: str, gen_fn: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """Stream gen_fn once for all concurrent callers, broadcasting its chunks."""
+        flight, leader = self._join(key)
+        if not leader:
+            try:
+                yield from flight.follow()
+            finally:
+                self._unfollow(flight)
+            return
+        upstream = gen_fn()
+        try:
+            for chunk in upstream:
+                flight.publish(chunk)
+                yield chunk
+        except GeneratorExit:
+            # The leader's reader stopped; finish the stream in the background if others still read it
+            if self._abandon(key, flight):
+                upstream.close()
+                flight.finish(error=RuntimeError("The shared request was cancelled"))
+            else:
+                threading.Thread(
+                    target=self._drain, args=(key, flight, upstream), name="single-flight-drain", daemon=True
+                ).start()
+            raise
+        except BaseException as e:
+            self._leave(key, flight)
+            flight.finish(error=e)
+            raise
+        self._leave(key, flight)
+        flight.finish("".join(flight.chunks))
+
+    def _drain(self, key: str, flight: _Flight, upstream: Iterator[str]) -> None:
+        """Publish the rest of an abandoned leader's stream while followers remain."""
+        try:
+            for chunk in upstream:
+                flight.publish(chunk)
+                if self._abandon(key, flight):
+                    upstream.close()
+                    flight.finish(error=RuntimeError("The shared request was cancelled"))
+                    return
+        except BaseException as e:
+            self._leave(key, flight)
+            flight.finish(error=e)
+            return
+        self._leave(key, flight)
+        flight.finish("".join(flight.chunks))
+
+    def has_followers(self, key: str) -> bool:
+        """Return True if other callers are waiting on the in-flight request for key."""
+        with self._lock:
+            flight = self._flights.get(key)
+            return flight is not None and flight.followers > 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return call, execution and coalesced counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights)
+            return stats
+
+
+_default_single_flight = SingleFlight()
+get_metrics_registry().register_stats(
+    "travel_single_flight", "Single-flight request coalescing", _default_single_flight.stats)
+
+
+def get_single_flight() -> SingleFlight:
+    """Return the process-wide single-flight group shared by all sessions."""
+    return _default_single_flight
@@ -0,0 +1,211 @@
+"""
+Structured (JSON) quick-action results.
+
+Instead of one free-text answer per budget and interest combination, the
+model is asked once per destination for a superset of records across all
+price tiers. The records are validated with pydantic, stored compactly,
+and every budget or interest variant is then filtered and rendered
+locally without another LLM call.
+"""
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
+
+from ..config import (
+    BUDGET_TIERS, INTERESTS, QUICK_ACTIONS, STRUCTURED_CACHE_DURATION, STRUCTURED_RESULTS_SHOWN,
+    STRUCTURED_SUPERSET_SIZE
+)
+from .cache import ResponseCache, get_response_cache, make_cache_key
+from .links import add_booking_links, providers_for
+from .reasoning import strip_reasoning
+
+PRICE_TIERS = ("budget", "moderate", "luxury")
+_TIER_ALIASES = {
+    "$": "budget", "cheap": "budget", "low": "budget", "inexpensive": "budget",
+    "$$": "moderate", "mid": "moderate", "mid-range": "moderate", "midrange": "moderate", "medium": "moderate",
+    "$$$": "luxury", "$$$$": "luxury", "high": "luxury", "high-end": "luxury", "expensive": "luxury",
+}
+_INTERESTS_BY_NAME = {interest.casefold(): interest for interest in INTERESTS}
+
+
+class Record(BaseModel):
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True)
+
+    name: str
+    description: str = ""
+    price_tier: str
+    area: Optional[str] = None
+    interests: List[str] = []
+
+    @field_validator("price_tier", mode="before")
+    @classmethod
+    def _normalize_tier(cls, value: Any) -> str:
+        tier = str(value).strip().casefold()
+        tier = _TIER_ALIASES.get(tier, tier)
+        if tier not in PRICE_TIERS:
+            raise ValueError(f"price_tier must be one of {', '.join(PRICE_TIERS)}")
+        return tier
+
+    @field_validator("interests", mode="before")
+    @classmethod
+    def _known_interests(cls, value: Any) -> List[str]:
+        # Keep only interests the sidebar offers, so filtering can match them exactly
+        if isinstance(value, str):
+            value = value.split(",")
+        names = (_INTERESTS_BY_NAME.get(str(item).strip().casefold()) for item in value or [])
+        return [name for name in names if name]
+
+
+class Hotel(Record):
+    price_per_night: Optional[str] = None
+
+
+class Activity(Record):
+    duration: Optional[str] = None
+
+
+class Restaurant(Record):
+    cuisine: Optional[str] = None
+
+
+RECORD_MODELS: Dict[str, Type[Record]] = {"hotels": Hotel, "activities": Activity, "restaurants": Restaurant}
+
+# One example item per action; shorter than a JSON schema and keeps the prompt small
+_EXAMPLES = {
+    "hotels": {"name": "Hotel name", "description": "One sentence", "price_tier": "moderate",
+               "price_per_night": "$150-200", "area": "Neighbourhood", "interests": ["Sightseeing"]},
+    "activities": {"name": "Activity name", "description": "One sentence", "price_tier": "budget",
+                   "duration": "2 hours", "area": "Neighbourhood", "interests": ["Culture & History"]},
+    "restaurants": {"name": "Restaurant name", "description": "One sentence", "price_tier": "luxury",
+                    "cuisine": "Cuisine", "area": "Neighbourhood", "interests": ["Food & Dining"]},
+}
+
+
+def build_structured_prompt(action: str, destination: str, count: int = STRUCTURED_SUPERSET_SIZE) -> str:
+    """Build the prompt asking for a budget-independent superset of records as JSON."""
+    if action not in RECORD_MODELS:
+        raise ValueError(f"Structured results are not available for: {action}")
+    label = QUICK_ACTIONS[action]["label"].lower()
+    return (
+        f"List {count} {label} in {destination}, spread across all price tiers "
+        f"({', '.join(PRICE_TIERS)}).\n"
+        f"Respond with JSON only, no other text, shaped like: "
+        f"{json.dumps({'items': [_EXAMPLES[action]]})}\n"
+        f"price_tier must be one of: {', '.join(PRICE_TIERS)}. "
+        f"interests lists which of these each entry suits: {', '.join(INTERESTS)}."
+    )
+
+
+def _extract_json(text: str) -> Any:
+    # Reasoning models may think out loud and wrap the answer in a code fence
+    text = strip_reasoning(text)
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", text, flags=re.DOTALL)
+    if fenced:
+        text = fenced.group(1)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError("The model did not return JSON")
+    start = min(starts)
+    end = max(text.rfind("}"), text.rfind("]")) + 1
+    try:
+        return json.loads(text[start:end])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"The model returned invalid JSON: {e}") from e
+
+
+def parse_records(action: str, text: str) -> List[Record]:
+    """Parse and validate model output; entries that fail validation are skipped."""
+    data = _extract_json(text)
+    if isinstance(data, dict):
+        data = data.get("items", next((value for value in data.values() if isinstance(value, list)), []))
+    model = RECORD_MODELS[action]
+    records = []
+    for item in data if isinstance(data, list) else []:
+        try:
+            records.append(model.model_validate(item))
+        except ValidationError:
+            continue
+    if not records:
+        raise ValueError("The model returned no valid results")
+    return records
+
+
+def filter_records(
+    records: Sequence[Record],
+    budget: str = "",
+    interests: Optional[Sequence[str]] = None,
+    limit: int = STRUCTURED_RESULTS_SHOWN
+) -> List[Record]:
+    """Select the records matching a budget option, ranked by how many interests they share."""
+    tier = BUDGET_TIERS.get(budget)
+    selected = [record for record in records if tier is None or record.price_tier == tier]
+    wanted = set(interests or [])
+    if wanted:
+        # Stable sort keeps the model's own ranking among equally relevant records
+        selected.sort(key=lambda record: len(wanted.intersection(record.interests)), reverse=True)
+    return selected[:limit]
+
+
+def render_records(action: str, records: Sequence[Record], destination: str, budget: str = "") -> str:
+    """Render records as markdown with booking links for the action's providers."""
+    label = QUICK_ACTIONS[action]["label"].lower()
+    if not records:
+        return f"No {label} in {destination} match the {budget or 'selected'} budget yet. Try another budget range."
+    providers = providers_for(action)
+    sections = []
+    for number, record in enumerate(records, 1):
+        lines = [f"### {number}. {record.name}"]
+        if record.description:
+            lines.append(record.description)
+        details = {"Price": record.price_tier.capitalize()}
+        for field in ("price_per_night", "cuisine", "duration", "area"):
+            value = getattr(record, field, None)
+            if value:
+                details[field.replace("_", " ").capitalize()] = value
+        if record.interests:
+            details["Good for"] = ", ".join(record.interests)
+        lines.extend(f"- **{key}:** {value}" for key, value in details.items())
+        if providers:
+            lines.append(" · ".join(f"{name}:" for name in providers))
+        sections.append("\n".join(lines))
+    return add_booking_links("\n\n".join(sections), destination, action)
+
+
+class StructuredStore:
+    """Validated records per model, action and destination, kept compact in the response cache."""
+
+    def __init__(self, cache: Optional[ResponseCache] = None, ttl: float = STRUCTURED_CACHE_DURATION):
+        self.cache = cache or get_response_cache()
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(model: Tuple[str, str], action: str, destination: str) -> str:
+        # make_cache_key normalizes case and whitespace, so "new  york" and "New York" share records
+        return make_cache_key(model[0], model[1], "structured", f"{action}\n{destination}")
+
+    def get(self, model: Tuple[str, str], action: str, destination: str) -> Optional[List[Record]]:
+        value = self.cache.get(self._key(model, action, destination))
+        if value is None:
+            return None
+        return [RECORD_MODELS[action].model_validate(item) for item in json.loads(value)]
+
+    def set(self, model: Tuple[str, str], action: str, destination: str, records: Sequence[Record]) -> None:
+        items = [record.model_dump(exclude_defaults=True) for record in records]
+        value = json.dumps(items, ensure_ascii=False, separators=(",", ":"))
+        self.cache.set(self._key(model, action, destination), value, ttl=self.ttl)
+
+
+_default_store: Optional[StructuredStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_structured_store() -> StructuredStore:
+    """Return the process-wide structured results store."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = StructuredStore()
+        return _default_store
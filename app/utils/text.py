@@ -0,0 +1,26 @@
+"""
+Word normalization shared by the semantic cache and the retrieval index.
+"""
+from functools import lru_cache
+
+# English function words that say little about what a travel question is after
+STOPWORDS = frozenset(
+    "a about also an and any are as at be been best but by can could do does for from get go goes going good has "
+    "have how i if in into is it its know like me my near need of on or our should so some tell than that the "
+    "their them there these they this to too us was we what when where which who why will with would you your"
+    .split()
+)
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """Strip common English suffixes, so "opening hours" matches "open" and "hour"."""
+    if len(word) > 5 and word.endswith("ing"):
+        return word[:-3]
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
@@ -0,0 +1 @@
+# Empty init file to make the directory a Python package 
\ No newline at end of file
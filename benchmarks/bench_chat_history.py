@@ -0,0 +1,108 @@
+"""
+Benchmark Streamlit rerun cost and session memory as a chat grows.
+
+Renders the chat the old way (every message on every rerun, all kept in
+session memory) and with ChatHistory (the latest HISTORY_PAGE_SIZE
+messages, older ones spilled to the compressed archive), and checks that
+the history returns exactly the messages that were added.
+
+Usage: python benchmarks/bench_chat_history.py [--lengths 20,200,1000] [--reruns 5]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="travel_ai_bench_"))
+
+from streamlit.testing.v1 import AppTest
+
+from app.config import HISTORY_PAGE_SIZE
+from app.utils.history import ChatHistory
+
+ANSWER = ("**Travel Buddy:** Start the morning at the old town market, then walk along the river to the "
+          "cathedral. Lunch at a family-run tavern near the square is a local favourite. ") * 8
+
+
+def render_all():
+    import streamlit as st
+
+    for message in st.session_state.messages:
+        st.markdown(message["content"])
+
+
+def render_window():
+    import streamlit as st
+
+    from app.config import HISTORY_PAGE_SIZE
+
+    for message in st.session_state.messages.window(HISTORY_PAGE_SIZE):
+        st.markdown(message["content"])
+
+
+def make_messages(count: int) -> List[Dict[str, str]]:
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"{i}: {ANSWER}"} for i in range(count)]
+
+
+def rerun_ms(script, messages, reruns: int) -> float:
+    at = AppTest.from_function(script)
+    at.session_state["messages"] = messages
+    at.run()
+    start = time.perf_counter()
+    for _ in range(reruns):
+        at.run()
+    return round((time.perf_counter() - start) / reruns * 1000, 2)
+
+
+def session_bytes(build) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lengths", default="20,200,1000", help="messages in the chat")
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for count in (int(value) for value in args.lengths.split(",")):
+        messages = make_messages(count)
+        history = ChatHistory()
+        for message in messages:
+            history.append(message)
+        if history.page(0, count) != messages:
+            raise SystemExit(f"ChatHistory returned different messages for a chat of {count}")
+
+        def build_history():
+            built = ChatHistory()
+            for message in make_messages(count):
+                built.append(message)
+            return built
+
+        results.append({
+            "messages": count,
+            "rerun_ms": {"render_all": rerun_ms(render_all, messages, args.reruns),
+                         "window": rerun_ms(render_window, history, args.reruns)},
+            "session_kb": {"list": round(session_bytes(lambda: make_messages(count)) / 1024, 1),
+                           "chat_history": round(session_bytes(build_history) / 1024, 1)},
+            "history": history.stats(),
+        })
+    print(json.dumps({"page_size": HISTORY_PAGE_SIZE, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
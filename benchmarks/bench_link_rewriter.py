@@ -0,0 +1,136 @@
+"""
+Benchmark the single-pass booking-link rewriter against the old four str.replace passes.
+
+Also checks that both produce the same output for the four hotel providers,
+and that rewriting a response streamed in small chunks matches rewriting
+it whole.
+
+Usage: python benchmarks/bench_link_rewriter.py [--sizes 10000,100000,1000000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from app.config import BOOKING_PROVIDERS
+from app.utils.links import LinkRewriter, providers_for
+
+DESTINATION = "New York"
+HOTEL_PROVIDERS = ["Booking.com", "Agoda", "MakeMyTrip", "Expedia"]
+FILLER = (
+    "Located in the heart of the city, this hotel offers spacious rooms, a rooftop bar "
+    "and easy access to the subway. Breakfast is included and the staff are friendly. "
+).split()
+
+
+def four_pass(response: str, destination: str) -> str:
+    """The original implementation from app/main.py."""
+    linked_response = response.replace("Booking.com:", "[Book on Booking.com](https://www.booking.com/search.html?ss=" + destination.replace(" ", "+") + ")")
+    linked_response = linked_response.replace("Agoda:", "[Book on Agoda](https://www.agoda.com/search?city=" + destination.replace(" ", "+") + ")")
+    linked_response = linked_response.replace("MakeMyTrip:", "[Book on MakeMyTrip](https://www.makemytrip.com/hotels/hotels-" + destination.replace(" ", "-").lower() + ")")
+    linked_response = linked_response.replace("Expedia:", "[Book on Expedia](https://www.expedia.com/Hotel-Search?destination=" + destination.replace(" ", "+") + ")")
+    return linked_response
+
+
+def n_pass(response: str, rewriter: LinkRewriter) -> str:
+    """The four-pass approach extended to every configured provider, one str.replace each."""
+    for mention, link in rewriter._links.items():
+        response = response.replace(mention, link)
+    return response
+
+
+def make_response(size: int, rng: random.Random, providers: List[str] = HOTEL_PROVIDERS) -> str:
+    """Build an answer of roughly size characters with provider mentions in every section."""
+    parts: List[str] = []
+    length = 0
+    hotel = 0
+    while length < size:
+        hotel += 1
+        section = [f"### {hotel}. Hotel {hotel}\n"]
+        section.append(" ".join(rng.choice(FILLER) for _ in range(rng.randint(20, 60))))
+        section.append("\n" + "\n".join(f"- {name}: available" for name in providers) + "\n\n")
+        text = "".join(section)
+        parts.append(text)
+        length += len(text)
+    return "".join(parts)
+
+
+def chunked(text: str, rng: random.Random, max_chunk: int) -> List[str]:
+    chunks, position = [], 0
+    while position < len(text):
+        step = rng.randint(1, max_chunk)
+        chunks.append(text[position:position + step])
+        position += step
+    return chunks
+
+
+def timed(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {"p50_ms": round(samples[len(samples) // 2] * 1000, 3), "min_ms": round(samples[0] * 1000, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="response sizes in characters")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--max-chunk", type=int, default=8, help="largest streamed chunk in characters")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    results = []
+    for size in (int(value) for value in args.sizes.split(",")):
+        response = make_response(size, rng)
+        chunks = chunked(response, rng, args.max_chunk)
+        expected = four_pass(response, DESTINATION)
+
+        rewriter = LinkRewriter(DESTINATION, providers_for("hotels"))
+        if rewriter.rewrite(response) != expected:
+            raise SystemExit(f"single-pass output differs from four-pass output at size {size}")
+        if "".join(LinkRewriter(DESTINATION, HOTEL_PROVIDERS).stream(chunks)) != expected:
+            raise SystemExit(f"streamed output differs from whole-text output at size {size}")
+
+        def stream_once():
+            for _ in LinkRewriter(DESTINATION, HOTEL_PROVIDERS).stream(chunks):
+                pass
+
+        four = timed(lambda: four_pass(response, DESTINATION), args.repeat)
+        single = timed(lambda: rewriter.rewrite(response), args.repeat)
+
+        # With every configured provider the naive approach needs one pass per provider
+        everything = make_response(size, rng, list(BOOKING_PROVIDERS))
+        all_rewriter = LinkRewriter(DESTINATION)
+        if all_rewriter.rewrite(everything) != n_pass(everything, all_rewriter):
+            raise SystemExit(f"single-pass output differs from n-pass output at size {size}")
+        many = timed(lambda: n_pass(everything, all_rewriter), args.repeat)
+        many_single = timed(lambda: all_rewriter.rewrite(everything), args.repeat)
+        results.append({
+            "size_chars": len(response),
+            "mentions": response.count(":"),
+            "four_pass": four,
+            "single_pass": single,
+            "speedup_p50": round(four["p50_ms"] / single["p50_ms"], 2) if single["p50_ms"] else None,
+            "all_providers": {
+                "providers": len(BOOKING_PROVIDERS),
+                "n_pass": many,
+                "single_pass": many_single,
+                "speedup_p50": round(many["p50_ms"] / many_single["p50_ms"], 2) if many_single["p50_ms"] else None,
+            },
+            "streamed": {**timed(stream_once, max(1, args.repeat // 4)), "chunks": len(chunks)},
+        })
+    print(json.dumps({"benchmark": "link_rewriter", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
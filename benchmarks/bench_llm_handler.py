@@ -0,0 +1,435 @@
+"""
+End-to-end LLMHandler benchmarks against the local fake LLM server.
+
+Prints machine-readable JSON for these scenarios:
+- latency, throughput and time-to-first-token of chat, stream_chat and the
+  quick actions on both backends
+- Ollama host routing
+- prompt evaluation and model loads saved by keep_alive and context reuse
+  in a multi-turn conversation
+- tokens and answer latency saved by the per-action reasoning profiles
+- quick-action click latency with and without speculative prefetch
+- a long itinerary as one generation vs. day by day in parallel
+
+Pass --baseline with an earlier result file to fail on regressions.
+
+Usage: python benchmarks/bench_llm_handler.py [--requests 20] [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from benchmarks.fake_llm_server import FakeLLMConfig, FakeLLMServer
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Return p50/p95/p99/mean in milliseconds."""
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return round(ordered[index] * 1000, 2)
+
+    return {"p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99),
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2), "count": len(ordered)}
+
+
+def make_handler(backend: str):
+    from app.utils import LLMHandler
+
+    # Caches and memory would hide the backend cost being measured
+    handler = LLMHandler(use_cache=False, use_memory=False)
+    handler.initialize_model(backend, "sk-fake" if backend == "openai" else None)
+    return handler
+
+
+def bench_chat(backend: str, requests: int) -> Dict[str, Any]:
+    handler = make_handler(backend)
+    samples = []
+    for i in range(requests):
+        start = time.perf_counter()
+        handler.chat(f"What should I see in Paris? ({i})", {"destination": "Paris"})
+        samples.append(time.perf_counter() - start)
+    return {"scenario": "chat", **summarize(samples)}
+
+
+def bench_stream(backend: str, requests: int) -> Dict[str, Any]:
+    handler = make_handler(backend)
+    first_token, total = [], []
+    for i in range(requests):
+        start = time.perf_counter()
+        ttft = None
+        for _ in handler.stream_chat(f"Where should I eat in Paris? ({i})", {"destination": "Paris"}):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+        total.append(time.perf_counter() - start)
+        first_token.append(ttft if ttft is not None else total[-1])
+    return {"scenario": "stream_chat", "ttft": summarize(first_token), "total": summarize(total)}
+
+
+def bench_throughput(backend: str, requests: int, concurrency: int) -> Dict[str, Any]:
+    handler = make_handler(backend)
+
+    def call(i: int) -> float:
+        start = time.perf_counter()
+        handler.chat(f"Plan a day in Rome ({i})", {"destination": "Rome"})
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(call, range(requests)))
+    elapsed = time.perf_counter() - start
+    return {"scenario": "chat_throughput", "concurrency": concurrency,
+            "requests_per_second": round(requests / elapsed, 2), **summarize(samples)}
+
+
+def bench_quick_actions(backend: str, rounds: int) -> Dict[str, Any]:
+    from app.config import QUICK_ACTIONS
+    from app.utils import build_quick_action, close_async_clients
+
+    handler = make_handler(backend)
+    interests = ["Food & Dining"]
+    sequential, concurrent = [], []
+    for i in range(rounds):
+        destination = f"Lisbon {i}"
+        start = time.perf_counter()
+        for action in QUICK_ACTIONS:
+            prompt, context = build_quick_action(action, destination, "Moderate", interests, "")
+            handler.chat(prompt, context, action=action)
+        sequential.append(time.perf_counter() - start)
+
+        async def plan_everything(destination: str) -> None:
+            calls = []
+            for action in QUICK_ACTIONS:
+                prompt, context = build_quick_action(action, destination, "Moderate", interests, "")
+                calls.append(handler.achat(prompt, context, action=action))
+            await asyncio.gather(*calls)
+            await close_async_clients()
+
+        start = time.perf_counter()
+        asyncio.run(plan_everything(f"Porto {i}"))
+        concurrent.append(time.perf_counter() - start)
+    return {"scenario": "quick_actions", "sequential": summarize(sequential),
+            "plan_everything": summarize(concurrent)}
+
+
+def bench_ollama_router(config: FakeLLMConfig, hosts: int, requests: int, concurrency: int) -> Dict[str, Any]:
+    """Compare chat throughput against one single-slot Ollama host and a routed pool of them."""
+    from app.config import LLM_MODELS
+    from app.utils.clients import get_http_session
+    from app.utils.ollama_client import OllamaClient
+    from app.utils.ollama_router import OllamaRouter
+
+    single_slot = FakeLLMConfig(config.latency, config.tokens_per_second, config.response_tokens, parallel=1)
+    result = {"scenario": "ollama_router", "concurrency": concurrency}
+    for count in sorted({1, hosts}):
+        servers = [FakeLLMServer(single_slot).__enter__() for _ in range(count)]
+        try:
+            router = OllamaRouter([server.url for server in servers])
+            client = OllamaClient(LLM_MODELS["ollama"]["model"], servers[0].url, get_http_session(), router=router)
+
+            def call(i: int) -> float:
+                start = time.perf_counter()
+                client.invoke(f"Plan a day in Kyoto ({i})")
+                return time.perf_counter() - start
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                samples = list(pool.map(call, range(requests)))
+            elapsed = time.perf_counter() - start
+            result[f"{count}_hosts"] = {
+                "requests_per_second": round(requests / elapsed, 2),
+                "per_host_requests": [host["requests"] for host in router.stats()],
+                **summarize(samples),
+            }
+        finally:
+            for server in servers:
+                server.__exit__()
+    return result
+
+
+PROMPT_REUSE_MODES = {
+    # mode: (send keep_alive, continue from the returned context)
+    "before": (False, False),
+    "keep_alive": (True, False),
+    "keep_alive_and_context": (True, True),
+}
+
+
+def bench_prompt_reuse(config: FakeLLMConfig, turns: int, think_time: float) -> Dict[str, Any]:
+    """Hold one conversation per mode against a server that unloads idle models and charges prompt evaluation."""
+    from app.config import LLM_MODELS, OLLAMA_KEEP_ALIVE
+    from app.utils import LLMHandler
+    from app.utils.clients import get_http_session
+    from app.utils.ollama_client import OllamaClient
+    from app.utils.ollama_router import OllamaRouter
+
+    questions = [
+        "What are the best neighbourhoods to stay in?",
+        "Which of those is quietest at night?",
+        "What can I do there on a rainy day?",
+        "Where should I eat nearby?",
+        "Is it easy to get to the airport from there?",
+        "What day trips are worth it?",
+    ]
+    result = {"scenario": "prompt_reuse", "turns": turns, "think_time_s": think_time,
+              "server_keep_alive_s": config.keep_alive}
+    for mode, (keep_alive, reuse_context) in PROMPT_REUSE_MODES.items():
+        with FakeLLMServer(config) as server:
+            handler = LLMHandler(use_cache=False)
+            handler.model_config = LLM_MODELS["ollama"]
+            handler.current_model = "ollama"
+            handler.reuse_context = reuse_context
+            handler.assistant = OllamaClient(
+                LLM_MODELS["ollama"]["model"], server.url, get_http_session(), system=handler.travel_context,
+                router=OllamaRouter([server.url]), keep_alive=OLLAMA_KEEP_ALIVE if keep_alive else None
+            )
+            extra = {}
+            if keep_alive:
+                # What the app does in the background at startup; not counted against the conversation
+                start = time.perf_counter()
+                handler.assistant.warm_up()
+                extra["warmup_s"] = round(time.perf_counter() - start, 3)
+            baseline = server.stats()
+            samples = []
+            for turn in range(turns):
+                time.sleep(think_time)
+                start = time.perf_counter()
+                handler.chat(questions[turn % len(questions)], {"destination": "Lisbon"})
+                samples.append(time.perf_counter() - start)
+            stats = {key: round(value - baseline[key], 3) for key, value in server.stats().items()}
+            result[mode] = {**stats, **extra, **summarize(samples)}
+    return result
+
+
+def bench_reasoning_profiles(config: FakeLLMConfig, rounds: int) -> Dict[str, Any]:
+    """Stream every quick action from a reasoning model with a full trace and with its configured profile."""
+    from app.config import LLM_MODELS, QUICK_ACTIONS
+    from app.utils import LLMHandler
+    from app.utils.clients import get_http_session
+    from app.utils.ollama_client import OllamaClient
+    from app.utils.ollama_router import OllamaRouter
+
+    modes = {"full_trace": {"reasoning": "on", "max_tokens": None}, "profiles": None}
+    result = {"scenario": "reasoning_profiles", "trace_tokens": config.reasoning_tokens}
+    for mode, override in modes.items():
+        with FakeLLMServer(config) as server:
+            handler = LLMHandler(use_cache=False, use_memory=False)
+            handler.model_config = LLM_MODELS["ollama"]
+            handler.current_model = "ollama"
+            handler.assistant = OllamaClient(
+                LLM_MODELS["ollama"]["model"], server.url, get_http_session(), system=handler.travel_context,
+                router=OllamaRouter([server.url]), reasoning=True
+            )
+            mode_result = {}
+            for action in QUICK_ACTIONS:
+                first_answer, total = [], []
+                before = server.stats()["generated_tokens"]
+                for i in range(rounds):
+                    start = time.perf_counter()
+                    ttft = None
+                    for _ in handler.stream_chat(f"Recommend {action} in Paris ({i})", {"destination": "Paris"},
+                                                 action=action, generation=override):
+                        if ttft is None:
+                            ttft = time.perf_counter() - start
+                    total.append(time.perf_counter() - start)
+                    first_answer.append(ttft if ttft is not None else total[-1])
+                mode_result[action] = {
+                    "generated_tokens_per_call": round((server.stats()["generated_tokens"] - before) / rounds, 1),
+                    "first_answer_token": summarize(first_answer),
+                    "total": summarize(total),
+                }
+            result[mode] = mode_result
+    return result
+
+
+def bench_prefetch(backend: str, rounds: int, think_time: float) -> Dict[str, Any]:
+    """Click one quick action after reading for think_time, with and without speculative prefetch."""
+    from app.config import QUICK_ACTIONS
+    from app.utils import LLMHandler, Prefetcher, ResponseCache, build_quick_action
+
+    interests = ["Food & Dining"]
+    result = {"scenario": "prefetch", "think_time_s": think_time}
+    for mode in ("off", "on"):
+        # A fresh in-memory cache per mode, so the second mode cannot reuse the first one's answers
+        handler = LLMHandler(cache=ResponseCache(db_path=None), use_memory=False)
+        handler.initialize_model(backend, "sk-fake" if backend == "openai" else None)
+        prefetcher = Prefetcher(handler, delay=0.05)
+        clicks = []
+        for i in range(rounds):
+            destination = f"Seville {mode} {i}"
+            if mode == "on":
+                prefetcher.schedule(destination, "Moderate", interests, "")
+            time.sleep(think_time)
+            action = list(QUICK_ACTIONS)[i % len(QUICK_ACTIONS)]
+            if mode == "on":
+                prefetcher.record_click(action, destination, "Moderate", interests, "")
+            prompt, context = build_quick_action(action, destination, "Moderate", interests, "")
+            start = time.perf_counter()
+            for _ in handler.stream_chat(prompt, context, action=action):
+                pass
+            clicks.append(time.perf_counter() - start)
+        prefetcher.cancel()
+        stats = prefetcher.stats()
+        result[mode] = {"click": summarize(clicks), "hit_rate": stats["hit_rate"],
+                        "prefetched": stats["completed"]}
+    return result
+
+
+def bench_itinerary(config: FakeLLMConfig, days: int, day_tokens: int) -> Dict[str, Any]:
+    """Plan a days-long trip as one generation and as an outline plus days generated in parallel."""
+    from app.config import LLM_MODELS
+    from app.utils import ItineraryPlanner, LLMHandler
+    from app.utils.clients import get_http_session
+    from app.utils.ollama_client import OllamaClient
+    from app.utils.ollama_router import OllamaRouter
+
+    dates = f"2030-05-01 to 2030-05-{days:02d}"
+    result = {"scenario": "itinerary", "days": days}
+    with FakeLLMServer(config) as server:
+        handler = LLMHandler(use_cache=False, use_memory=False)
+        handler.model_config = LLM_MODELS["ollama"]
+        handler.current_model = "ollama"
+        handler.assistant = OllamaClient(
+            LLM_MODELS["ollama"]["model"], server.url, get_http_session(), system=handler.travel_context,
+            router=OllamaRouter([server.url])
+        )
+        planner = ItineraryPlanner(handler, outline_generation={"max_tokens": 12 * days, "reasoning": "off"},
+                                   day_generation={"max_tokens": day_tokens, "reasoning": "off"})
+        single = {"max_tokens": day_tokens * days, "reasoning": "off"}
+        runs = {
+            "single_generation": lambda: handler.stream_chat(
+                f"Plan a {days}-day itinerary for Kyoto", {"destination": "Kyoto", "dates": dates}, generation=single),
+            "fan_out": lambda: planner.stream("Kyoto", dates),
+        }
+        for mode, run in runs.items():
+            start = time.perf_counter()
+            first = None
+            for _ in run():
+                first = first or time.perf_counter() - start
+            result[mode] = {"total_ms": round((time.perf_counter() - start) * 1000, 2),
+                            "first_chunk_ms": round(first * 1000, 2)}
+    return result
+
+
+def find_regressions(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Compare p50 latencies with a baseline run and list those that got slower than tolerance."""
+    def p50s(run: Dict[str, Any]) -> Dict[str, float]:
+        values = {}
+        for result in run["results"]:
+            for key, value in result.items():
+                if key == "p50_ms":
+                    values[f"{result['backend']}/{result['scenario']}"] = value
+                elif isinstance(value, dict) and "p50_ms" in value:
+                    values[f"{result['backend']}/{result['scenario']}/{key}"] = value["p50_ms"]
+        return values
+
+    current, previous = p50s(results), p50s(baseline)
+    return [
+        f"{name}: {previous[name]} ms -> {value} ms"
+        for name, value in current.items()
+        if name in previous and value > previous[name] * (1 + tolerance)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", default="ollama,openai")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake server seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=500.0)
+    parser.add_argument("--response-tokens", type=int, default=50)
+    parser.add_argument("--ollama-hosts", type=int, default=3, help="pool size for the Ollama router scenario")
+    parser.add_argument("--turns", type=int, default=8, help="conversation turns in the prompt reuse scenario")
+    parser.add_argument("--prompt-eval-rate", type=float, default=1000.0,
+                        help="fake prompt tokens evaluated per second in the prompt reuse scenario")
+    parser.add_argument("--load-latency", type=float, default=0.5,
+                        help="fake seconds to load an unloaded model in the prompt reuse scenario")
+    parser.add_argument("--reasoning-tokens", type=int, default=1500,
+                        help="fake <think> trace length in the reasoning profiles scenario")
+    parser.add_argument("--think-time", type=float, default=0.5,
+                        help="seconds between entering a destination and clicking in the prefetch scenario")
+    parser.add_argument("--days", type=int, default=10, help="trip length in the itinerary scenario")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--baseline", help="earlier results file to compare p50 latencies against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown before failing")
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens
+    )
+    with FakeLLMServer(config) as server:
+        # app.config reads these at import time, so set them before importing app
+        os.environ["OLLAMA_HOST"] = server.url
+        os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+        os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="travel_ai_bench_")
+
+        results = []
+        for backend in args.backends.split(","):
+            for result in (
+                bench_chat(backend, args.requests),
+                bench_stream(backend, args.requests),
+                bench_throughput(backend, args.requests * 2, args.concurrency),
+                bench_quick_actions(backend, max(1, args.requests // 4)),
+                bench_prefetch(backend, max(1, args.requests // 4), args.think_time),
+            ):
+                results.append({"backend": backend, **result})
+        if "ollama" in args.backends.split(","):
+            results.append({"backend": "ollama", **bench_ollama_router(
+                config, args.ollama_hosts, args.requests, args.concurrency)})
+            # The server unloads idle models faster than the user thinks, as Ollama's 5m default
+            # does against a user who reads the answer for longer than that
+            reuse_config = FakeLLMConfig(
+                config.latency, config.tokens_per_second, config.response_tokens, parallel=1,
+                prompt_eval_rate=args.prompt_eval_rate, load_latency=args.load_latency, keep_alive=0.2
+            )
+            results.append({"backend": "ollama", **bench_prompt_reuse(reuse_config, args.turns, think_time=0.3)})
+            # A faster generator keeps this scenario short; the ratios are what matter
+            reasoning_config = FakeLLMConfig(
+                config.latency, config.tokens_per_second * 4, config.response_tokens, chunk_tokens=4,
+                reasoning_tokens=args.reasoning_tokens
+            )
+            results.append({"backend": "ollama", **bench_reasoning_profiles(
+                reasoning_config, max(1, args.requests // 4))})
+            # Long enough answers for the whole trip; each call is cut to its max_tokens
+            itinerary_config = FakeLLMConfig(config.latency, config.tokens_per_second, 150 * args.days)
+            results.append({"backend": "ollama", **bench_itinerary(itinerary_config, args.days, 150)})
+
+    output = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "fake_server": vars(config),
+        },
+        "results": results,
+    }
+    text = json.dumps(output, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(output, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions detected:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark the BM25 retrieval index as the corpus grows to millions of chunks.
+
+Generates answer-like chunks from a Zipf-distributed vocabulary, adds them
+to one BM25Index incrementally and, at each corpus size, reports the build
+rate, p50/p95/p99 query latency and process memory. Queries mix common and
+rare words, as questions about a destination do.
+
+Usage: python benchmarks/bench_retrieval.py [--sizes 10000,100000,1000000] [--queries 200]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from benchmarks.bench_llm_handler import summarize
+from app.config import RETRIEVAL_TOP_K
+from app.utils.retrieval import BM25Index, tokenize
+
+SYLLABLES = ["ba", "ce", "di", "fo", "gu", "ka", "le", "mi", "no", "pu", "ra", "se", "ti", "vo", "zu", "lan", "mer",
+             "tor", "vin", "sul"]
+
+
+def make_vocabulary(size: int, rng: np.random.Generator) -> List[str]:
+    """Return size distinct pseudo-words of two to four syllables."""
+    words = set()
+    while len(words) < size:
+        parts = rng.integers(0, len(SYLLABLES), size=rng.integers(2, 5))
+        words.add("".join(SYLLABLES[part] for part in parts))
+    return sorted(words)
+
+
+class Corpus:
+    """Draws chunks and queries from a vocabulary whose word frequencies follow Zipf's law."""
+
+    def __init__(self, vocabulary: List[str], chunk_words: int, seed: int):
+        self.words = np.array(vocabulary)
+        ranks = np.arange(1, len(vocabulary) + 1)
+        self.weights = 1.0 / ranks
+        self.weights /= self.weights.sum()
+        self.chunk_words = chunk_words
+        self.rng = np.random.default_rng(seed)
+
+    def chunks(self, count: int) -> List[str]:
+        drawn = self.rng.choice(len(self.words), size=(count, self.chunk_words), p=self.weights)
+        return [" ".join(row) for row in self.words[drawn]]
+
+    def queries(self, count: int, terms: int = 4) -> List[List[str]]:
+        """Return queries of one common word and terms-1 words from the long tail."""
+        common = self.rng.integers(0, 50, size=count)
+        rare = self.rng.integers(50, len(self.words), size=(count, terms - 1))
+        return [tokenize(" ".join([self.words[c], *self.words[r]])) for c, r in zip(common, rare)]
+
+
+def measure(index: BM25Index, queries: List[List[str]], k: int) -> Dict[str, Any]:
+    samples = []
+    hits = 0
+    for terms in queries:
+        start = time.perf_counter()
+        results = index.search(terms, k)
+        samples.append(time.perf_counter() - start)
+        hits += bool(results)
+    return {**summarize(samples), "queries_with_results": hits}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="corpus sizes (chunks) to measure at")
+    parser.add_argument("--queries", type=int, default=200, help="queries timed at each size")
+    parser.add_argument("--vocabulary", type=int, default=50000, help="distinct words in the corpus")
+    parser.add_argument("--chunk-words", type=int, default=40, help="words per chunk")
+    parser.add_argument("--batch", type=int, default=50000, help="chunks generated at a time (not timed)")
+    parser.add_argument("--top-k", type=int, default=RETRIEVAL_TOP_K)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    corpus = Corpus(make_vocabulary(args.vocabulary, np.random.default_rng(args.seed)), args.chunk_words, args.seed)
+    queries = corpus.queries(args.queries)
+    index = BM25Index()
+    build_s = 0.0
+    levels = []
+    for size in sorted(int(value) for value in args.sizes.split(",")):
+        # The index grows incrementally from the previous size, as it does while answers arrive
+        while len(index) < size:
+            batch = corpus.chunks(min(args.batch, size - len(index)))
+            start = time.perf_counter()
+            for chunk in batch:
+                index.add(chunk)
+            build_s += time.perf_counter() - start
+        levels.append({
+            "chunks": len(index),
+            "terms": len(index._postings),
+            "build_s": round(build_s, 2),
+            "build_chunks_per_s": round(len(index) / build_s),
+            "query": measure(index, queries, args.top_k),
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        })
+        print(f"{len(index)} chunks: built in {build_s:.1f} s, query p50 {levels[-1]['query']['p50_ms']} ms, "
+              f"p95 {levels[-1]['query']['p95_ms']} ms", file=sys.stderr)
+
+    output = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "vocabulary": args.vocabulary,
+            "chunk_words": args.chunk_words,
+            "top_k": args.top_k,
+        },
+        "levels": levels,
+    }
+    text = json.dumps(output, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark semantic cache lookups against a brute-force Python loop.
+
+Usage: python benchmarks/bench_semantic_cache.py [--entries 100000] [--queries 200]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import numpy as np
+
+from app.utils.semantic_cache import SemanticCache
+
+WORDS = (
+    "museum food restaurant street market beach hotel cheap luxury night club park "
+    "temple castle river boat tour walk vegan breakfast dinner rooftop view family "
+    "kids hiking train airport shopping festival wine coffee bakery history art"
+).split()
+
+
+def random_query(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 8)))
+
+
+def percentile(samples, pct):
+    return float(np.percentile(np.array(samples) * 1000, pct))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--loop-queries", type=int, default=5,
+                        help="queries for the brute-force Python loop baseline")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    cache = SemanticCache(max_entries=args.entries, max_partition_entries=args.entries)
+    partition = SemanticCache.partition_key(("ollama", "deepseek-r1"), {"destination": "Paris"})
+
+    start = time.perf_counter()
+    for i in range(args.entries):
+        cache.set(partition, random_query(rng), f"answer {i}")
+    build_seconds = time.perf_counter() - start
+
+    queries = [random_query(rng) for _ in range(args.queries)]
+    vectorized = []
+    for query in queries:
+        start = time.perf_counter()
+        cache.get(partition, query)
+        vectorized.append(time.perf_counter() - start)
+
+    # Baseline: the same cosine similarity computed one cached entry at a time
+    entries = cache._partitions[partition]
+    rows = [entries.vectors[i].tolist() for i in range(entries.used)]
+    loop = []
+    for query in queries[:args.loop_queries]:
+        start = time.perf_counter()
+        vector = cache.vectorizer.transform(query).tolist()
+        best = -1.0
+        for row in rows:
+            score = sum(a * b for a, b in zip(row, vector))
+            if score > best:
+                best = score
+        loop.append(time.perf_counter() - start)
+
+    results = {
+        "benchmark": "semantic_cache_lookup",
+        "entries": args.entries,
+        "dim": cache.vectorizer.dim,
+        "insert_seconds": round(build_seconds, 3),
+        "vectorized_ms": {"p50": percentile(vectorized, 50), "p95": percentile(vectorized, 95),
+                          "p99": percentile(vectorized, 99)},
+        "python_loop_ms": {"p50": percentile(loop, 50)},
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark restoring a persisted session as it grows.
+
+Writes sessions of increasing length (one preferences change and one chat
+exchange per turn, as the web interface logs them) and times a restore:
+loading the session state and reopening the chat history's latest window.
+It compares SESSION_COMPACT_EVERY with a log that is never compacted, and
+checks that the restored state matches what was written.
+
+Usage: python benchmarks/bench_session_restore.py [--turns 10,100,1000] [--repeats 20]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from benchmarks.bench_llm_handler import summarize
+from app.config import SESSION_COMPACT_EVERY
+from app.utils.history import ChatHistory, HistoryArchive
+from app.utils.memory import ConversationMemory
+from app.utils.sessions import SessionJournal, SessionStore, new_session_token
+
+ANSWER = ("Start the morning at the old town market, then walk along the river to the cathedral. "
+          "Lunch at a family-run tavern near the square is a local favourite. ") * 6
+
+
+def write_session(store: SessionStore, archive: HistoryArchive, turns: int) -> Dict[str, Any]:
+    """Log a session of turns exchanges and return the memory and message count it should restore to."""
+    token = new_session_token()
+    journal = SessionJournal(token, store=store)
+    history = ChatHistory(token, archive, durable=True)
+    memory = ConversationMemory()
+    journal.record("model", "ollama")
+    for turn in range(turns):
+        journal.record("preferences", {"destination": "Lisbon", "budget": "Moderate", "interests": [str(turn % 4)]})
+        prompt, response = f"Question {turn} about Lisbon?", f"{turn}: {ANSWER}"
+        history.append({"role": "user", "content": prompt})
+        history.append({"role": "assistant", "content": response})
+        memory.add_turn("user", prompt)
+        memory.add_turn("assistant", response)
+        journal.record_exchange(prompt, response)
+    return {"token": token, "memory": memory.snapshot(), "messages": len(history)}
+
+
+def restore_ms(store: SessionStore, archive: HistoryArchive, session: Dict[str, Any], repeats: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        state = store.load(session["token"])
+        history = ChatHistory.restore(session["token"], archive)
+        samples.append(time.perf_counter() - start)
+    if state["memory"] != session["memory"] or len(history) != session["messages"]:
+        raise SystemExit(f"Session {session['token']} restored differently from what was written")
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", default="10,100,1000", help="chat exchanges in the session")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="travel_ai_sessions_")
+    archive = HistoryArchive(os.path.join(directory, "history.sqlite3"))
+    stores = {
+        "compacted": SessionStore(os.path.join(directory, "compacted.sqlite3")),
+        "log_only": SessionStore(os.path.join(directory, "log_only.sqlite3"), compact_every=10 ** 9),
+    }
+    results = []
+    for turns in (int(value) for value in args.turns.split(",")):
+        result: Dict[str, Any] = {"turns": turns}
+        for name, store in stores.items():
+            start = time.perf_counter()
+            session = write_session(store, archive, turns)
+            write_s = time.perf_counter() - start
+            result[name] = {
+                "restore": restore_ms(store, archive, session, args.repeats),
+                "write_ms_per_turn": round(write_s / turns * 1000, 3),
+            }
+        results.append(result)
+    print(json.dumps({"compact_every": SESSION_COMPACT_EVERY, "results": results,
+                      "stores": {name: store.stats() for name, store in stores.items()}}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
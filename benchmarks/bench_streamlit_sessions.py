@@ -0,0 +1,255 @@
+"""
+Load-test the Streamlit app with many concurrent headless sessions.
+
+Each simulated user is a streamlit.testing AppTest of app/main.py running
+in its own thread, like a browser tab served by one `streamlit run`
+process. Users pick a destination and interests, then click quick actions
+and send free-text questions with think time in between, against the
+local fake LLM server. For every session count the harness reports
+throughput, p50/p95/p99 interaction latency, errors and memory per
+session, and marks the first level at which the app stops scaling.
+
+AppTest installs a mock of Streamlit's Runtime singleton, patches the
+global config and compiles the script afresh for each run, so overlapping
+runs would undo each other's runtime and config and compile concurrently.
+The harness installs one shared runtime, config and script cache instead,
+as one server process has.
+
+Usage: python benchmarks/bench_streamlit_sessions.py [--sessions 1,2,4,8,16] [--interactions 6]
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from benchmarks.bench_llm_handler import summarize
+from benchmarks.fake_llm_server import FakeLLMConfig, FakeLLMServer
+
+APP_PATH = os.path.join(project_root, "app", "main.py")
+DESTINATIONS = ["Lisbon", "Kyoto", "Cape Town", "Montreal", "Hanoi", "Seville", "Reykjavik", "Oaxaca",
+                "Tbilisi", "Hobart", "Valparaiso", "Ljubljana"]
+QUESTIONS = [
+    "What is the best way to get around {destination}?",
+    "Which neighbourhood should I stay in, in {destination}?",
+    "What should I pack for {destination}?",
+    "Is {destination} safe to walk at night?",
+    "What local dishes should I try in {destination}?",
+    "How many days do I need in {destination}?",
+]
+# Weights of the interactions a user performs after choosing a destination
+MIX = {"hotels": 3, "activities": 2, "restaurants": 2, "send": 4}
+BUTTONS = {"hotels": "Find Hotels", "activities": "Activities", "restaurants": "Restaurants", "send": "Send"}
+# Patches that stay in place until the process exits
+_process_patches = contextlib.ExitStack()
+
+
+def install_shared_runtime() -> None:
+    """Serve every concurrent AppTest run from one Runtime, as a single `streamlit run` process does."""
+    from unittest.mock import MagicMock
+
+    from streamlit.runtime import Runtime
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    shared = MagicMock(spec=Runtime)
+    shared.media_file_mgr = app_test.MediaFileManager(app_test.MemoryMediaFileStorage("/mock/media"))
+    shared.dataframe_source_mgr = app_test.DataframeSourceManager()
+    shared.cache_storage_manager = app_test.MemoryCacheStorageManager()
+    shared.bidi_component_registry = app_test.BidiComponentManager()
+    Runtime._instance = shared
+
+    class RuntimeSlot:
+        # AppTest sets and clears its per-run runtime here, leaving the shared one in place
+        _instance = None
+
+    app_test.Runtime = RuntimeSlot
+    # The script is compiled once, under the cache's lock
+    script_cache = app_test.ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+    # Applied once for the whole process; a run restoring it on exit would switch it off for the others
+    _process_patches.enter_context(app_test.patch_config_options({"global.appTest": True}))
+    app_test.patch_config_options = lambda overrides: contextlib.nullcontext()
+
+
+def click(at, label: str) -> None:
+    next(button for button in at.button if label in button.label).click()
+
+
+class Session:
+    """One simulated user driving the app through AppTest."""
+
+    def __init__(self, level: int, number: int, destinations: int, timeout: float, rng: random.Random):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.rng = rng
+        # A bounded destination pool per level, so sessions share some answers as real users do
+        self.destination = f"{rng.choice(DESTINATIONS[:destinations])} L{level}"
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors = 0
+
+    def _timed(self, kind: str) -> None:
+        start = time.perf_counter()
+        self.at.run()
+        self.latencies.setdefault(kind, []).append(time.perf_counter() - start)
+        if self.at.exception or self.at.error:
+            self.errors += 1
+
+    def start(self) -> None:
+        self._timed("load")
+        self.at.sidebar.text_input[0].set_value(self.destination)
+        self.at.sidebar.multiselect[0].set_value(self.rng.sample(["Food & Dining", "Culture & History",
+                                                                  "Nightlife", "Nature & Outdoors"], 2))
+        self._timed("preferences")
+
+    def interact(self) -> None:
+        kind = self.rng.choices(list(MIX), weights=list(MIX.values()))[0]
+        if kind == "send":
+            question = self.rng.choice(QUESTIONS).format(destination=self.destination)
+            next(field for field in self.at.text_input if field.label.startswith("Ask anything")).set_value(question)
+        click(self.at, BUTTONS[kind])
+        self._timed(kind)
+
+
+def run_level(level: int, sessions: int, interactions: int, think_time: float, destinations: int,
+              timeout: float, seed: int) -> Dict[str, Any]:
+    """Run sessions concurrent users for interactions each and summarize the level."""
+    started: List[float] = []
+    # Everyone starts interacting together, so the level measures concurrent load
+    barrier = threading.Barrier(sessions, action=lambda: started.append(time.perf_counter()))
+
+    def user(number: int) -> Session:
+        rng = random.Random(seed * 1000 + level * 100 + number)
+        try:
+            session = Session(level, number, destinations, timeout, rng)
+            session.start()
+            barrier.wait()
+        except BaseException:
+            # Release the other sessions instead of leaving them waiting for this one
+            barrier.abort()
+            raise
+        for _ in range(interactions):
+            time.sleep(rng.expovariate(1 / think_time) if think_time else 0)
+            session.interact()
+        return session
+
+    traced_before = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+    with ThreadPoolExecutor(max_workers=sessions, thread_name_prefix="session") as pool:
+        futures = [pool.submit(user, number) for number in range(sessions)]
+    failures = [future.exception() for future in futures if future.exception() is not None]
+    # The sessions released by barrier.abort() only say that another one failed
+    for failure in sorted(failures, key=lambda e: isinstance(e, threading.BrokenBarrierError)):
+        raise failure
+    finished = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started[0]
+    # Measured while every session of the level is still alive
+    traced_after = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+    by_kind: Dict[str, List[float]] = {}
+    for session in finished:
+        for kind, samples in session.latencies.items():
+            by_kind.setdefault(kind, []).extend(samples)
+    actions = [sample for kind, samples in by_kind.items() if kind in MIX for sample in samples]
+    result = {
+        "sessions": sessions,
+        "interactions": len(actions),
+        "errors": sum(session.errors for session in finished),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_per_s": round(len(actions) / elapsed, 2),
+        "latency": summarize(actions),
+        "by_interaction": {kind: summarize(samples) for kind, samples in sorted(by_kind.items())},
+        "memory_per_session_kb": round((traced_after - traced_before) / sessions / 1024, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    return result
+
+
+def find_knee(levels: List[Dict[str, Any]], min_gain: float, max_slowdown: float) -> Optional[int]:
+    """Return the first session count whose throughput stops growing or whose p95 blows up."""
+    base_p95 = levels[0]["latency"]["p95_ms"]
+    for previous, level in zip(levels, levels[1:]):
+        gain = level["throughput_per_s"] / previous["throughput_per_s"] if previous["throughput_per_s"] else 0
+        ideal = level["sessions"] / previous["sessions"]
+        if gain < 1 + (ideal - 1) * min_gain or level["latency"]["p95_ms"] > base_p95 * max_slowdown:
+            return level["sessions"]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", default="1,2,4,8,16", help="concurrent session counts to test")
+    parser.add_argument("--interactions", type=int, default=6, help="clicks and questions per session")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean seconds between a user's interactions")
+    parser.add_argument("--destinations", type=int, default=6,
+                        help="destinations the users of a level choose from (fewer means more shared answers)")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake server seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--response-tokens", type=int, default=120)
+    parser.add_argument("--parallel", type=int, default=4, help="fake server concurrent generations (0 = unlimited)")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds one script run may take")
+    parser.add_argument("--min-gain", type=float, default=0.5,
+                        help="share of the ideal throughput gain a level must reach to count as scaling")
+    parser.add_argument("--max-slowdown", type=float, default=3.0,
+                        help="p95 latency, relative to one session, beyond which the app counts as saturated")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        parallel=args.parallel
+    )
+    with FakeLLMServer(config) as server:
+        # app.config reads these at import time, so set them before the first session imports app
+        os.environ["OLLAMA_HOST"] = server.url
+        os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="travel_ai_load_")
+        os.environ["OLLAMA_WARMUP"] = "0"
+        install_shared_runtime()
+        # One unmeasured session imports the app, so the first level does not pay for it
+        run_level(-1, 1, 1, 0, args.destinations, args.timeout, args.seed)
+        tracemalloc.start()
+        levels = []
+        for level, sessions in enumerate(int(value) for value in args.sessions.split(",")):
+            levels.append(run_level(level, sessions, args.interactions, args.think_time, args.destinations,
+                                    args.timeout, args.seed))
+            print(f"{sessions} sessions: {levels[-1]['throughput_per_s']}/s, "
+                  f"p95 {levels[-1]['latency']['p95_ms']} ms", file=sys.stderr)
+        tracemalloc.stop()
+
+    from app.config import BACKEND_CONCURRENCY
+
+    output = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "fake_server": vars(config),
+            "backend_concurrency": BACKEND_CONCURRENCY,
+            "think_time_s": args.think_time,
+        },
+        "levels": levels,
+        "stops_scaling_at": find_knee(levels, args.min_gain, args.max_slowdown),
+    }
+    text = json.dumps(output, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
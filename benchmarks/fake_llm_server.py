@@ -0,0 +1,387 @@
+"""
+Local stand-in for the Ollama and OpenAI HTTP APIs used in benchmarks.
+
+Implements Ollama's /api/version, /api/ps and /api/generate and OpenAI's
+/v1/chat/completions (streaming and non-streaming) with configurable
+latency, generation speed and response length, so LLMHandler can be
+measured without a live model.
+
+Optionally it also models the costs Ollama's keep_alive and context
+exist to avoid: loading the model after it was unloaded, and evaluating
+prompt tokens, except for the longest prefix already in one of its
+prompt caches. Generate responses carry a context that can be sent back
+to continue the conversation, as with Ollama. Ollama answers can start
+with a deepseek-r1 style <think> trace, which think=false turns off and
+num_predict cuts short.
+
+Run standalone with `python benchmarks/fake_llm_server.py --port 11434`.
+"""
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set
+
+WORDS = (
+    "Paris offers charming boutique hotels near the Louvre with rooms from $120 per night. "
+    "Try the local bistros in Le Marais for classic French dishes and fresh pastries. "
+).split()
+REASONING = (
+    "Okay, the user wants recommendations. Let me think about the budget, the neighbourhoods "
+    "and what they said they like, then check whether that fits. "
+).split()
+
+
+class FakeLLMConfig:
+    def __init__(
+        self,
+        latency: float = 0.05,
+        tokens_per_second: float = 200.0,
+        response_tokens: int = 100,
+        chunk_tokens: int = 1,
+        stream: bool = True,
+        parallel: int = 0,
+        prompt_eval_rate: float = 0.0,
+        load_latency: float = 0.0,
+        keep_alive: float = 300.0,
+        reasoning_tokens: int = 0
+    ):
+        self.latency = latency  # seconds before the first token
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.chunk_tokens = chunk_tokens  # tokens per streamed chunk
+        self.stream = stream  # honour stream=true requests; otherwise always answer in one body
+        self.parallel = parallel  # generations run at once, like OLLAMA_NUM_PARALLEL (0 = unlimited)
+        self.prompt_eval_rate = prompt_eval_rate  # prompt tokens evaluated per second (0 = free)
+        self.load_latency = load_latency  # seconds to load a model that is not in memory
+        self.keep_alive = keep_alive  # seconds a model stays loaded when a request sets no keep_alive
+        self.reasoning_tokens = reasoning_tokens  # <think> trace before each Ollama answer, unless think=false
+
+
+_DURATION = re.compile(r"^(-?\d+(?:\.\d+)?)(ms|s|m|h)?$")
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, None: 1}
+
+
+def parse_keep_alive(value: Any, default: float) -> float:
+    """Convert an Ollama keep_alive ("30m", "10s", 300, -1) to seconds; negative means forever."""
+    if value is None:
+        return default
+    match = _DURATION.match(str(value).strip())
+    if not match:
+        return default
+    seconds = float(match.group(1)) * _UNITS[match.group(2)]
+    return float("inf") if seconds < 0 else seconds
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeLLMServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunked(self, content_type: str, chunks: Iterator[bytes]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(f"{len(chunk):X}\r\n".encode("ascii") + chunk + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self) -> None:
+        self.server.record_request(self.path)
+        if self.path == "/api/version":
+            self._send_json(200, {"version": "0.0.0-fake"})
+        elif self.path == "/api/ps":
+            self._send_json(200, {"models": [{"name": name} for name in sorted(self.server.loaded_models)]})
+        elif self.path in ("/v1/models", "/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "gpt-3.5-turbo", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        self.server.record_request(self.path)
+        body = self._read_json()
+        if self.path == "/api/generate":
+            self._ollama_generate(body)
+        elif self.path in ("/v1/chat/completions", "/chat/completions"):
+            self._openai_chat(body)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _tokens(self, prefill: float = 0.0, reasoning: int = 0, limit: Optional[int] = None) -> Iterator[str]:
+        config = self.server.config
+        slots = self.server.generation_slots
+        if slots is not None:
+            slots.acquire()
+        try:
+            time.sleep(config.latency + prefill)
+            delay = 1.0 / config.tokens_per_second if config.tokens_per_second else 0.0
+            tokens = [WORDS[i % len(WORDS)] + " " for i in range(config.response_tokens)]
+            if reasoning:
+                thoughts = [REASONING[i % len(REASONING)] + " " for i in range(reasoning)]
+                tokens = ["<think>\n"] + thoughts + ["\n</think>\n\n"] + tokens
+            if limit is not None and limit >= 0:
+                # num_predict stops generation, trace included
+                tokens = tokens[:limit]
+            batch = []
+            for token in tokens:
+                batch.append(token)
+                if len(batch) >= config.chunk_tokens:
+                    time.sleep(delay * len(batch))
+                    # Counted as sent, so a client closing the stream early stops the count
+                    self.server.record_generated(len(batch))
+                    yield "".join(batch)
+                    batch = []
+            if batch:
+                time.sleep(delay * len(batch))
+                self.server.record_generated(len(batch))
+                yield "".join(batch)
+        finally:
+            if slots is not None:
+                slots.release()
+
+    def _ollama_generate(self, body: Dict[str, Any]) -> None:
+        config = self.server.config
+        model = body.get("model", "")
+        started = time.perf_counter()
+        load_duration = self.server.load(model, body.get("keep_alive"))
+        if not body.get("prompt") and not body.get("context"):
+            # An empty prompt only loads the model, as with Ollama
+            self._send_json(200, {"model": model, "response": "", "done": True, "done_reason": "load",
+                                  "load_duration": int(load_duration * 1e9)})
+            return
+        server = self.server
+        reasoning = 0 if body.get("think") is False else config.reasoning_tokens
+        limit = (body.get("options") or {}).get("num_predict")
+        prompt_tokens = server.prompt_tokens(body)
+        evaluated = server.evaluate(prompt_tokens)
+        prefill = evaluated / config.prompt_eval_rate if config.prompt_eval_rate else 0.0
+        server.record_prompt_eval(evaluated, prefill)
+        stats = {
+            "load_duration": int(load_duration * 1e9),
+            "prompt_eval_count": evaluated,
+            "prompt_eval_duration": int(prefill * 1e9),
+            "eval_count": config.response_tokens,
+        }
+
+        def finish(text: str) -> Dict[str, Any]:
+            context = prompt_tokens + server.tokenize(text)
+            server.remember(context)
+            return {"model": model, "done": True, "total_duration": int((time.perf_counter() - started) * 1e9),
+                    "context": context, **stats}
+
+        if body.get("stream", True) and config.stream:
+            def chunks() -> Iterator[bytes]:
+                received = []
+                for text in self._tokens(prefill, reasoning, limit):
+                    received.append(text)
+                    yield json.dumps({"model": model, "response": text, "done": False}).encode() + b"\n"
+                yield json.dumps({"response": "", **finish("".join(received))}).encode() + b"\n"
+            self._send_chunked("application/x-ndjson", chunks())
+        else:
+            text = "".join(self._tokens(prefill, reasoning, limit))
+            self._send_json(200, {"response": text, **finish(text)})
+
+    def _openai_chat(self, body: Dict[str, Any]) -> None:
+        model = body.get("model", "gpt-3.5-turbo")
+        created = int(time.time())
+        if body.get("stream") and self.server.config.stream:
+            def chunks() -> Iterator[bytes]:
+                for text in self._tokens():
+                    event = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created,
+                             "model": model, "choices": [{"index": 0, "delta": {"content": text},
+                                                          "finish_reason": None}]}
+                    yield f"data: {json.dumps(event)}\n\n".encode()
+                final = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created,
+                         "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                yield f"data: {json.dumps(final)}\n\n".encode()
+                yield b"data: [DONE]\n\n"
+            self._send_chunked("text/event-stream", chunks())
+        else:
+            text = "".join(self._tokens())
+            self._send_json(200, {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": self.server.config.response_tokens,
+                          "total_tokens": self.server.config.response_tokens},
+            })
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """Threaded fake LLM server; use as a context manager to run it in the background."""
+
+    daemon_threads = True
+
+    def __init__(self, config: Optional[FakeLLMConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.config = config or FakeLLMConfig()
+        self.request_counts: Dict[str, int] = {}
+        self.generation_slots = threading.Semaphore(self.config.parallel) if self.config.parallel else None
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.prompt_eval_tokens = 0
+        self.prompt_eval_seconds = 0.0
+        self.generated_tokens = 0
+        self._loaded_until: Dict[str, float] = {}
+        self._load_lock = threading.Lock()
+        # Token sequences held in the prompt caches, one per generation slot
+        self._prompt_caches: Deque[List[int]] = deque(maxlen=max(1, self.config.parallel or 4))
+        self._vocabulary: Dict[str, int] = {}
+        self._counts_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def loaded_models(self) -> Set[str]:
+        now = time.monotonic()
+        with self._load_lock:
+            return {model for model, until in self._loaded_until.items() if until > now}
+
+    def load(self, model: str, keep_alive: Any = None) -> float:
+        """Load model unless it is still in memory; returns the seconds spent loading."""
+        with self._load_lock:
+            elapsed = 0.0
+            if self._loaded_until.get(model, 0.0) <= time.monotonic():
+                if self.config.load_latency:
+                    time.sleep(self.config.load_latency)
+                    elapsed = self.config.load_latency
+                # Unloading frees the prompt caches too
+                self._prompt_caches.clear()
+                self.loads += 1
+                self.load_seconds += elapsed
+            self._loaded_until[model] = time.monotonic() + parse_keep_alive(keep_alive, self.config.keep_alive)
+            return elapsed
+
+    def tokenize(self, text: str) -> List[int]:
+        """Split text into four-character tokens with stable ids."""
+        with self._counts_lock:
+            return [self._vocabulary.setdefault(text[i:i + 4], len(self._vocabulary))
+                    for i in range(0, len(text), 4)]
+
+    def prompt_tokens(self, body: Dict[str, Any]) -> List[int]:
+        """Tokens of a generate request as a chat template would lay them out."""
+        turn = self.tokenize(f"<|User|>{body.get('prompt', '')}<|Assistant|>")
+        if body.get("context"):
+            return list(body["context"]) + turn
+        return self.tokenize(body.get("system") or "") + turn
+
+    def evaluate(self, tokens: List[int]) -> int:
+        """Return how many tokens must be evaluated after the longest cached prefix."""
+        best = 0
+        with self._counts_lock:
+            for cached in self._prompt_caches:
+                common = 0
+                for a, b in zip(cached, tokens):
+                    if a != b:
+                        break
+                    common += 1
+                best = max(best, common)
+        # Ollama always evaluates at least the last token
+        return max(1, len(tokens) - best)
+
+    def remember(self, tokens: List[int]) -> None:
+        with self._counts_lock:
+            self._prompt_caches.append(tokens)
+
+    def record_generated(self, tokens: int) -> None:
+        with self._counts_lock:
+            self.generated_tokens += tokens
+
+    def record_prompt_eval(self, tokens: int, seconds: float) -> None:
+        with self._counts_lock:
+            self.prompt_eval_tokens += tokens
+            self.prompt_eval_seconds += seconds
+
+    def stats(self) -> Dict[str, float]:
+        """Return model loads, prompt evaluation and generated token totals so far."""
+        with self._counts_lock:
+            return {
+                "loads": self.loads,
+                "load_seconds": round(self.load_seconds, 3),
+                "prompt_eval_tokens": self.prompt_eval_tokens,
+                "prompt_eval_seconds": round(self.prompt_eval_seconds, 3),
+                "generated_tokens": self.generated_tokens,
+            }
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # Clients close streams early on purpose (e.g. to cut a reasoning trace short)
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    def record_request(self, path: str) -> None:
+        with self._counts_lock:
+            self.request_counts[path] = self.request_counts.get(path, 0) + 1
+
+    def __enter__(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Ollama/OpenAI server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--response-tokens", type=int, default=100)
+    parser.add_argument("--chunk-tokens", type=int, default=1)
+    parser.add_argument("--no-stream", action="store_true")
+    parser.add_argument("--parallel", type=int, default=0, help="concurrent generations (0 = unlimited)")
+    parser.add_argument("--prompt-eval-rate", type=float, default=0.0, help="prompt tokens per second (0 = free)")
+    parser.add_argument("--load-latency", type=float, default=0.0, help="seconds to load an unloaded model")
+    parser.add_argument("--keep-alive", type=float, default=300.0, help="default seconds a model stays loaded")
+    parser.add_argument("--reasoning-tokens", type=int, default=0, help="<think> trace length for Ollama answers")
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        chunk_tokens=args.chunk_tokens,
+        stream=not args.no_stream,
+        parallel=args.parallel,
+        prompt_eval_rate=args.prompt_eval_rate,
+        load_latency=args.load_latency,
+        keep_alive=args.keep_alive,
+        reasoning_tokens=args.reasoning_tokens
+    )
+    server = FakeLLMServer(config, args.host, args.port)
+    print(f"Fake LLM server listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
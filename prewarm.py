@@ -0,0 +1,237 @@
+"""
+Pre-warm the response cache for popular destinations.
+
+Reads a destination list (one per line, # starts a comment), expands it
+over QUICK_ACTIONS, BUDGET_OPTIONS and interests, and generates every
+answer through LLMHandler with bounded parallelism and an optional rate
+limit, so the first visitor of the day is answered from the cache.
+Answers that are already cached are skipped, so running the same command
+again after a crash or Ctrl+C resumes where the last run stopped.
+
+Usage: python prewarm.py destinations.txt [--model ollama] [--concurrency 2] [--rate 0.5]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import date
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Add the project root directory to Python path
+project_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, project_root)
+
+from app.config import (
+    BUDGET_OPTIONS, INTERESTS, LLM_MODELS, PREWARM_CACHE_DURATION, PREWARM_CONCURRENCY, PREWARM_RATE,
+    QUICK_ACTIONS
+)
+from app.utils import LLMHandler, build_quick_action
+from app.utils.memory import estimate_tokens
+
+
+def read_destinations(path):
+    """Return the destinations listed in path, without duplicates, in file order"""
+    destinations = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            name = " ".join(line.split('#')[0].split())
+            if name:
+                destinations.setdefault(name.casefold(), name)
+    return list(destinations.values())
+
+
+def interest_sets(mode):
+    """Return the interest selections to warm: none, or none plus each interest on its own"""
+    if mode == 'none':
+        return [[]]
+    return [[]] + [[interest] for interest in INTERESTS]
+
+
+def expand_jobs(destinations, actions, budgets, interests, dates, structured=False):
+    """Expand destinations into one job per quick-action request the web interface would send"""
+    jobs = []
+    for destination in destinations:
+        for action in actions:
+            if structured:
+                # Structured records cover every budget and interest in one call
+                jobs.append({'destination': destination, 'action': action})
+                continue
+            for budget in budgets:
+                for selected in interests:
+                    # The web interface only offers activities once interests are selected
+                    if action == 'activities' and not selected:
+                        continue
+                    jobs.append({'destination': destination, 'action': action, 'budget': budget,
+                                 'interests': selected, 'dates': dates})
+    return jobs
+
+
+class RateLimiter:
+    """Spaces call starts at least 1/rate seconds apart across all worker threads"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self, stop):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        stop.wait(start - now)
+
+
+class Progress:
+    """Counts finished jobs and reports throughput"""
+
+    def __init__(self, total):
+        self.total = total
+        self.counts = {'generated': 0, 'skipped': 0, 'failed': 0}
+        self.tokens = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, outcome, tokens=0):
+        with self._lock:
+            self.counts[outcome] += 1
+            self.tokens += tokens
+
+    def summary(self):
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            done = sum(self.counts.values())
+            generated = self.counts['generated']
+            remaining = self.total - done
+            return {
+                'total': self.total,
+                **self.counts,
+                'elapsed_s': round(elapsed, 1),
+                'generated_per_min': round(generated / elapsed * 60, 2) if elapsed else 0.0,
+                'tokens_per_s': round(self.tokens / elapsed, 1) if elapsed else 0.0,
+                'eta_s': round(elapsed / generated * remaining) if generated and remaining else None,
+            }
+
+    def report(self):
+        s = self.summary()
+        done = s['generated'] + s['skipped'] + s['failed']
+        eta = f", ETA {s['eta_s'] / 60:.0f} min" if s['eta_s'] is not None else ""
+        logger.info(
+            f"📈 {done}/{s['total']} done ({s['generated']} generated, {s['skipped']} already cached, "
+            f"{s['failed']} failed) - {s['generated_per_min']} answers/min, {s['tokens_per_s']} tokens/s{eta}"
+        )
+
+
+def is_cached(handler, job):
+    """Return True if the web interface would answer this job from the cache"""
+    if 'budget' not in job:
+        from app.utils.structured import get_structured_store
+
+        model = (handler.current_model, handler._model_name())
+        return get_structured_store().get(model, job['action'], job['destination']) is not None
+    prompt, context = build_quick_action(job['action'], job['destination'], job['budget'], job['interests'],
+                                         job['dates'])
+    return handler._cached(handler._prepare(prompt, context, job['action'])[1]) is not None
+
+
+def run_job(handler, job, limiter, progress, stop):
+    """Generate one job's answer into the cache unless it is already there"""
+    if stop.is_set():
+        return
+    try:
+        if is_cached(handler, job):
+            progress.record('skipped')
+            return
+        limiter.wait(stop)
+        if stop.is_set():
+            return
+        if 'budget' not in job:
+            records, _ = handler.structured_results(job['action'], job['destination'], priority="prefetch")
+            tokens = sum(estimate_tokens(record.model_dump_json()) for record in records)
+        else:
+            prompt, context = build_quick_action(job['action'], job['destination'], job['budget'],
+                                                 job['interests'], job['dates'])
+            text = handler.chat(prompt, context, action=job['action'], priority="prefetch", remember=False)
+            tokens = estimate_tokens(text)
+        progress.record('generated', tokens)
+    except Exception as e:
+        progress.record('failed')
+        logger.warning(f"⚠️ {job['action']} for {job['destination']} failed: {str(e)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("destinations", help="text file with one destination per line")
+    parser.add_argument("--model", choices=list(LLM_MODELS), default="ollama")
+    parser.add_argument("--actions", default=",".join(QUICK_ACTIONS), help="comma-separated quick actions")
+    parser.add_argument("--budgets", choices=["all", "unspecified"], default="all",
+                        help="every BUDGET_OPTIONS entry, or only \"Not specified\"")
+    parser.add_argument("--interests", choices=["each", "none"], default="each",
+                        help="no interests plus each interest on its own, or no interests only")
+    parser.add_argument("--date", default=date.today().isoformat(),
+                        help="travel date the web interface defaults to on the day being warmed (YYYY-MM-DD)")
+    parser.add_argument("--structured", action="store_true",
+                        help="warm the structured results (one call per destination and action) instead")
+    parser.add_argument("--concurrency", type=int, default=PREWARM_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=PREWARM_RATE, help="calls started per second (0 = no limit)")
+    parser.add_argument("--ttl", type=float, default=PREWARM_CACHE_DURATION, help="seconds answers stay cached")
+    parser.add_argument("--limit", type=int, help="stop after this many jobs")
+    parser.add_argument("--report-every", type=float, default=30, help="seconds between progress reports")
+    parser.add_argument("--dry-run", action="store_true", help="only print how many jobs would run")
+    parser.add_argument("--output", help="write the final throughput summary to this JSON file")
+    args = parser.parse_args()
+
+    actions = [action.strip() for action in args.actions.split(",") if action.strip()]
+    unknown = [action for action in actions if action not in QUICK_ACTIONS]
+    if unknown:
+        parser.error(f"unknown quick actions: {', '.join(unknown)}")
+    budgets = BUDGET_OPTIONS if args.budgets == "all" else ["Not specified"]
+    # The web interface's date inputs default to today, giving a one-day range
+    dates = f"{args.date} to {args.date}"
+    destinations = read_destinations(args.destinations)
+    jobs = expand_jobs(destinations, actions, budgets, interest_sets(args.interests), dates, args.structured)
+    if args.limit is not None:
+        jobs = jobs[:args.limit]
+    logger.info(f"🗺️ {len(destinations)} destinations expand to {len(jobs)} jobs")
+    if args.dry_run:
+        return
+
+    handler = LLMHandler(use_memory=False, cache_ttl=args.ttl)
+    handler.initialize_model(args.model, os.getenv("OPENAI_API_KEY"))
+    limiter = RateLimiter(args.rate)
+    progress = Progress(len(jobs))
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max(1, args.concurrency), thread_name_prefix="prewarm")
+    pending = {executor.submit(run_job, handler, job, limiter, progress, stop) for job in jobs}
+    try:
+        while pending:
+            _, pending = wait(pending, timeout=args.report_every)
+            progress.report()
+    except KeyboardInterrupt:
+        logger.info("🛑 Stopping; run the same command again to resume")
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+    else:
+        executor.shutdown()
+
+    summary = progress.summary()
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 import os
+import re
 import sys
+import hashlib
 import subprocess
 import webbrowser
-from time import sleep
+from time import sleep, perf_counter
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
 # Configure logging
@@ -16,32 +19,91 @@ logger = logging.getLogger(__name__)
 project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, project_root)
 
+DEPENDENCY_STAMP = os.path.join(project_root, '.cache', 'requirements.sha256')
+OLLAMA_PROBE_TIMEOUT = 2  # seconds
+STARTUP_BUDGET = 5  # seconds until Streamlit is launched
+
+def _version_tuple(version):
+    return tuple(int(part) for part in re.findall(r'\d+', version)[:3])
+
+def missing_requirements(requirements):
+    """Return the requirement lines not satisfied by the installed distributions"""
+    from importlib import metadata
+
+    missing = []
+    for line in requirements:
+        line = line.split('#')[0].strip()
+        if not line:
+            continue
+        match = re.match(r'^([A-Za-z0-9_.\-]+)\s*(?:>=\s*([\w.]+))?', line)
+        if not match:
+            continue
+        name, minimum = match.groups()
+        try:
+            installed = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            missing.append(line)
+            continue
+        if minimum and _version_tuple(installed) < _version_tuple(minimum):
+            missing.append(line)
+    return missing
+
 def check_dependencies():
-    """Check if all required packages are installed"""
+    """Check if all required packages are installed, running pip only when needed"""
     try:
-        with open('requirements.txt', 'r') as f:
-            required = f.read().splitlines()
-        
-        logger.info("Checking dependencies...")
+        with open('requirements.txt', 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        required = content.decode('utf-8').splitlines()
+
+        # Skip pip when requirements.txt is unchanged since the last successful install
+        stamp = None
+        if os.path.exists(DEPENDENCY_STAMP):
+            with open(DEPENDENCY_STAMP, 'r') as f:
+                stamp = f.read().strip()
+        missing = missing_requirements(required)
+        if stamp == digest and not missing:
+            logger.info("✅ Dependencies unchanged since last install.")
+            return True
+
+        logger.info("Installing dependencies...")
         subprocess.check_call([sys.executable, '-m', 'pip', 'install', '-r', 'requirements.txt'])
+        os.makedirs(os.path.dirname(DEPENDENCY_STAMP), exist_ok=True)
+        with open(DEPENDENCY_STAMP, 'w') as f:
+            f.write(digest)
         logger.info("✅ All dependencies are installed.")
         return True
     except Exception as e:
         logger.error(f"❌ Error checking dependencies: {str(e)}")
         return False
 
-def check_ollama():
-    """Check if Ollama is running"""
+def ollama_hosts():
+    """Return the configured Ollama hosts (OLLAMA_HOSTS, falling back to OLLAMA_HOST)"""
+    hosts = os.getenv('OLLAMA_HOSTS') or os.getenv('OLLAMA_HOST', 'http://localhost:11434')
+    return [host.strip().rstrip('/') for host in hosts.split(',') if host.strip()]
+
+def _ollama_host_up(host):
     try:
-        import requests
-        response = requests.get('http://localhost:11434/api/version')
-        if response.status_code == 200:
-            logger.info("✅ Ollama is running.")
-            return True
-    except:
-        logger.warning("⚠️ Ollama is not running.")
+        from urllib.request import urlopen
+        with urlopen(f'{host}/api/version', timeout=OLLAMA_PROBE_TIMEOUT) as response:
+            return response.status == 200
+    except Exception:
         return False
 
+def check_ollama():
+    """Check if at least one Ollama host is running"""
+    hosts = ollama_hosts()
+    with ThreadPoolExecutor(max_workers=len(hosts)) as pool:
+        up = list(pool.map(_ollama_host_up, hosts))
+    for host, running in zip(hosts, up):
+        if not running and len(hosts) > 1:
+            logger.warning(f"⚠️ Ollama host {host} is not responding.")
+    if any(up):
+        logger.info(f"✅ Ollama is running ({sum(up)}/{len(hosts)} hosts).")
+        return True
+    logger.warning("⚠️ Ollama is not running.")
+    return False
+
 def check_environment():
     """Check if .env file exists and contains necessary variables"""
     try:
@@ -52,14 +114,34 @@ def check_environment():
                 f.write("OPENAI_API_KEY=\n\n")
                 f.write("# Ollama Settings\n")
                 f.write("OLLAMA_HOST=http://localhost:11434\n")
+                f.write("# Spread requests over several Ollama servers (comma-separated)\n")
+                f.write("# OLLAMA_HOSTS=http://localhost:11434,http://gpu-box:11434\n")
+                f.write("# How long Ollama keeps the model loaded between requests\n")
+                f.write("# OLLAMA_KEEP_ALIVE=30m\n")
                 f.write("OLLAMA_MODEL=deepseek-r1\n")
         return True
     except Exception as e:
         logger.error(f"❌ Error setting up environment: {str(e)}")
         return False
 
+def load_environment():
+    """Load .env into the environment, as the app does; variables already set take precedence"""
+    from dotenv import load_dotenv
+
+    load_dotenv(os.path.join(project_root, '.env'))
+
+def report_startup_timings(timings):
+    """Log how long each startup phase took"""
+    total = sum(timings.values())
+    for phase, seconds in timings.items():
+        logger.info(f"⏱️ {phase}: {seconds:.2f}s")
+    logger.info(f"⏱️ Startup total: {total:.2f}s (budget {STARTUP_BUDGET}s)")
+    if total > STARTUP_BUDGET:
+        logger.warning(f"⚠️ Startup exceeded its {STARTUP_BUDGET}s budget")
+
 def start_application():
     """Start the Travel AI Assistant"""
+    timings = {}
     try:
         print("\n=== Starting Travel AI Assistant ===")
         print("Initializing...")
@@ -74,17 +156,22 @@ def start_application():
             return
         
         # Check dependencies
+        started = perf_counter()
         if not check_dependencies():
             logger.error("❌ Failed to install dependencies")
             return
+        timings["Dependencies"] = perf_counter() - started
         
-        # Check environment setup
+        # Check environment setup, then probe Ollama at the hosts the app will use
+        started = perf_counter()
         if not check_environment():
             logger.error("❌ Failed to setup environment")
             return
+        load_environment()
+        ollama_ok = check_ollama()
+        timings["Environment and Ollama probes"] = perf_counter() - started
         
-        # Check Ollama
-        if not check_ollama():
+        if not ollama_ok:
             print("\n⚠️ WARNING: Ollama is not running!")
             print("To use Ollama models, please start Ollama in a separate terminal:")
             print("  $ ollama serve")
@@ -104,10 +191,12 @@ def start_application():
         from threading import Thread
         Thread(target=open_browser).start()
         
+        report_startup_timings(timings)
+        
         # Start Streamlit with the correct module path
-        streamlit_command = f'{sys.executable} -m streamlit run app/main.py'
-        logger.info(f"Running command: {streamlit_command}")
-        os.system(streamlit_command)
+        streamlit_command = [sys.executable, '-m', 'streamlit', 'run', 'app/main.py']
+        logger.info(f"Running command: {' '.join(streamlit_command)}")
+        subprocess.call(streamlit_command)
         
     except Exception as e:
         logger.error(f"❌ Error starting application: {str(e)}")
@@ -120,7 +209,7 @@ def display_welcome():
 ╚════════════════════════════════════════╝
 
 This script will:
-1. Check and install required dependencies
+1. Check required dependencies (installing only when requirements.txt changed)
 2. Verify Ollama installation (if using local model)
 3. Setup environment configuration
 4. Start the Travel AI web interface
@@ -0,0 +1,83 @@
+import pytest
+
+from app.utils import cache as cache_module
+from app.utils.cache import ResponseCache, make_cache_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock.time)
+    return clock
+
+
+def test_entries_expire_after_their_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.db"), ttl=60)
+    cache.set("key", "answer")
+    clock.now += 59
+    assert cache.get("key") == "answer"
+    clock.now += 2
+    assert cache.get("key") is None
+    assert cache.stats()["expirations"] == 1
+    # The expired row is gone from disk too, so a restart does not bring it back
+    assert ResponseCache(str(tmp_path / "cache.db"), ttl=60).get("key") is None
+
+
+def test_memory_tier_evicts_the_least_recently_used(clock):
+    cache = ResponseCache(None, max_memory_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("1", "3")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_tier_survives_a_restart_and_refills_memory(tmp_path, clock):
+    path = str(tmp_path / "cache.db")
+    ResponseCache(path).set("key", "answer")
+    cache = ResponseCache(path)
+    assert cache.get("key") == "answer"
+    assert cache.get("key") == "answer"
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"]) == (1, 1)
+
+
+def test_disk_tier_evicts_the_least_recently_accessed(tmp_path, clock):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(path, max_memory_entries=1, max_disk_entries=2)
+    cache.set("a", "1")
+    clock.now += 1
+    cache.set("b", "2")
+    clock.now += 1
+    assert cache.get("a") == "1"
+    clock.now += 1
+    cache.set("c", "3")
+    restarted = ResponseCache(path)
+    assert restarted.get("b") is None
+    assert (restarted.get("a"), restarted.get("c")) == ("1", "3")
+
+
+def test_delete_drops_both_tiers(tmp_path, clock):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(path)
+    cache.set("key", "answer")
+    cache.delete("key")
+    assert cache.get("key") is None
+    assert ResponseCache(path).get("key") is None
+
+
+def test_cache_keys_ignore_whitespace_and_case_only():
+    key = make_cache_key("ollama", "deepseek-r1", 0.7, "Hotels in  Paris")
+    assert key == make_cache_key("ollama", "deepseek-r1", 0.7, "hotels in paris ")
+    assert key != make_cache_key("ollama", "deepseek-r1", 0.2, "hotels in paris")
+    assert key != make_cache_key("openai", "gpt-4o", 0.7, "hotels in paris")
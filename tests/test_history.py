@@ -0,0 +1,70 @@
+import pytest
+
+from app.utils.history import ChatHistory, HistoryArchive
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return HistoryArchive(str(tmp_path / "history.db"))
+
+
+def fill(history, count):
+    messages = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"} for i in range(count)]
+    for message in messages:
+        history.append(message)
+    return messages
+
+
+def test_old_messages_spill_to_the_archive_and_page_back(archive):
+    history = ChatHistory("s1", archive, max_messages=4)
+    messages = fill(history, 10)
+    assert history.stats() == {"messages": 10, "in_memory": 4, "spilled": 6,
+                               "memory_chars": sum(len(m["content"]) for m in messages[6:])}
+    assert history.window(3) == messages[7:]
+    # A page across the boundary reads the archive and memory in order
+    assert history.page(4, 8) == messages[4:8]
+    assert history.page(0, 100) == messages
+
+
+def test_the_character_cap_spills_but_keeps_the_newest_message(archive):
+    history = ChatHistory("s1", archive, max_messages=10, max_chars=20)
+    history.append({"role": "user", "content": "short"})
+    history.append({"role": "assistant", "content": "x" * 50})
+    assert history.stats()["in_memory"] == 1
+    assert history.window(2)[0]["content"] == "short"
+
+
+def test_sessions_do_not_see_each_others_messages(archive):
+    first, second = ChatHistory("s1", archive, max_messages=1), ChatHistory("s2", archive, max_messages=1)
+    fill(first, 3)
+    second.append({"role": "user", "content": "other"})
+    second.append({"role": "assistant", "content": "reply"})
+    assert [m["content"] for m in first.page(0, 3)] == ["message 0", "message 1", "message 2"]
+    assert [m["content"] for m in second.page(0, 2)] == ["other", "reply"]
+
+
+def test_a_durable_history_restores_its_latest_window(archive):
+    history = ChatHistory("s1", archive, max_messages=4, durable=True)
+    messages = fill(history, 9)
+    restored = ChatHistory.restore("s1", archive, max_messages=4)
+    assert len(restored) == 9
+    assert restored.stats()["in_memory"] == 4
+    assert restored.page(0, 9) == messages
+    restored.append({"role": "user", "content": "after restart"})
+    assert ChatHistory.restore("s1", archive, max_messages=4).window(1) == [
+        {"role": "user", "content": "after restart"}
+    ]
+
+
+def test_clear_drops_archived_messages(archive):
+    history = ChatHistory("s1", archive, max_messages=2)
+    fill(history, 5)
+    history.clear()
+    assert len(history) == 0
+    assert archive.count("s1") == 0
+
+
+def test_archived_messages_expire_after_the_retention(tmp_path):
+    path = str(tmp_path / "history.db")
+    HistoryArchive(path).put("s1", 0, "user", "old")
+    assert HistoryArchive(path, retention=-1).count("s1") == 0
@@ -0,0 +1,47 @@
+import pytest
+
+from app.utils.links import LinkRewriter, add_booking_links, providers_for
+
+ANSWER = (
+    "Hotel Lutetia, from $400 per night.\n"
+    "- Booking.com: check availability\n"
+    "- Agoda: member prices\n"
+    "- MakeMyTrip: packages\n"
+    "- Expedia: bundles\n"
+    "Dinner: try OpenTable: for reservations."
+)
+
+
+def test_mentions_become_links_with_the_destination_filled_in():
+    text = add_booking_links(ANSWER, "New  York", "hotels")
+    assert "[Book on Booking.com](https://www.booking.com/search.html?ss=New+York)" in text
+    assert "[Book on MakeMyTrip](https://www.makemytrip.com/hotels/hotels-new-york)" in text
+    assert "Booking.com:" not in text
+    # Only the hotel providers are linked in a hotels answer
+    assert "OpenTable: for reservations" in text
+
+
+def test_other_text_is_left_alone():
+    assert add_booking_links("Dinner: at eight. Booking.com is popular.", "Paris") == (
+        "Dinner: at eight. Booking.com is popular."
+    )
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 40])
+def test_streamed_chunks_match_the_whole_text(size):
+    rewriter = LinkRewriter("Paris", providers_for("hotels"))
+    chunks = [ANSWER[i:i + size] for i in range(0, len(ANSWER), size)]
+    assert "".join(rewriter.stream(chunks)) == LinkRewriter("Paris", providers_for("hotels")).rewrite(ANSWER)
+
+
+def test_a_held_back_prefix_that_is_not_a_mention_is_released_at_the_end():
+    rewriter = LinkRewriter("Paris")
+    assert rewriter.feed("See Book") == "See "
+    assert rewriter.flush() == "Book"
+
+
+def test_providers_come_from_the_quick_action():
+    assert list(providers_for("restaurants")) == ["OpenTable", "TripAdvisor"]
+    assert "Agoda" in providers_for(None)
+    with pytest.raises(ValueError):
+        LinkRewriter("Paris", ["Nowhere"])
@@ -0,0 +1,120 @@
+import threading
+import time
+
+from app.utils.prefetch import Prefetcher
+from app.utils.scheduler import AdmissionScheduler
+
+INTERESTS = ["Culture"]
+
+
+class FakeSingleFlight:
+    def __init__(self):
+        self.followed = set()
+
+    def has_followers(self, key):
+        return key in self.followed
+
+
+class FakeHandler:
+    """Answers quick actions in a few chunks, each released by `gate`, and caches the answers."""
+
+    def __init__(self):
+        self.current_model = "ollama"
+        self.assistant = object()
+        self.single_flight = FakeSingleFlight()
+        self.cache = {}
+        self.gate = threading.Event()
+        self.gate.set()
+        self.started = threading.Event()
+
+    def cache_key(self, prompt, context=None, action=None):
+        return f"{action}|{prompt}"
+
+    def is_cached(self, key):
+        return key in self.cache
+
+    def stream_chat(self, prompt, context=None, action=None, priority=None, remember=True):
+        key = self.cache_key(prompt, context, action)
+        self.started.set()
+        for chunk in ("one ", "two ", "three"):
+            self.gate.wait(5)
+            yield chunk
+        self.cache[key] = "one two three"
+
+
+def prefetcher(handler, **kwargs):
+    return Prefetcher(handler, delay=0, scheduler=AdmissionScheduler({"ollama": 4}), **kwargs)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def finished(stats):
+    return stats["completed"] + stats["cancelled"] + stats["cached"] + stats["over_budget"] + stats["errors"]
+
+
+def test_budget_caps_speculative_calls():
+    handler = FakeHandler()
+    prefetch = prefetcher(handler, budget=2, window=60, max_in_flight=4)
+    prefetch.schedule("Paris", "Budget", INTERESTS)
+    wait_for(lambda: prefetch.stats()["scheduled"] == 3 and finished(prefetch.stats()) == 3)
+    stats = prefetch.stats()
+    assert stats["completed"] == 2
+    assert stats["over_budget"] == 1
+    assert stats["budget_remaining"] == 0
+    assert len(handler.cache) == 2
+
+
+def test_clicks_count_hits_in_flight_hits_and_misses():
+    handler = FakeHandler()
+    prefetch = prefetcher(handler, max_in_flight=4)
+    prefetch.schedule("Paris", "Budget", INTERESTS)
+    wait_for(lambda: finished(prefetch.stats()) == 3)
+    assert prefetch.record_click("hotels", "Paris", "Budget", INTERESTS) == "hit"
+    assert prefetch.record_click("hotels", "Rome", "Budget", INTERESTS) == "miss"
+
+    handler.gate.clear()
+    handler.started.clear()
+    prefetch.schedule("Rome", "Budget", INTERESTS)
+    handler.started.wait(5)
+    wait_for(lambda: "running" in prefetch._keys.values())
+    action = next(key for key, state in prefetch._keys.items() if state == "running").split("|")[0]
+    assert prefetch.record_click(action, "Rome", "Budget", INTERESTS) == "in_flight"
+    handler.gate.set()
+
+    stats = prefetch.stats()
+    assert (stats["hits"], stats["in_flight_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["hit_rate"] == round(2 / 3, 3)
+
+
+def test_changing_inputs_cancels_running_prefetches():
+    handler = FakeHandler()
+    handler.gate.clear()
+    prefetch = prefetcher(handler, max_in_flight=1)
+    prefetch.schedule("Paris", "Budget", INTERESTS)
+    handler.started.wait(5)
+    prefetch.schedule("Paris", "Luxury", INTERESTS)
+    handler.gate.set()
+    wait_for(lambda: prefetch.stats()["cancelled"] >= 1)
+    # Nothing for the old inputs was cached or counted as a hit
+    assert not any("Budget" in key for key in handler.cache)
+    assert prefetch.record_click("hotels", "Paris", "Budget", INTERESTS) == "miss"
+
+
+def test_cancel_keeps_a_prefetch_a_click_has_joined():
+    handler = FakeHandler()
+    handler.gate.clear()
+    prefetch = prefetcher(handler, max_in_flight=1)
+    prefetch.schedule("Paris", "Budget", INTERESTS)
+    handler.started.wait(5)
+    wait_for(lambda: "running" in prefetch._keys.values())
+    key = next(key for key, state in prefetch._keys.items() if state == "running")
+    handler.single_flight.followed.add(key)
+    prefetch.cancel()
+    handler.gate.set()
+    wait_for(lambda: key in handler.cache)
+    wait_for(lambda: prefetch.stats()["completed"] == 1)
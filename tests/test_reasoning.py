@@ -0,0 +1,78 @@
+import pytest
+
+from app.utils.ollama_client import OllamaClient
+from app.utils.reasoning import ReasoningFilter, strip_reasoning
+
+RESPONSE = "<think>\nThe user wants hotels. Budget matters.\n</think>\n\nHere are three hotels in Paris."
+
+
+def test_strip_reasoning_drops_the_trace_and_leading_blank_lines():
+    assert strip_reasoning(RESPONSE) == "Here are three hotels in Paris."
+    assert strip_reasoning("No trace here.") == "No trace here."
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 8, 100])
+def test_streamed_chunks_give_the_same_answer(size):
+    reasoning = ReasoningFilter()
+    chunks = [RESPONSE[i:i + size] for i in range(0, len(RESPONSE), size)]
+    text = "".join(reasoning.feed(chunk) for chunk in chunks) + reasoning.flush()
+    assert text == "Here are three hotels in Paris."
+    assert reasoning.reasoning_tokens == (len("\nThe user wants hotels. Budget matters.\n") + 3) // 4
+
+
+def test_the_answer_shows_as_soon_as_the_trace_ends():
+    reasoning = ReasoningFilter()
+    assert reasoning.feed("<think>planning") == ""
+    assert not reasoning.answer_started
+    assert reasoning.feed("</think>\n\nHere") == "Here"
+    assert reasoning.answer_started
+
+
+def test_a_trace_cut_off_before_the_answer_leaves_nothing():
+    reasoning = ReasoningFilter()
+    assert reasoning.feed("<think>still thinking about") + reasoning.flush() == ""
+    assert not reasoning.answer_started
+    assert reasoning.reasoning_chars == len("still thinking about")
+
+
+def test_separately_sent_reasoning_is_counted():
+    reasoning = ReasoningFilter()
+    reasoning.add_reasoning("x" * 40)
+    assert reasoning.feed("Answer") == "Answer"
+    assert reasoning.reasoning_tokens == 10
+
+
+def client():
+    return OllamaClient("deepseek-r1", "http://ollama:11434", session=None, reasoning=True)
+
+
+def test_reasoning_off_only_caps_the_answer_on_hosts_that_honour_think():
+    ollama = client()
+    generation = {"max_tokens": 800, "reasoning": "off"}
+    payload = ollama._payload("Hotels?", False, generation=generation, url="http://ollama:11434")
+    assert payload["think"] is False
+    assert "num_predict" not in payload.get("options", {})
+
+    ollama._note_think("http://ollama:11434", generation, ReasoningFilter())
+    payload = ollama._payload("Hotels?", False, generation=generation, url="http://ollama:11434")
+    assert payload["options"]["num_predict"] == 800
+
+    traced = ReasoningFilter()
+    traced.feed("<think>ignored think=false</think>Answer")
+    ollama._note_think("http://ollama:11434", generation, traced)
+    payload = ollama._payload("Hotels?", False, generation=generation, url="http://ollama:11434")
+    assert "num_predict" not in payload.get("options", {})
+
+
+def test_an_answer_the_trace_used_up_is_asked_for_again_without_a_cap():
+    ollama = client()
+    empty = ReasoningFilter()
+    empty.feed("<think>all of the budget")
+    empty.flush()
+    retry = ollama._uncapped(empty, {"max_tokens": 800, "reasoning": "cap", "reasoning_tokens": 256})
+    assert retry["max_tokens"] is None and retry["reasoning"] == "off"
+    # Nothing to gain when the answer was not capped, or when there is one
+    assert ollama._uncapped(empty, {"reasoning": "on"}) is None
+    answered = ReasoningFilter()
+    answered.feed("<think>short</think>Answer")
+    assert ollama._uncapped(answered, {"max_tokens": 800}) is None
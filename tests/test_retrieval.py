@@ -0,0 +1,41 @@
+import pytest
+
+from app.utils.retrieval import ResponseIndex, classify, refers_back
+
+ANSWER = (
+    "## Hotels\n"
+    "- Hotel Jeanne d'Arc in the Marais has double rooms from $120 per night and is close to the Place des Vosges.\n"
+    "- The Louvre museum is open daily except Tuesdays, from 9am to 6pm, and closed on public holidays."
+)
+
+
+@pytest.mark.parametrize("question", [
+    "Is it closed on Saturdays?",
+    "How much does that one cost?",
+    "Can I walk there from the hotel?",
+    "What time do they open?",
+])
+def test_questions_about_earlier_turns_refer_back(question):
+    assert refers_back(question)
+
+
+@pytest.mark.parametrize("question", [
+    "When is the Louvre museum open?",
+    "Which hotels are in the Marais?",
+])
+def test_standalone_questions_do_not_refer_back(question):
+    assert not refers_back(question)
+
+
+def test_short_questions_are_not_answered_without_the_model():
+    assert classify(1.0, "open daily?") == "grounded"
+    assert classify(1.0, "Louvre museum opening hours") == "answered"
+
+
+def test_answers_are_only_found_for_the_same_budget_and_interests():
+    index = ResponseIndex()
+    index.add("Paris", ANSWER, "Budget", ["Culture"])
+    question = "Which hotels are in the Marais?"
+    assert index.lookup("Paris", question, "Budget", ["culture"])[0] == pytest.approx(1.0)
+    assert index.lookup("Paris", question, "Luxury", ["Culture"]) == (0.0, [])
+    assert index.lookup("Paris", question, "Budget", ["Food"]) == (0.0, [])
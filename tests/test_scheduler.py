@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.utils.scheduler import AdmissionScheduler, QueueFull, QueueTimeout
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class Holder:
+    """Holds a slot in a thread until released; appends itself to admitted once it has the slot."""
+
+    def __init__(self, scheduler, priority, session, admitted):
+        self.release = threading.Event()
+        self.name = f"{priority}:{session}"
+
+        def hold():
+            try:
+                with scheduler.slot("ollama", priority, session):
+                    admitted.append(self)
+                    self.release.wait(5)
+            except Exception as e:
+                admitted.append(e)
+
+        self.thread = threading.Thread(target=hold)
+        self.thread.start()
+
+
+def waiting(scheduler):
+    stats = scheduler.stats()["ollama"]
+    return sum(value for name, value in stats.items() if name.startswith("waiting_"))
+
+
+def test_waiting_calls_are_admitted_by_priority_then_session_turns():
+    scheduler = AdmissionScheduler({"ollama": 1}, deadline=5)
+    admitted = []
+    first = Holder(scheduler, "interactive", "s0", admitted)
+    wait_for(lambda: admitted)
+    holders = []
+    for priority, session in [("prefetch", "s1"), ("bulk", "s1"), ("bulk", "s1"), ("bulk", "s2"),
+                              ("interactive", "s3")]:
+        holders.append(Holder(scheduler, priority, session, admitted))
+        wait_for(lambda: waiting(scheduler) == len(holders))
+    # Let each call finish as soon as it is admitted, so the next one in line takes the slot
+    for count in range(1, len(holders) + 2):
+        wait_for(lambda: len(admitted) == count)
+        admitted[-1].release.set()
+    for holder in [first, *holders]:
+        holder.thread.join(5)
+    # s1's second bulk call waits for s2's turn; prefetches go last
+    assert [holder.name for holder in admitted] == [
+        "interactive:s0", "interactive:s3", "bulk:s1", "bulk:s2", "bulk:s1", "prefetch:s1"
+    ]
+
+
+def test_prefetches_leave_the_last_slot_to_other_calls():
+    scheduler = AdmissionScheduler({"ollama": 2}, deadline=5)
+    admitted = []
+    prefetch = Holder(scheduler, "prefetch", "s1", admitted)
+    wait_for(lambda: admitted)
+    assert not scheduler.has_capacity("ollama", "prefetch")
+    assert scheduler.has_capacity("ollama", "bulk")
+    second = Holder(scheduler, "prefetch", "s2", admitted)
+    wait_for(lambda: waiting(scheduler) == 1)
+    click = Holder(scheduler, "bulk", "s3", admitted)
+    wait_for(lambda: len(admitted) == 2)
+    assert admitted == [prefetch, click]
+    prefetch.release.set()
+    wait_for(lambda: len(admitted) == 3)
+    assert admitted[-1] is second
+    for holder in (second, click):
+        holder.release.set()
+        holder.thread.join(5)
+    assert scheduler.stats()["ollama"]["active"] == 0
+
+
+def test_a_single_slot_backend_still_runs_prefetches():
+    scheduler = AdmissionScheduler({"ollama": 1})
+    assert scheduler.has_capacity("ollama", "prefetch")
+    with scheduler.slot("ollama", "prefetch"):
+        assert not scheduler.has_capacity("ollama", "interactive")
+
+
+def test_calls_are_rejected_when_the_queue_is_full():
+    scheduler = AdmissionScheduler({"ollama": 1}, max_queue=1, deadline=5)
+    admitted = []
+    first = Holder(scheduler, "interactive", "s1", admitted)
+    wait_for(lambda: admitted)
+    queued = Holder(scheduler, "interactive", "s2", admitted)
+    wait_for(lambda: waiting(scheduler) == 1)
+    with pytest.raises(QueueFull):
+        with scheduler.slot("ollama", "interactive", "s3"):
+            pass
+    for holder in (first, queued):
+        holder.release.set()
+        holder.thread.join(5)
+
+
+def test_calls_give_up_after_the_deadline_and_free_their_place():
+    scheduler = AdmissionScheduler({"ollama": 1}, deadline=0.05)
+    with scheduler.slot("ollama"):
+        with pytest.raises(QueueTimeout):
+            with scheduler.slot("ollama", session="other"):
+                pass
+    assert waiting(scheduler) == 0
+    assert scheduler.stats()["ollama"]["active"] == 0
+
+
+def test_async_waiters_are_woken_when_a_slot_frees():
+    async def scenario():
+        scheduler = AdmissionScheduler({"ollama": 1}, deadline=5)
+        order = []
+
+        async def call(name, hold):
+            async with scheduler.aslot("ollama", session=name):
+                order.append(name)
+                await asyncio.sleep(hold)
+
+        await asyncio.gather(call("a", 0.02), call("b", 0), call("c", 0))
+        return order, scheduler.stats()["ollama"]["active"]
+
+    assert asyncio.run(scenario()) == (["a", "b", "c"], 0)
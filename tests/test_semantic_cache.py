@@ -0,0 +1,37 @@
+import pytest
+
+from app.utils.semantic_cache import SemanticCache
+
+CONTEXT = {"destination": "Paris"}
+PARTITION = SemanticCache.partition_key(("ollama", "deepseek-r1"), CONTEXT)
+
+
+def lookup(cached: str, asked: str):
+    cache = SemanticCache()
+    cache.set(PARTITION, SemanticCache.query_text(cached, CONTEXT), "cached answer")
+    return cache.get(PARTITION, SemanticCache.query_text(asked, CONTEXT))
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("train from Kyoto to Osaka", "train from Osaka to Kyoto"),
+    ("airport to the city", "city to the airport"),
+    ("How do I get from the airport?", "How do I get to the airport?"),
+    ("flights from London to New York", "flights from New York to London"),
+    ("is the tap water safe to drink", "is the tap water not safe to drink"),
+    ("is the tap water safe to drink", "the tap water isn't safe to drink?"),
+    ("best hotels in Paris", "best museums in Paris"),
+    ("vegan restaurants in Paris", "steak restaurants in Paris"),
+    ("What is the best way to get around Paris?", "What are the best museums in Paris?"),
+])
+def test_different_questions_miss(cached, asked):
+    assert lookup(cached, asked) is None
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("best food in Paris", "where to eat in paris"),
+    ("cheap hotels in Paris", "budget hotels in Paris"),
+    ("How many days do I need in Paris?", "how many days should I spend in Paris"),
+    ("Is Paris safe at night?", "is paris safe at night"),
+])
+def test_rephrased_questions_hit(cached, asked):
+    assert lookup(cached, asked) == "cached answer"
@@ -0,0 +1,81 @@
+import pytest
+
+from app.utils.memory import ConversationMemory
+from app.utils.sessions import SessionJournal, SessionStore, fold, is_session_token, new_session_token
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "sessions.db")
+
+
+def record_session(journal):
+    journal.record("model", "ollama")
+    journal.record("preferences", {"destination": "Paris", "budget": "Budget"})
+    journal.record_exchange("Best museums?", "The Louvre and the Musée d'Orsay.")
+    journal.record("model", "ollama")
+    journal.record("preferences", {"destination": "Rome", "budget": "Budget"})
+    journal.record_exchange("And in Rome?", "The Vatican Museums.")
+
+
+def test_fold_replaces_values_and_adds_exchanges_to_the_memory():
+    state = fold({"model": "openai"}, [
+        ("model", "ollama"),
+        ("exchange", {"prompt": "Hi", "response": "Hello"}),
+        ("exchange", {"prompt": "Paris?", "response": "Lovely"}),
+    ])
+    assert state["model"] == "ollama"
+    assert [content for _, content in state["memory"]["turns"]] == ["Hi", "Hello", "Paris?", "Lovely"]
+    # Folding onto a snapshot continues its memory
+    state = fold(state, [("exchange", {"prompt": "Rome?", "response": "Also lovely"})])
+    assert len(state["memory"]["turns"]) == 6
+
+
+def test_a_session_restores_after_a_restart(path):
+    token = new_session_token()
+    record_session(SessionJournal(token, store=SessionStore(path, compact_every=100)))
+    state = SessionStore(path).load(token)
+    assert state["model"] == "ollama"
+    assert state["preferences"]["destination"] == "Rome"
+    memory = ConversationMemory()
+    memory.restore(state["memory"])
+    assert "The Vatican Museums." in memory.render()
+
+
+def test_compaction_keeps_the_same_state_with_a_short_log(path, tmp_path):
+    token = new_session_token()
+    store = SessionStore(path, compact_every=2)
+    record_session(SessionJournal(token, store=store))
+    stats = store.stats()
+    assert stats["compactions"] >= 2
+    assert stats["logged_changes"] < 2
+    uncompacted = SessionStore(str(tmp_path / "log_only.db"), compact_every=100)
+    record_session(SessionJournal(token, store=uncompacted))
+    assert store.load(token) == uncompacted.load(token)
+
+
+def test_the_journal_skips_unchanged_values(path):
+    store = SessionStore(path, compact_every=100)
+    journal = SessionJournal("t" * 22, {"model": "ollama"}, store)
+    journal.record("model", "ollama")
+    journal.record("model", "openai")
+    journal.record("model", "openai")
+    assert store.stats()["appends"] == 1
+
+
+def test_unknown_deleted_and_expired_sessions_are_not_restored(path):
+    store = SessionStore(path)
+    assert store.load("unknown" * 3) is None
+    store.append("a" * 22, "model", "ollama")
+    store.delete("a" * 22)
+    assert store.load("a" * 22) is None
+    store.append("b" * 22, "model", "ollama")
+    store.compact("b" * 22)
+    assert SessionStore(path, retention=-1).load("b" * 22) is None
+
+
+def test_session_tokens():
+    assert is_session_token(new_session_token())
+    assert not is_session_token("short")
+    assert not is_session_token("../../etc/passwd-xxxxxxxx")
+    assert not is_session_token(None)
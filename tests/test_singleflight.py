@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.utils.singleflight import SingleFlight
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def run_followers(flight, key, fn, count):
+    results = []
+
+    def follow():
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            results.append(e)
+
+    threads = [threading.Thread(target=follow) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: flight.stats()["coalesced"] == count)
+    return threads, results
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    leader = threading.Thread(target=flight.do, args=("key", fn))
+    leader.start()
+    wait_for(lambda: calls)
+    threads, results = run_followers(flight, "key", fn, 3)
+    release.set()
+    for thread in [leader, *threads]:
+        thread.join(5)
+    assert calls == [1]
+    assert results == ["answer"] * 3
+    assert flight.stats() == {"calls": 4, "executions": 1, "coalesced": 3, "in_flight": 0}
+    # A call after the flight has landed runs again
+    assert flight.do("key", lambda: "fresh") == "fresh"
+
+
+def test_errors_reach_every_caller():
+    flight = SingleFlight()
+    release = threading.Event()
+    started = threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(5)
+        raise ValueError("upstream failed")
+
+    errors = []
+
+    def lead():
+        try:
+            flight.do("key", fn)
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=lead)
+    leader.start()
+    started.wait(5)
+    threads, results = run_followers(flight, "key", fn, 2)
+    release.set()
+    for thread in [leader, *threads]:
+        thread.join(5)
+    assert len(errors) == 1
+    assert [str(result) for result in results] == ["upstream failed"] * 2
+    assert flight.stats()["in_flight"] == 0
+
+
+def gated_stream(gates):
+    for chunk, gate in gates:
+        gate.wait(5)
+        yield chunk
+
+
+def test_stream_followers_replay_earlier_chunks_then_follow_live():
+    flight = SingleFlight()
+    gates = [(chunk, threading.Event()) for chunk in ("a", "b", "c")]
+    leader = flight.stream("key", lambda: gated_stream(gates))
+    gates[0][1].set()
+    assert next(leader) == "a"
+    follower = flight.stream("key", lambda: pytest.fail("followers must not call upstream"))
+    received = []
+    thread = threading.Thread(target=lambda: received.extend(follower))
+    thread.start()
+    wait_for(lambda: flight.has_followers("key"))
+    for _, gate in gates[1:]:
+        gate.set()
+    assert list(leader) == ["b", "c"]
+    thread.join(5)
+    assert received == ["a", "b", "c"]
+
+
+def test_a_closed_leader_stream_keeps_running_for_followers():
+    flight = SingleFlight()
+    gates = [(chunk, threading.Event()) for chunk in ("a", "b", "c")]
+    leader = flight.stream("key", lambda: gated_stream(gates))
+    gates[0][1].set()
+    assert next(leader) == "a"
+    received = []
+    thread = threading.Thread(target=lambda: received.extend(flight.stream("key", lambda: iter(()))))
+    thread.start()
+    wait_for(lambda: flight.has_followers("key"))
+    leader.close()
+    for _, gate in gates[1:]:
+        gate.set()
+    thread.join(5)
+    assert received == ["a", "b", "c"]
+    wait_for(lambda: flight.stats()["in_flight"] == 0)
+
+
+def test_a_closed_leader_stream_without_followers_stops_upstream():
+    flight = SingleFlight()
+    closed = []
+
+    def upstream():
+        try:
+            yield "a"
+            yield "b"
+        finally:
+            closed.append(True)
+
+    leader = flight.stream("key", upstream)
+    assert next(leader) == "a"
+    leader.close()
+    assert closed == [True]
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_a_cancelled_async_leader_leaves_the_call_running_for_followers():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def fn():
+            await release.wait()
+            return "answer"
+
+        leader = asyncio.ensure_future(flight.ado("key", fn))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.ado("key", fn))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await follower == "answer"
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return flight.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["executions"], stats["coalesced"], stats["in_flight"]) == (1, 1, 0)
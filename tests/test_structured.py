@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from app.utils.cache import ResponseCache
+from app.utils.structured import StructuredStore, filter_records, parse_records, render_records
+
+ITEMS = [
+    {"name": "Le Meurice", "price_tier": "$$$", "price_per_night": "$900", "interests": ["sightseeing", "Spa"]},
+    {"name": "Generator Paris", "price_tier": "cheap", "area": "Canal Saint-Martin",
+     "interests": "Food & Dining, Shopping"},
+    {"name": "Hotel Jeanne", "price_tier": "mid-range", "interests": ["Culture & History", "Sightseeing"]},
+    {"name": "Broken", "price_tier": "free"},
+    {"description": "No name"},
+]
+
+
+def test_reasoning_and_code_fences_around_the_json_are_ignored():
+    text = "<think>Let me list some hotels.</think>\nHere you go:\n```json\n" + json.dumps({"items": ITEMS}) + "\n```"
+    records = parse_records("hotels", text)
+    assert [record.name for record in records] == ["Le Meurice", "Generator Paris", "Hotel Jeanne"]
+
+
+def test_tiers_and_interests_are_normalized():
+    records = parse_records("hotels", json.dumps(ITEMS))
+    assert [record.price_tier for record in records] == ["luxury", "budget", "moderate"]
+    # Interests the sidebar does not offer are dropped
+    assert records[0].interests == ["Sightseeing"]
+    assert records[1].interests == ["Food & Dining", "Shopping"]
+
+
+@pytest.mark.parametrize("text", ["I could not find any hotels.", "{\"items\": [", json.dumps({"items": ITEMS[3:]})])
+def test_unusable_output_raises_value_error(text):
+    with pytest.raises(ValueError):
+        parse_records("hotels", text)
+
+
+def test_filtering_selects_the_budget_and_ranks_by_shared_interests():
+    records = parse_records("hotels", json.dumps(ITEMS + [
+        {"name": "Hotel Sunny", "price_tier": "moderate", "interests": ["Shopping"]},
+    ]))
+    moderate = filter_records(records, "Moderate ($100-$300/day)", ["Culture & History"])
+    assert [record.name for record in moderate] == ["Hotel Jeanne", "Hotel Sunny"]
+    assert len(filter_records(records, "", limit=2)) == 2
+
+
+def test_rendering_links_the_action_providers():
+    records = parse_records("hotels", json.dumps(ITEMS[:1]))
+    text = render_records("hotels", records, "Paris")
+    assert "### 1. Le Meurice" in text
+    assert "- **Price per night:** $900" in text
+    assert "(https://www.booking.com/search.html?ss=Paris)" in text
+    assert "No hotels in Paris match" in render_records("hotels", [], "Paris", "Luxury")
+
+
+def test_the_store_round_trips_records_per_destination():
+    store = StructuredStore(ResponseCache(None))
+    model = ("ollama", "deepseek-r1")
+    records = parse_records("hotels", json.dumps(ITEMS))
+    store.set(model, "hotels", "New York", records)
+    assert store.get(model, "hotels", "new  york") == records
+    assert store.get(model, "restaurants", "New York") is None
+    assert store.get(("openai", "gpt-4o"), "hotels", "New York") is None